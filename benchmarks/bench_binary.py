@@ -0,0 +1,91 @@
+import os
+import sys
+import gzip
+import json
+import time
+import argparse
+import tempfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from card_binary import ParquetExporter, MsgpackExporter, load_cards_parquet, load_cards_msgpack
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# --- バイナリ出力 (card_binary.py) のベンチマーク ---
+# cards.json のレコードから cards.parquet / cards.msgpack を作り、
+#   json            : json.load (現在の利用側と同じ)
+#   orjson          : orjson.loads (インストールされていれば)
+#   msgpack         : load_cards_msgpack
+#   parquet records : load_cards_parquet(as_records=True) (cards.json と同じレコード)
+#   parquet frame   : load_cards_parquet (DataFrame、数値列は Int32)
+#   parquet 3 cols  : 一部の列だけ DataFrame で読む
+# のファイルサイズ (生 / gzip) と読み込み時間を比べ、レコードが cards.json と一致することを確認する。
+
+SOURCE_JSON = os.path.join(ROOT_DIR, 'cards.json')
+SUBSET_COLUMNS = ['cardNumber', 'cardName', 'power']
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+def gzip_size(path):
+    with open(path, 'rb') as f:
+        return len(gzip.compress(f.read(), 9))
+
+def read_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def read_orjson(path):
+    with open(path, 'rb') as f:
+        return orjson.loads(f.read())
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare cards.json with the Parquet / MessagePack exports')
+    parser.add_argument('--json', default=SOURCE_JSON)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    records = read_json(args.json)
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {'parquet': os.path.join(tmp, 'cards.parquet'), 'msgpack': os.path.join(tmp, 'cards.msgpack')}
+        for name, exporter in (('parquet', ParquetExporter), ('msgpack', MsgpackExporter)):
+            builder = exporter(paths[name])
+            for record in records:
+                builder.add(record)
+            builder.finish()
+
+        cases = [('json', args.json, lambda: read_json(args.json), True)]
+        if orjson: cases.append(('orjson', args.json, lambda: read_orjson(args.json), True))
+        cases += [
+            ('msgpack', paths['msgpack'], lambda: load_cards_msgpack(paths['msgpack']), True),
+            ('parquet records', paths['parquet'], lambda: load_cards_parquet(paths['parquet'], as_records=True), True),
+            ('parquet frame', paths['parquet'], lambda: load_cards_parquet(paths['parquet']), False),
+            ('parquet 3 cols', paths['parquet'], lambda: load_cards_parquet(paths['parquet'], columns=SUBSET_COLUMNS), False),
+        ]
+
+        print(f"{len(records)} cards, best of {args.repeat}")
+        print(f"{'case':16} {'size':>11} {'gzip':>10} {'load':>9}  check")
+        status = 0
+        for label, path, load, as_records in cases:
+            elapsed, result = best_of(load, args.repeat)
+            if as_records:
+                ok = result == records
+            else:
+                ok = len(result) == len(records) and list(result['cardNumber']) == [r['cardNumber'] for r in records]
+            if not ok: status = 1
+            print(f"{label:16} {os.path.getsize(path):>11,} {gzip_size(path):>10,} {elapsed * 1000:>7.1f}ms  "
+                  f"{'OK' if ok else 'NG'}")
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from card_db import build_database, connect, query_cards
+
+# --- card_db の検索レイテンシ ---
+# cards.json を毎回読み込んで線形走査する場合と、SQLite (インデックス付き) に問い合わせる場合を比較する。
+# 両者の結果 (uniqueId の並び) が一致することも確認する。
+
+def _int_between(v, lo, hi):
+    if not isinstance(v, int): return False
+    return (lo is None or v >= lo) and (hi is None or v <= hi)
+
+def scan_cards(records, color=None, card_type=None, feature=None, series_code=None, card_number=None,
+               min_cost=None, max_cost=None, min_power=None, max_power=None):
+    """query_cards と同じ条件の素朴な線形走査"""
+    out = []
+    for r in records:
+        if color and not all(c in r['color'] for c in color): continue
+        if feature and not all(f in r['features'] for f in feature): continue
+        if card_type is not None and r['cardType'] != card_type: continue
+        if series_code is not None and r['seriesCode'] != series_code: continue
+        if card_number is not None and r['cardNumber'] != card_number: continue
+        if (min_cost is not None or max_cost is not None) and not _int_between(r['costLifeValue'], min_cost, max_cost): continue
+        if (min_power is not None or max_power is not None) and not _int_between(r['power'], min_power, max_power): continue
+        out.append(r)
+    return out
+
+QUERIES = {
+    'red_char_cost3_strawhat': dict(color=['赤'], card_type='CHARACTER', max_cost=3, feature=['麦わらの一味']),
+    'card_number': dict(card_number='OP01-001'),
+    'series': dict(series_code='OP-01'),
+    'power_ge_9000': dict(min_power=9000),
+    'multicolor_leader': dict(color=['赤', '緑'], card_type='LEADER'),
+}
+
+def timed(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return (time.perf_counter() - start) / repeat, result
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark card_db queries against scanning cards.json')
+    parser.add_argument('--json', default=os.path.join(ROOT_DIR, 'cards.json'))
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with open(args.json, 'r', encoding='utf-8') as f:
+        records = json.load(f)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'cards.sqlite')
+        start = time.perf_counter()
+        build_database(records, db_path)
+        print(f"Built {db_path} from {len(records)} cards in {time.perf_counter() - start:.2f}s "
+              f"({os.path.getsize(db_path):,} bytes)")
+
+        def scan_with_load(q):
+            with open(args.json, 'r', encoding='utf-8') as f:
+                return scan_cards(json.load(f), **q)
+
+        conn = connect(db_path)
+        print(f"{'query':<26} {'hits':>5} {'load+scan [ms]':>15} {'scan [ms]':>10} {'sqlite [ms]':>12} {'speedup':>8}")
+        status = 0
+        for name, q in QUERIES.items():
+            load_time, expected = timed(lambda: scan_with_load(q), max(1, args.repeat // 5))
+            scan_time, _ = timed(lambda: scan_cards(records, **q), args.repeat)
+            db_time, actual = timed(lambda: query_cards(conn, **q), args.repeat)
+            ok = [r['uniqueId'] for r in expected] == [r['uniqueId'] for r in actual]
+            print(f"{name:<26} {len(actual):>5} {load_time * 1000:15.2f} {scan_time * 1000:10.2f} "
+                  f"{db_time * 1000:12.2f} {load_time / db_time:7.1f}x{'' if ok else '  MISMATCH'}")
+            if not ok: status = 1
+        conn.close()
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
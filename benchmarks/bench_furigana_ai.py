@@ -0,0 +1,107 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from furigana_ai import generate_readings, RestBackend, ReadingCache, build_prompt, parse_response, classify_error
+from benchmarks.mock_llm_server import MockLLM, start_server
+
+# --- フリガナ生成エンジンのベンチマーク ---
+# ローカルのモックLLM (応答遅延・429・出力切れを再現) に対して、
+#   legacy : 従来の直列処理 (10件ずつ、バッチ毎に固定 sleep、429 で固定 sleep)
+#   async  : furigana_ai.generate_readings (並行・クォータ追従・適応バッチ)
+#   cached : 同じ names をもう一度 (ReadingCache があるので API は呼ばれないはず)
+# の所要時間・リクエスト数と、全件の読みがモックの期待値と一致することを確認する。
+
+MODELS = ['gemini-2.0-flash-exp', 'gemini-1.5-pro']
+
+def load_names(limit):
+    with open(os.path.join(ROOT_DIR, 'furigana_dictionary.json'), 'r', encoding='utf-8') as f:
+        readings = json.load(f)
+    names = sorted(readings)[:limit]
+    return names, {n: readings[n] for n in names}
+
+def load_template():
+    with open(os.path.join(ROOT_DIR, 'prompts', 'generation_prompt.txt'), 'r', encoding='utf-8') as f:
+        return f.read()
+
+def run_legacy(names, template, backend, pause, quota_pause):
+    """main.py の変更前と同じ流れ (time.sleep は pause/quota_pause 秒に置き換え)"""
+    results, requests_made = {}, 0
+    for i in range(0, len(names), 10):
+        batch = names[i:i + 10]
+        prompt = build_prompt(template, batch)
+        for model_name in MODELS:
+            requests_made += 1
+            try:
+                results.update(parse_response(backend._post(model_name, prompt)))
+                break
+            except Exception as e:
+                kind = classify_error(e)
+                if kind == 'quota': time.sleep(quota_pause)
+                elif kind == 'not_found': continue
+        time.sleep(pause)
+    return results, requests_made
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark AI furigana generation against a mock LLM server')
+    parser.add_argument('--names', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=1.0, help='Mock response time (seconds)')
+    parser.add_argument('--quota', type=int, default=4, help='Mock requests accepted per window')
+    parser.add_argument('--window', type=float, default=2.0)
+    parser.add_argument('--max-names', type=int, default=20, help='Mock truncates responses for larger batches')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of mock requests answered with 500')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--rate', type=float, default=2.0, help='Initial requests per second for the async engine')
+    parser.add_argument('--legacy-pause', type=float, default=10.0, help='Fixed sleep after each legacy batch')
+    parser.add_argument('--skip-legacy', action='store_true')
+    args = parser.parse_args()
+
+    names, expected = load_names(args.names)
+    template = load_template()
+    status = 0
+
+    def mock():
+        llm = MockLLM(expected, latency=args.latency, quota=args.quota, window=args.window, max_names=args.max_names,
+                      error_rate=args.error_rate)
+        server, base_url = start_server(llm)
+        return llm, server, RestBackend(base_url)
+
+    if not args.skip_legacy:
+        llm, server, backend = mock()
+        start = time.perf_counter()
+        results, requests_made = run_legacy(names, template, backend, args.legacy_pause, 20.0)
+        elapsed = time.perf_counter() - start
+        server.shutdown()
+        print(f"legacy : {elapsed:7.1f}s  {requests_made} requests, {llm.stats['rate_limited']} x 429, "
+              f"{sum(results.get(n) == expected[n] for n in names)}/{len(names)} readings")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ReadingCache(os.path.join(tmp, 'llm_cache.sqlite'))
+        for label in ('async', 'cached'):
+            llm, server, backend = mock()
+            saved = {}
+            def on_batch_done(batch, readings):
+                saved.update(readings)
+            stats = asyncio.run(generate_readings(names, template, backend, MODELS, on_batch_done=on_batch_done,
+                                                  concurrency=args.concurrency, rate=args.rate, cache=cache,
+                                                  log=lambda *a: None))
+            server.shutdown()
+            correct = sum(saved.get(n) == expected[n] for n in names)
+            print(f"{label:<7}: {stats['elapsed']:7.1f}s  {stats['requests']} requests, {llm.stats['rate_limited']} x 429, "
+                  f"{llm.stats['truncated']} truncated, {llm.stats['errors']} x 500, max in flight {llm.stats['max_in_flight']}, "
+                  f"final batch size {stats['final_batch_size']}, {stats['cached']} cached, {correct}/{len(names)} readings")
+            if correct != len(names) or stats['failed'] or stats['remaining']: status = 1
+            if label == 'cached' and stats['requests']: status = 1
+        print(cache.report())
+        cache.close()
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
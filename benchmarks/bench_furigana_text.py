@@ -0,0 +1,97 @@
+import os
+import re
+import sys
+import json
+import time
+import argparse
+
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import furigana_text
+from furigana_text import normalize_furigana, is_valid_furigana, normalize_furigana_series
+
+# --- furigana_text のマイクロベンチマーク ---
+# 変更前の re.sub / re.fullmatch 実装と比べて、
+#   1. 全コードポイント (1文字ずつ) と実データで結果が一致すること
+#   2. 1件ずつの呼び出し (メモ化なし/あり) と、DataFrame 全行への適用の処理時間
+# を確認する。
+
+def legacy_normalize_furigana(reading):
+    if not reading: return ""
+    cleaned = re.sub(r'[\s　]', '', reading)
+    cleaned = re.sub(r'[!！?？"”#＃$＄%％&＆\'’(（)）*＊+＋,，-－.．/／:：;；<＜=＝>＞@＠[［\\￥\]］^＾_＿`｀{｛|｜}｝~～]', '', cleaned)
+    return cleaned
+
+def legacy_is_valid_furigana(reading):
+    if not reading: return False
+    if re.fullmatch(r'[ァ-ヶ・ー]+', reading): return True
+    if re.fullmatch(r'[ぁ-ゖ・ー]+', reading): return True
+    return False
+
+def clear_caches():
+    normalize_furigana.cache_clear()
+    is_valid_furigana.cache_clear()
+
+def check_equivalence(samples):
+    mismatches = 0
+    for c in range(0x110000):
+        if 0xD800 <= c <= 0xDFFF: continue
+        ch = chr(c)
+        if legacy_normalize_furigana(ch) != furigana_text.normalize_furigana.__wrapped__(ch): mismatches += 1
+        if legacy_is_valid_furigana(ch) != furigana_text.is_valid_furigana.__wrapped__(ch): mismatches += 1
+    for s in samples:
+        if legacy_normalize_furigana(s) != normalize_furigana(s): mismatches += 1
+        if legacy_is_valid_furigana(s) != is_valid_furigana(s): mismatches += 1
+    return mismatches
+
+def timed(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-benchmark furigana normalization/validation')
+    parser.add_argument('--csv', default=os.path.join(ROOT_DIR, 'OnePiece_Card_List_All.csv'))
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with open(os.path.join(ROOT_DIR, 'furigana_dictionary.json'), 'r', encoding='utf-8') as f:
+        f_dict = json.load(f)
+    df = pd.read_csv(args.csv, dtype=str).fillna('')
+    # main() と同じく、全行 (重複名を含む) のカード名から辞書の読みを引いた列
+    readings = df['カード名'].map(f_dict).fillna('')
+    samples = list(f_dict) + list(f_dict.values()) + readings.tolist()
+
+    start = time.perf_counter()
+    mismatches = check_equivalence(samples)
+    print(f"Equivalence: {mismatches} mismatches over all code points and {len(samples)} strings "
+          f"({time.perf_counter() - start:.1f}s)")
+
+    values = readings.tolist()
+    rows = [
+        ('normalize', 'legacy re.sub', lambda: [legacy_normalize_furigana(v) for v in values]),
+        ('normalize', 'translate, cold cache', lambda: (clear_caches(), [normalize_furigana(v) for v in values])),
+        ('normalize', 'translate, memoized', lambda: [normalize_furigana(v) for v in values]),
+        ('validate', 'legacy fullmatch x2', lambda: [legacy_is_valid_furigana(v) for v in values]),
+        ('validate', 'set, cold cache', lambda: (clear_caches(), [is_valid_furigana(v) for v in values])),
+        ('validate', 'set, memoized', lambda: [is_valid_furigana(v) for v in values]),
+        ('series', 'legacy .apply', lambda: readings.apply(legacy_normalize_furigana)),
+        ('series', 'normalize_furigana_series', lambda: (clear_caches(), normalize_furigana_series(readings))),
+    ]
+    print(f"{len(values)} rows, {readings.nunique()} unique readings")
+    baseline = {}
+    for group, label, func in rows:
+        t = timed(func, args.repeat)
+        baseline.setdefault(group, t)
+        print(f"  {group:<10} {label:<26} {t * 1000:9.2f} ms  {baseline[group] / t:6.1f}x")
+
+    same = readings.apply(legacy_normalize_furigana).equals(normalize_furigana_series(readings))
+    print(f"Series output identical: {same}")
+    return 0 if mismatches == 0 and same else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
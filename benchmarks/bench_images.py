@@ -0,0 +1,184 @@
+import os
+import sys
+import time
+import json
+import argparse
+import tempfile
+import contextlib
+import io
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import process_images
+from process_images import HttpDownloader, convert_image, SUPPORTED_EXTENSIONS
+from image_derivatives import DERIVATIVE_SPECS, derivative_path, render_derivatives, supported_derivatives
+from benchmarks.drive_stub import DriveStub, start_server, make_corpus
+
+# --- 画像ダウンロード・変換パイプラインのベンチマーク ---
+# ローカルの Drive スタンドイン (応答遅延・500 を再現) に対して、
+#   legacy    : 従来の直列処理 (1件ずつダウンロード -> メインスレッドで変換 -> 固定 sleep)
+#   pipelined : process_images.process_images (ダウンロードスレッド + 変換プロセスプール)
+# の所要時間と、フルサイズJPEG・コピーがバイト単位で一致し、サムネイルも作られていることを確認する。
+# 派生ファイルについては、1回のデコード (render_derivatives) と派生ファイルごとにデコードし直す場合を比べる。
+# あわせて画像マニフェストで、既存出力の取り込み・空の出力フォルダでの差分 (クローンなし)・
+# ソース更新の再変換・ソース削除の検出ができることを確認する。
+
+# pipelined ではサムネイルも作る (process_images の既定はフルサイズだけ)
+PIPELINE_DERIVATIVES = ['full', 'small']
+
+def run_legacy(file_list, output_dir, downloader, pause):
+    """process_images.py の変更前と同じ流れ (time.sleep(1) は pause 秒に置き換え)"""
+    temp_dir = tempfile.mkdtemp()
+    for info in file_list:
+        is_image = os.path.splitext(info['name'])[1].lower() in SUPPORTED_EXTENSIONS
+        out = os.path.join(output_dir, os.path.splitext(info['path'])[0] + ".jpg" if is_image else info['path'])
+        os.makedirs(os.path.dirname(out), exist_ok=True)
+        tmp = os.path.join(temp_dir, info['name'])
+        downloader.download(info['id'], tmp)
+        if is_image:
+            convert_image(tmp, out, ['full'])
+            os.remove(tmp)
+        else:
+            os.replace(tmp, out)
+        time.sleep(pause)
+    os.rmdir(temp_dir)
+
+def read_tree(root):
+    tree = {}
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            with open(path, 'rb') as f:
+                tree[os.path.relpath(path, root)] = f.read()
+    return tree
+
+def render_separately(src_path, output_path, names):
+    """比較用: 派生ファイルごとに開き直し、フルサイズから LANCZOS で縮小する"""
+    from PIL import Image
+    for name in names:
+        spec = DERIVATIVE_SPECS[name]
+        with Image.open(src_path) as img:
+            img = img.convert('RGBA').convert('RGB') if img.mode in ('RGBA', 'LA', 'P') else img.convert('RGB')
+            if spec['max_size']:
+                img.thumbnail(spec['max_size'], Image.LANCZOS)
+            img.save(derivative_path(output_path, name), spec['format'], quality=spec['quality'], **spec['options'])
+
+def bench_derivatives(tmp, files, repeat=3):
+    names = supported_derivatives(list(DERIVATIVE_SPECS))
+    sources = [p for p in files.values() if p.endswith('.png')]
+    out_dir = os.path.join(tmp, 'derivatives')
+    os.makedirs(out_dir, exist_ok=True)
+    timings = {}
+    for label, func in (('separate decodes', render_separately), ('one decode', render_derivatives)):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for src in sources:
+                func(src, os.path.join(out_dir, os.path.basename(src)), names)
+        timings[label] = (time.perf_counter() - start) / repeat
+    sizes = {n: sum(os.path.getsize(derivative_path(os.path.join(out_dir, os.path.basename(src)), n)) for src in sources)
+             for n in names}
+    print(f"derivatives ({', '.join(names)}) for {len(sources)} images: "
+          + ", ".join(f"{k} {v:.2f}s" for k, v in timings.items())
+          + f" ({timings['separate decodes'] / timings['one decode']:.1f}x)")
+    print("  bytes per image: " + ", ".join(f"{n} {sizes[n] // len(sources):,}" for n in names))
+
+def check_manifest(tmp, file_list, files, url):
+    """マニフェストによる差分処理を確認し、問題がなければ True を返す"""
+    for info in file_list:
+        info['size'] = os.path.getsize(files[info['id']])
+    list_path = os.path.join(tmp, 'manifest_list.json')
+    manifest_path = os.path.join(tmp, 'image_manifest.json')
+    def run(out_dir, **kwargs):
+        with open(list_path, 'w', encoding='utf-8') as f:
+            json.dump(file_list, f)
+        with contextlib.redirect_stdout(io.StringIO()):
+            return process_images.process_images(list_path, os.path.join(tmp, out_dir), '', manifest_path=manifest_path,
+                                                 downloader=HttpDownloader(url), **kwargs)
+    adopted = run('pipelined')
+    sparse = run('sparse')
+    # 最初の PNG の中身を変え、最後の1件をリストから消す
+    changed = next(i for i in file_list if i['name'].endswith('.png'))
+    with open(files[changed['id']], 'ab') as f:
+        f.write(b'\0')
+    changed['size'] = os.path.getsize(files[changed['id']])
+    removed = file_list.pop()
+    diffed = run('sparse')
+    file_list.append(removed)
+    ok = (adopted['already_exists'] == len(file_list) and sparse['already_exists'] == len(file_list)
+          and diffed['updated'] == 1 and diffed['deleted'] == 1 and diffed['error'] == 0)
+    print(f"manifest : adopted {adopted['already_exists']}, skipped without outputs {sparse['already_exists']}, "
+          f"re-encoded {diffed['updated']}, deletions reported {diffed['deleted']} -> {'OK' if ok else 'NG'}")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the image download/convert pipeline against a Drive stand-in')
+    parser.add_argument('--files', type=int, default=40)
+    parser.add_argument('--latency', type=float, default=0.3, help='Stand-in response time (seconds)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of downloads answered with 500')
+    parser.add_argument('--workers', type=int, default=process_images.DOWNLOAD_WORKERS)
+    parser.add_argument('--convert-workers', type=int, default=None)
+    parser.add_argument('--rate', type=float, default=10.0, help='Download starts per second for the pipeline')
+    parser.add_argument('--legacy-pause', type=float, default=1.0, help='Fixed sleep after each legacy file')
+    parser.add_argument('--skip-legacy', action='store_true')
+    args = parser.parse_args()
+
+    # 再試行の待ち時間はベンチマークでは短くする
+    process_images.RETRY_BACKOFF = 0.1
+    status = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        file_list, files = make_corpus(os.path.join(tmp, 'source'), args.files)
+        list_path = os.path.join(tmp, 'file_list.json')
+        with open(list_path, 'w', encoding='utf-8') as f:
+            json.dump(file_list, f)
+
+        legacy_tree = None
+        if not args.skip_legacy:
+            drive = DriveStub(files, latency=args.latency)
+            server, url = start_server(drive)
+            start = time.perf_counter()
+            run_legacy(file_list, os.path.join(tmp, 'legacy'), HttpDownloader(url), args.legacy_pause)
+            elapsed = time.perf_counter() - start
+            server.shutdown()
+            legacy_tree = read_tree(os.path.join(tmp, 'legacy'))
+            print(f"legacy   : {elapsed:7.1f}s  {drive.stats['requests']} requests, {len(legacy_tree)} files")
+
+        drive = DriveStub(files, latency=args.latency, error_rate=args.error_rate)
+        server, url = start_server(drive)
+        out_dir = os.path.join(tmp, 'pipelined')
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            counts = process_images.process_images(list_path, out_dir, '', download_workers=args.workers,
+                                                   convert_workers=args.convert_workers, rate=args.rate,
+                                                   downloader=HttpDownloader(url), derivatives=PIPELINE_DERIVATIVES)
+        elapsed = time.perf_counter() - start
+        server.shutdown()
+        tree = read_tree(out_dir)
+        small = [p for p in tree if p.endswith(DERIVATIVE_SPECS['small']['suffix'] + DERIVATIVE_SPECS['small']['ext'])]
+        print(f"pipelined: {elapsed:7.1f}s  {drive.stats['requests']} requests, {drive.stats['errors']} x 500, "
+              f"max in flight {drive.stats['max_in_flight']}, converted {counts['processed']}, "
+              f"copied {counts['copied']}, errors {counts['error']}, {len(small)} thumbnails")
+        if counts['error'] or len(tree) != len(file_list) + counts['processed'] or len(small) != counts['processed']:
+            status = 1
+        if legacy_tree is not None:
+            same = {p: b for p, b in tree.items() if p not in small} == legacy_tree
+            print(f"Full-size outputs identical to legacy: {same}")
+            if not same: status = 1
+
+        # 2回目はすべて既存スキップになるはず
+        with contextlib.redirect_stdout(io.StringIO()):
+            again = process_images.process_images(list_path, out_dir, '', downloader=HttpDownloader(url),
+                                                   derivatives=PIPELINE_DERIVATIVES)
+        print(f"rerun    : {again['already_exists']} already existing, {again['processed'] + again['copied']} new")
+        if again['already_exists'] != len(file_list): status = 1
+
+        bench_derivatives(tmp, files)
+
+        drive = DriveStub(files, latency=args.latency)
+        server, url = start_server(drive)
+        if not check_manifest(tmp, file_list, files, url): status = 1
+        server.shutdown()
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
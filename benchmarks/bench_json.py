@@ -0,0 +1,97 @@
+import os
+import re
+import sys
+import time
+import uuid
+import argparse
+
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+# --- generate_card_json_from_df のベンチマーク ---
+# OnePiece_Card_List_All.csv (df_final) を N 倍に複製し、
+# 従来の iterrows 実装と列単位の実装の処理時間と出力の一致を確認する。
+
+SOURCE_CSV = os.path.join(ROOT_DIR, 'OnePiece_Card_List_All.csv')
+
+def legacy_generate_card_json_from_df(df):
+    """変更前 (iterrows) の実装。比較用にそのまま残している"""
+    cards_list = []
+    seen_ids = set()
+    for _, row in df.iterrows():
+        if row.get('重複フラグ') == '重複': continue
+        c_num = str(row['カード番号']).strip()
+        if not c_num: continue
+
+        img_id = str(row.get('ImageFileID', '')).strip()
+        unique_suffix = img_id if img_id else str(uuid.uuid4())
+        unique_id = f"{c_num}_{unique_suffix}"
+        if unique_id in seen_ids: continue
+        seen_ids.add(unique_id)
+
+        info = str(row['入手情報']).strip()
+        s_title = info; s_code = ''
+        m = re.search(r'(.*)【(.*)】', info)
+        if m: s_title = m.group(1).strip(); s_code = m.group(2).strip()
+
+        def to_int(v):
+            try: return None if not v or str(v).lower() == 'nan' else int(float(v))
+            except: return str(v)
+
+        card_obj = {
+            "uniqueId": unique_id, "cardNumber": c_num, "cardName": str(row['カード名']).strip(),
+            "furigana": str(row.get('フリガナ', '')).strip(), "rarity": str(row['レアリティ']).strip(),
+            "cardType": str(row['種類']).strip(), "color": [c.strip() for c in str(row['色']).split('/') if c.strip()],
+            "costLifeType": str(row['コスト/ライフ種別']).strip(), "costLifeValue": to_int(row['コスト/ライフ値']),
+            "power": to_int(row['パワー']), "counter": to_int(row['カウンター']),
+            "attribute": str(row['属性']).strip(), "features": [f.strip() for f in str(row['特徴']).split('/') if f.strip()],
+            "block": to_int(row['ブロック']), "effectText": str(row['効果テキスト']).strip(),
+            "trigger": str(row['トリガー']).strip(), "getInfo": info, "seriesTitle": s_title, "seriesCode": s_code
+        }
+        cards_list.append(card_obj)
+    return cards_list
+
+def load_scaled_df(scale):
+    """df_final を scale 倍にする。uniqueId が重ならないよう ImageFileID に複製番号を付ける"""
+    df = pd.read_csv(SOURCE_CSV, dtype=str).fillna('')
+    if scale <= 1: return df
+    copies = []
+    for i in range(scale):
+        c = df.copy()
+        c['ImageFileID'] = c['ImageFileID'] + f"_{i}"
+        copies.append(c)
+    return pd.concat(copies, ignore_index=True)
+
+def timed(func, df):
+    start = time.perf_counter()
+    result = func(df)
+    return time.perf_counter() - start, result
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark generate_card_json_from_df')
+    parser.add_argument('--scales', type=int, nargs='*', default=[1, 10, 100])
+    parser.add_argument('--skip-legacy-above', type=int, default=100, help='Do not run the iterrows version above this scale')
+    args = parser.parse_args()
+
+    import warnings
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        import main as app
+
+    print(f"{'scale':>6} {'rows':>8} {'iterrows [s]':>13} {'columnar [s]':>13} {'speedup':>8}  output")
+    for scale in args.scales:
+        df = load_scaled_df(scale)
+        new_time, new_out = timed(app.generate_card_json_from_df, df)
+        if scale > args.skip_legacy_above:
+            print(f"{scale:>6} {len(df):>8} {'-':>13} {new_time:13.3f} {'-':>8}")
+            continue
+        old_time, old_out = timed(legacy_generate_card_json_from_df, df)
+        status = 'identical' if old_out == new_out else 'MISMATCH'
+        print(f"{scale:>6} {len(df):>8} {old_time:13.3f} {new_time:13.3f} {old_time / new_time:7.1f}x  {status}")
+        if status != 'identical': return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+import os
+import sys
+import json
+import time
+import glob
+import argparse
+import tempfile
+import subprocess
+
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from run_metrics import peak_rss_mb
+
+# --- マージステージ (data/*.csv の読み込み・並べ替え・重複判定) のベンチマーク ---
+# data/*.csv と同じ列構成の合成データ (既存の行を CardID を変えて複製) を作り、
+#   legacy : 変更前の実装 (直列の read_csv(dtype=str) + .apply(lambda))
+#   arrow  : main.merge_data_files (pyarrow で並列に読み込み、カテゴリ型 + ベクトル化)
+# の所要時間・DataFrame のメモリ・プロセスのピークメモリを比べ、結果が一致することを確認する。
+# ピークメモリを分けて測るため、各実装は別プロセスで実行する。
+
+DATA_DIR = os.path.join(ROOT_DIR, 'data')
+
+def legacy_merge_data_files(files):
+    """変更前の実装。比較用にそのまま残している"""
+    df_list = [pd.read_csv(f, dtype=str) for f in files]
+    df_all = pd.concat(df_list, ignore_index=True).fillna('')
+    df_all['SortPriority'] = df_all['Rarity'].apply(lambda x: 1 if 'SP' in str(x) else 0)
+    df_all = df_all.sort_values(by=['CardID', 'SortPriority']).reset_index(drop=True)
+    df_all['IsDuplicate'] = df_all.duplicated(subset=['CardID'], keep='first')
+    df_all['IsDuplicate'] = df_all['IsDuplicate'].apply(lambda x: '重複' if x else '')
+    df_all = df_all.drop(columns=['SortPriority'])
+    return df_all
+
+def make_dataset(out_dir, cards, rows_per_file):
+    """data/*.csv の行を、CardID の接頭辞を変えながら cards 行になるまで複製して書き出す"""
+    source = pd.concat([pd.read_csv(f, dtype=str) for f in sorted(glob.glob(os.path.join(DATA_DIR, '*.csv')))],
+                       ignore_index=True)
+    copies, total, i = [], 0, 0
+    while total < cards:
+        c = source.head(cards - total).copy()
+        c['CardID'] = f"S{i:03d}-" + c['CardID'].astype(str)
+        copies.append(c); total += len(c); i += 1
+    df = pd.concat(copies, ignore_index=True)
+    os.makedirs(out_dir, exist_ok=True)
+    for n, start in enumerate(range(0, len(df), rows_per_file)):
+        df.iloc[start:start + rows_per_file].to_csv(os.path.join(out_dir, f"{n:05d}.csv"), index=False)
+    return len(df)
+
+def run_variant(variant, data_dir):
+    import warnings
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        import main as app
+    files = sorted(glob.glob(os.path.join(data_dir, '*.csv')))
+    merge = legacy_merge_data_files if variant == 'legacy' else app.merge_data_files
+    start = time.perf_counter()
+    df = merge(files)
+    elapsed = time.perf_counter() - start
+    # ピークメモリは一致確認 (全列を object にする) の前に測る
+    result = {'variant': variant, 'seconds': elapsed, 'rows': len(df), 'files': len(files),
+              'frame_mb': df.memory_usage(deep=True).sum() / 1024 / 1024, 'peak_rss_mb': peak_rss_mb()}
+    result['digest'] = int(pd.util.hash_pandas_object(df.astype(object), index=False).sum())
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the merge stage on a synthetic dataset')
+    parser.add_argument('--cards', type=int, default=100_000)
+    parser.add_argument('--rows-per-file', type=int, default=200)
+    parser.add_argument('--variant', choices=['legacy', 'arrow'], help=argparse.SUPPRESS)
+    parser.add_argument('--data', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        print(json.dumps(run_variant(args.variant, args.data)))
+        return 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        rows = make_dataset(tmp, args.cards, args.rows_per_file)
+        print(f"{rows:,} rows in {len(os.listdir(tmp))} files")
+        print(f"{'variant':8} {'seconds':>8} {'frame MB':>9} {'peak MB':>8}")
+        results = {}
+        for variant in ('legacy', 'arrow'):
+            out = subprocess.run([sys.executable, os.path.abspath(__file__), '--variant', variant, '--data', tmp],
+                                 check=True, capture_output=True, text=True).stdout
+            r = results[variant] = json.loads(out.strip().splitlines()[-1])
+            print(f"{variant:8} {r['seconds']:8.2f} {r['frame_mb']:9.1f} {r['peak_rss_mb'] or 0:8.1f}")
+    same = results['legacy']['digest'] == results['arrow']['digest']
+    print(f"speedup {results['legacy']['seconds'] / results['arrow']['seconds']:.1f}x, "
+          f"frame {results['legacy']['frame_mb'] / results['arrow']['frame_mb']:.1f}x smaller, output identical: {same}")
+    return 0 if same else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+import os
+import sys
+import json
+import time
+import argparse
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from search_index import SearchIndex, fold_text
+
+# --- search_index の検索レイテンシ ---
+# フロントエンドと同じく毎回全カードの cardName / furigana / effectText を部分一致で走査する方法と、
+# 事前構築した n-gram インデックスでの検索を比較する。
+# インデックスの結果が走査の結果をすべて含むこと (効果テキストは近似なので余分は件数だけ報告) も確認する。
+
+QUERIES = ['ル', 'ルフィ', 'るふぃ', 'モンキー・D', 'ゾロ', 'ドン!!', '登場時', 'KO', 'トラファルガー・ロー', '麦わら 登場時']
+
+def scan(records, query):
+    terms = [fold_text(t) for t in query.split()]
+    out = []
+    for i, r in enumerate(records):
+        texts = (fold_text(r['cardName']), fold_text(r['furigana']), fold_text(r['effectText']))
+        if all(any(t in x for x in texts) for t in terms):
+            out.append(i)
+    return out
+
+def timed(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return (time.perf_counter() - start) / repeat, result
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the n-gram search index against a naive scan')
+    parser.add_argument('--json', default=os.path.join(ROOT_DIR, 'cards.json'))
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with open(args.json, 'r', encoding='utf-8') as f:
+        records = json.load(f)
+    start = time.perf_counter()
+    index = SearchIndex.from_records(records)
+    print(f"Built index for {len(records)} cards in {time.perf_counter() - start:.2f}s")
+
+    print(f"{'query':<22} {'scan':>5} {'index':>6} {'extra':>6} {'scan [ms]':>10} {'index [ms]':>11} {'speedup':>8}")
+    status = 0
+    for query in QUERIES:
+        scan_time, expected = timed(lambda: scan(records, query), max(1, args.repeat // 5))
+        index_time, ranked = timed(lambda: index.search(query), args.repeat)
+        found = {o for o, _ in ranked}
+        missing = set(expected) - found
+        print(f"{query:<22} {len(expected):>5} {len(found):>6} {len(found - set(expected)):>6} "
+              f"{scan_time * 1000:10.2f} {index_time * 1000:11.3f} {scan_time / index_time:7.1f}x"
+              f"{'  MISSING ' + str(len(missing)) if missing else ''}")
+        if missing: status = 1
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+import os
+import io
+import sys
+import csv
+import json
+import time
+import argparse
+import tempfile
+import threading
+import contextlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import scrape_new_cards
+from http_client import HttpClient
+
+# --- scrape_new_cards.py の確認 ---
+# ローカルの対象サイト (/set/<n>.html にカード一覧、/img/<カード番号>.jpg に画像) と
+# TargetSets シートの代わりの CSV を用意し、
+#   serial     : サイト・画像とも1件ずつ (変更前と同じ順序。固定の sleep は除く)
+#   concurrent : サイト・画像を並列に取得 (共有セッション)
+# の所要時間を比べる。あわせて、既存の cards.json にあるカード番号と複数サイトに載っているカードを
+# 取得しないこと、画像がバイト単位で一致し一時ファイルが残らないことを確認する。
+
+def card_number(set_no, i):
+    return f"ST{set_no:02d}-{i:03d}"
+
+def image_bytes(number):
+    return (f"image of {number}\n".encode('utf-8')) * 2000
+
+class TargetSite:
+    def __init__(self, sets, cards_per_set, latency):
+        self.sets = sets
+        self.cards_per_set = cards_per_set
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.image_requests = []
+
+    def page(self, set_no):
+        items = []
+        numbers = [card_number(set_no, i) for i in range(1, self.cards_per_set + 1)]
+        if set_no > 1: numbers.append(card_number(1, 1))  # 別のサイトにも載っているカード
+        for number in numbers:
+            items.append(f'<li class="card_list_item"><span class="card_number">{number}</span>'
+                         f'<span class="card_name">Card {number}</span><img src="../img/{number}.jpg"></li>')
+        return ('<html><body><ul>' + ''.join(items) + '</ul></body></html>').encode('utf-8')
+
+def make_handler(site):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            if site.latency: time.sleep(site.latency)
+            if self.path.startswith('/set/'):
+                body, ctype = site.page(int(self.path[len('/set/'):].split('.')[0])), 'text/html; charset=utf-8'
+            elif self.path.startswith('/img/'):
+                number = self.path[len('/img/'):].rsplit('.', 1)[0]
+                with site.lock: site.image_requests.append(number)
+                body, ctype = image_bytes(number), 'image/jpeg'
+            else:
+                self.send_error(404); return
+            self.send_response(200)
+            self.send_header('Content-Type', ctype)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+    return Handler
+
+def run(site, base_url, tmp, label, workers, image_workers):
+    sheet = os.path.join(tmp, 'sheet.csv')
+    with open(sheet, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['SetName', 'URL'])
+        for n in range(1, site.sets + 1):
+            writer.writerow([f'Set {n}', f'{base_url}/set/{n}.html'])
+    known = os.path.join(tmp, 'cards.json')
+    with open(known, 'w', encoding='utf-8') as f:
+        json.dump([{'cardNumber': card_number(n, 1)} for n in range(2, site.sets + 1)], f)
+
+    image_dir = os.path.join(tmp, label, 'temp_images')
+    site.image_requests.clear()
+    rows = scrape_new_cards.CsvSheetSource(sheet).rows()
+    client = HttpClient(max_workers=max(workers, image_workers), rate=0)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        cards = scrape_new_cards.scrape_new_cards(rows, client, scrape_new_cards.load_known_card_numbers(known),
+                                                  workers, image_workers, image_dir)
+    elapsed = time.perf_counter() - start
+    client.close()
+
+    expected = sorted({card_number(1, 1)} | {card_number(n, i) for n in range(1, site.sets + 1)
+                                            for i in range(1, site.cards_per_set + 1) if i != 1 or n == 1})
+    numbers = sorted(c['cardNumber'] for c in cards)
+    files = sorted(os.listdir(image_dir))
+    images_ok = all(open(os.path.join(image_dir, f"{n}.jpg"), 'rb').read() == image_bytes(n) for n in numbers)
+    ok = (numbers == expected and sorted(site.image_requests) == expected and images_ok
+          and files == [f"{n}.jpg" for n in expected])
+    print(f"{label:10} {elapsed:7.2f}s  {len(cards)} new cards, {len(site.image_requests)} image requests, "
+          f"{len(files)} files -> {'OK' if ok else 'NG'}")
+    return ok, [c['cardNumber'] for c in cards]
+
+def main():
+    parser = argparse.ArgumentParser(description='Check scrape_new_cards.py against a local target site')
+    parser.add_argument('--sets', type=int, default=4)
+    parser.add_argument('--cards', type=int, default=15, help='Cards per set')
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--workers', type=int, default=scrape_new_cards.SITE_WORKERS)
+    parser.add_argument('--image-workers', type=int, default=scrape_new_cards.IMAGE_WORKERS)
+    args = parser.parse_args()
+
+    site = TargetSite(args.sets, args.cards, args.latency)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(site))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            serial_ok, serial_order = run(site, base_url, tmp, 'serial', 1, 1)
+            concurrent_ok, concurrent_order = run(site, base_url, tmp, 'concurrent', args.workers, args.image_workers)
+    finally:
+        server.shutdown()
+    same_order = serial_order == concurrent_order
+    print(f"Same cards in the same order: {same_order}")
+    return 0 if serial_ok and concurrent_ok and same_order else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
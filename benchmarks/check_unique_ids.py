@@ -0,0 +1,80 @@
+import os
+import sys
+import zlib
+import difflib
+import argparse
+import tempfile
+
+import pandas as pd
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from card_export import write_cards
+from benchmarks.bench_json import SOURCE_CSV, legacy_generate_card_json_from_df
+
+# --- uniqueId の安定性チェック ---
+# ImageFileID を空にした df_final から cards.json を2回ビルドし、
+#   legacy : 従来の uuid4 サフィックス
+#   stable : main.stable_card_ids (カード番号・入手情報・レアリティ・出現順のハッシュ)
+# それぞれで2回の出力の差分 (行数・バイト数・zlib 圧縮後のバイト数 ≒ git に入る量) を比べる。
+# stable では、何度ビルドしても・行の順序を入れ替えても同じ ID の集合になり、ID が重ならないことも確認する。
+
+def load_df(blank_share, seed):
+    df = pd.read_csv(SOURCE_CSV, dtype=str).fillna('')
+    blank = df.sample(frac=blank_share, random_state=seed).index
+    df.loc[blank, 'ImageFileID'] = ''
+    return df
+
+def build_text(records, tmp, name):
+    path = os.path.join(tmp, name)
+    write_cards(records, path)
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+def diff_size(old, new):
+    old_lines, new_lines = old.splitlines(True), new.splitlines(True)
+    if len(old_lines) == len(new_lines):
+        # 行数が同じ (ID の行だけが変わる) なら行ごとに比べる (difflib は変更行が多いと遅い)
+        diff = ''.join('-' + a + '+' + b for a, b in zip(old_lines, new_lines) if a != b)
+    else:
+        diff = ''.join(difflib.unified_diff(old_lines, new_lines, n=0))
+    lines = sum(1 for line in diff.splitlines() if line[:1] in '+-' and line[:3] not in ('+++', '---'))
+    data = diff.encode('utf-8')
+    return lines, len(data), len(zlib.compress(data, 9)) if data else 0
+
+def main():
+    parser = argparse.ArgumentParser(description='Check that uniqueIds are stable across repeated builds')
+    parser.add_argument('--blank-share', type=float, default=1.0, help='Share of rows whose ImageFileID is emptied')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    import warnings
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        import main as app
+
+    df = load_df(args.blank_share, args.seed)
+    print(f"{len(df)} rows, {int((df['ImageFileID'] == '').sum())} without ImageFileID")
+    status = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'':8} {'changed lines':>14} {'diff bytes':>12} {'compressed':>11}")
+        for label, build in (('legacy', legacy_generate_card_json_from_df), ('stable', app.generate_card_json_from_df)):
+            first = build_text(build(df), tmp, f'{label}_1.json')
+            second = build_text(build(df), tmp, f'{label}_2.json')
+            lines, size, packed = diff_size(first, second)
+            print(f"{label:8} {lines:>14,} {size:>12,} {packed:>11,}")
+            if label == 'stable' and first != second: status = 1
+
+        records = app.generate_card_json_from_df(df)
+        ids = [r['uniqueId'] for r in records]
+        shuffled = app.generate_card_json_from_df(df.sample(frac=1.0, random_state=args.seed + 1))
+        # カード番号・入手情報・レアリティまで同じ行同士は出現順で区別するので、比べるのは ID の集合
+        same_after_shuffle = set(ids) == {r['uniqueId'] for r in shuffled}
+        unique = len(ids) == len(set(ids))
+        print(f"Stable across builds: {status == 0}, unique: {unique}, same ids after shuffling rows: {same_after_shuffle}")
+        if not (unique and same_after_shuffle): status = 1
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+import os
+import io
+import sys
+import json
+import shutil
+import argparse
+import contextlib
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from benchmarks import fixtures
+from benchmarks.stub_server import FixtureSite, start_server
+from benchmarks.run_benchmarks import DATA_DIR, prepare_workdir, import_main
+
+# --- 監視モード (--watch) の確認 ---
+# スタンドインサーバーに対して main.py --watch --watch-cycles 1 を繰り返し実行し、
+#   1回目 : 空の data/ から全シリーズを取得して出力を作る
+#   2回目 : 何も変わっていなければ、シリーズ一覧と1ページ目だけを確認して取得も作り直しもしない
+#   3回目 : 1ページ目のカードを書き換えたシリーズと新しく追加したシリーズだけを取得して作り直す
+# ことを、リクエスト数・取得したシリーズ・CSV と cards.json の内容で確認する。
+
+def run_cycle(main, workdir, site, extra_args):
+    before = site.request_count
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    out = io.StringIO()
+    try:
+        sys.argv = ['main.py', '--skip-ai', '--rate', '0', '--watch', '--watch-cycles', '1', '--no-report'] + extra_args
+        with contextlib.redirect_stdout(out):
+            main.main()
+    finally:
+        os.chdir(cwd)
+    log = out.getvalue()
+    fetched = sorted(line.split('(')[-1].rstrip(').') for line in log.splitlines() if line.startswith('[Fetch] '))
+    return {'requests': site.request_count - before, 'fetched': fetched, 'rebuilt': 'Saved CSV:' in log, 'log': log}
+
+def main():
+    parser = argparse.ArgumentParser(description='Check --watch against the local stand-in site')
+    parser.add_argument('--series', type=int, default=6, help='Number of series served by the stand-in')
+    parser.add_argument('--watch-workers', type=int, default=4)
+    parser.add_argument('--verbose', action='store_true', help='Print the log of every cycle')
+    args = parser.parse_args()
+
+    app = import_main()
+    codes = sorted(fixtures.load_series_rows(DATA_DIR))[:args.series + 1]
+    added_code, codes = codes[-1], codes[:-1]
+    series = fixtures.load_series_rows(DATA_DIR, codes)
+    site = FixtureSite()
+    site.set_series_list(fixtures.render_series_list(series))
+    for code, rows in series.items():
+        site.set_series(code, rows)
+    server, app.BASE_URL = start_server(site)
+    workdir = prepare_workdir(with_data=False)
+    extra = ['--watch-workers', str(args.watch_workers)]
+    status = 0
+    try:
+        results = []
+        first = run_cycle(app, workdir, site, extra)
+        results.append(('initial', first, sorted(codes), True))
+        second = run_cycle(app, workdir, site, extra)
+        results.append(('unchanged', second, [], False))
+
+        # 1ページ目の最初のカードの効果テキストを書き換え (エラッタ)、シリーズを1つ追加する
+        changed_code = codes[0]
+        rows = [dict(r) for r in series[changed_code]]
+        rows[0]['Text'] = rows[0]['Text'] + '(エラッタ)'
+        site.set_series(changed_code, rows)
+        series[added_code] = fixtures.load_series_rows(DATA_DIR, [added_code])[added_code]
+        site.set_series(added_code, series[added_code])
+        site.set_series_list(fixtures.render_series_list(series))
+        third = run_cycle(app, workdir, site, extra)
+        results.append(('errata + new', third, sorted([changed_code, added_code]), True))
+
+        print(f"{'cycle':14} {'requests':>8}  fetched")
+        for label, r, expected, rebuilt in results:
+            ok = r['fetched'] == expected and r['rebuilt'] == rebuilt
+            print(f"{label:14} {r['requests']:>8}  {', '.join(r['fetched']) or '-'}"
+                  f"{'  (outputs rebuilt)' if r['rebuilt'] else ''} -> {'OK' if ok else 'NG'}")
+            if args.verbose: print(r['log'])
+            if not ok: status = 1
+
+        with open(os.path.join(workdir, 'data', f'{changed_code}.csv'), 'r', encoding='utf-8-sig') as f:
+            csv_has_errata = '(エラッタ)' in f.read()
+        with open(os.path.join(workdir, 'cards.json'), 'r', encoding='utf-8') as f:
+            json_has_errata = any('(エラッタ)' in c['effectText'] for c in json.load(f))
+        print(f"Errata in CSV: {csv_has_errata}, in cards.json: {json_has_errata}; "
+              f"unchanged cycle cost {second['requests']} requests for {len(codes)} series")
+        if not (csv_has_errata and json_has_errata) or second['requests'] != len(codes) + 1: status = 1
+    finally:
+        server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
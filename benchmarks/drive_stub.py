@@ -0,0 +1,137 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from PIL import Image
+
+# --- Google Drive ダウンロード (uc?id=...) のスタンドイン ---
+# GET /uc?id=<ファイルID> で、file_list.json の id に対応するローカルファイルを返す。
+# process_images.py は GDRIVE_DOWNLOAD_URL=http://127.0.0.1:<port>/uc?id={id} でこちらから取得する。
+# 以下を再現できる:
+#   latency     : 1リクエストあたりの応答時間
+#   error_rate  : ランダムに 500 を返す割合 (再試行の確認用)
+
+class DriveStub:
+    def __init__(self, files, latency=0.2, error_rate=0.0, seed=0):
+        self.files = files  # {ファイルID: ローカルパス}
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'ok': 0, 'errors': 0, 'not_found': 0, 'bytes': 0, 'max_in_flight': 0}
+        self.in_flight = 0
+
+    def count(self, key, n=1):
+        with self.lock:
+            self.stats[key] += n
+
+def make_handler(drive):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def send_status(self, status):
+            self.send_response(status)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def do_GET(self):
+            drive.count('requests')
+            file_id = parse_qs(urlparse(self.path).query).get('id', [''])[0]
+            path = drive.files.get(file_id)
+            if not path or not os.path.exists(path):
+                drive.count('not_found')
+                self.send_status(404); return
+            with drive.lock:
+                drive.in_flight += 1
+                drive.stats['max_in_flight'] = max(drive.stats['max_in_flight'], drive.in_flight)
+                fail = drive.error_rate and drive.random.random() < drive.error_rate
+            try:
+                if drive.latency: time.sleep(drive.latency)
+                if fail:
+                    drive.count('errors')
+                    self.send_status(500); return
+                with open(path, 'rb') as f:
+                    body = f.read()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/octet-stream')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                drive.count('ok')
+                drive.count('bytes', len(body))
+            finally:
+                with drive.lock:
+                    drive.in_flight -= 1
+
+        def log_message(self, format, *args):
+            pass
+    return Handler
+
+def start_server(drive, host='127.0.0.1', port=0):
+    """バックグラウンドスレッドでサーバーを起動し、(server, ダウンロードURLテンプレート) を返す"""
+    server = ThreadingHTTPServer((host, port), make_handler(drive))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}/uc?id={{id}}"
+
+def make_corpus(source_dir, count=40, size=(600, 838), seed=0):
+    """
+    カード画像に近いサイズの PNG (RGBA / パレット透過 / RGB) とテキストファイルを作り、
+    process_images.py 用のリスト [{id, name, path}] と {id: ローカルパス} を返す。
+    """
+    rnd = random.Random(seed)
+    os.makedirs(source_dir, exist_ok=True)
+    file_list, files = [], {}
+    for i in range(count):
+        folder = f"OP{i % 5 + 1:02d}"
+        mode = ('RGBA', 'P', 'RGB')[i % 3]
+        name = f"OP{i % 5 + 1:02d}-{i:03d}.png"
+        if i % 10 == 9: name = f"note_{i:03d}.txt"
+        file_id = f"id{i:05d}"
+        path = os.path.join(source_dir, file_id + os.path.splitext(name)[1])
+        if name.endswith('.txt'):
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(f"note {i}\n")
+        else:
+            # ノイズ入りのグラデーション (デコード・エンコードにそれなりに時間がかかるように)
+            img = Image.effect_noise(size, 40 + i % 30).convert('RGB')
+            img = Image.blend(img, Image.linear_gradient('L').resize(size).convert('RGB'), 0.5)
+            if mode == 'RGBA':
+                img = img.convert('RGBA')
+                img.putalpha(Image.linear_gradient('L').resize(size))
+            elif mode == 'P':
+                img = img.convert('P', palette=Image.ADAPTIVE)
+                img.info['transparency'] = rnd.randrange(256)
+            img.save(path)
+        file_list.append({'id': file_id, 'name': name, 'path': f"{folder}/{name}"})
+        files[file_id] = path
+    return file_list, files
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Local stand-in for Google Drive file downloads')
+    parser.add_argument('--port', type=int, default=8767)
+    parser.add_argument('--latency', type=float, default=0.2)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--source', default='./drive_stub_files', help='Directory for the generated files')
+    parser.add_argument('--count', type=int, default=40)
+    parser.add_argument('--file-list', default='./file_list.json', help='Where to write the generated file list')
+    args = parser.parse_args()
+
+    file_list, files = make_corpus(args.source, args.count)
+    with open(args.file_list, 'w', encoding='utf-8') as f:
+        json.dump(file_list, f, ensure_ascii=False, indent=2)
+    drive = DriveStub(files, latency=args.latency, error_rate=args.error_rate)
+    server, url = start_server(drive, port=args.port)
+    print(f"Serving {len(files)} files at {url} (set GDRIVE_DOWNLOAD_URL={url}; list: {args.file_list}; Ctrl+C to stop)")
+    try:
+        while True: time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        sys.exit(0)
@@ -0,0 +1,109 @@
+import os
+import csv
+import html
+import glob
+from collections import Counter
+
+# --- オフライン用HTMLフィクスチャ ---
+# data/*.csv の内容から、公式カードリストと同じ構造
+# (select[name=series] / dl.modalCol / div.pager) のページを組み立てる。
+
+CARDS_PER_PAGE = 60
+SERIES_LIST_FILE = 'series_list.html'
+
+PAGE_HEAD = '<!DOCTYPE html>\n<html lang="ja"><head><meta charset="utf-8"><title>カードリスト</title></head><body>\n'
+PAGE_FOOT = '\n</body></html>\n'
+
+def _esc(text):
+    return html.escape(text, quote=False)
+
+def load_series_rows(data_dir, codes=None):
+    """data/<code>.csv を {code: [row, ...]} で返す (CSVの列名のまま)"""
+    series = {}
+    for path in sorted(glob.glob(os.path.join(data_dir, '*.csv'))):
+        code = os.path.splitext(os.path.basename(path))[0]
+        if codes and code not in codes: continue
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            series[code] = list(csv.DictReader(f))
+    return series
+
+def series_name(rows):
+    # シリーズ名は入手情報で最も多いものを使う
+    if not rows: return ''
+    return Counter(r.get('SetInfo', '') for r in rows).most_common(1)[0][0]
+
+def render_series_list(series):
+    options = ['<option value="">ALL</option>']
+    for code, rows in series.items():
+        options.append(f'<option value="{code}">{_esc(series_name(rows))}</option>')
+    return (PAGE_HEAD + '<form><select name="series">\n' + '\n'.join(options) + '\n</select></form>\n'
+            + '<div class="resultCol"></div>' + PAGE_FOOT)
+
+def render_card(r):
+    # 効果テキストは文ごとに <br> を挟み、属性はアイコン画像の alt で表す (実サイトと同じ)
+    text = _esc(r['Text']).replace('。【', '。<br>【')
+    cost = ''
+    if r['Cost_Life_Type']:
+        cost = f'<div class="cost"><h3>{_esc(r["Cost_Life_Type"])}</h3>{_esc(r["Cost_Life_Value"])}</div>'
+    return (
+        f'<dl class="modalCol" id="{html.escape(r["CardID"])}">\n'
+        f'<dt><div class="infoCol"><span>{_esc(r["CardID"])}</span> | <span>{_esc(r["Rarity"])}</span> | '
+        f'<span>{_esc(r["Type"])}</span></div>\n'
+        f'<div class="cardName">{_esc(r["Name"])}</div></dt>\n'
+        f'<dd><div class="frontCol"><img class="lazy" src="../images/common/{html.escape(r["ImageFileID"])}" '
+        f'alt="{html.escape(r["Name"])}"></div>\n'
+        f'<div class="backCol">\n'
+        f'<div class="col2">{cost}\n'
+        f'<div class="attribute"><h3>属性</h3><img src="../images/cardlist/attribute/ico_type.png" '
+        f'alt="{html.escape(r["Attribute"])}"></div></div>\n'
+        f'<div class="col2"><div class="power"><h3>パワー</h3>{_esc(r["Power"])}</div>\n'
+        f'<div class="counter"><h3>カウンター</h3>{_esc(r["Counter"])}</div></div>\n'
+        f'<div class="col2"><div class="color"><h3>色</h3>{_esc(r["Color"])}</div>\n'
+        f'<div class="block"><h3>ブロックアイコン</h3>{_esc(r["Block"])}</div></div>\n'
+        f'<div class="feature"><h3>特徴</h3>{_esc(r["Feature"])}</div>\n'
+        f'<div class="text"><h3>テキスト</h3>{text}</div>\n'
+        f'<div class="trigger"><h3>トリガー</h3>{_esc(r["Trigger"])}</div>\n'
+        f'<div class="getInfo"><h3>入手情報</h3>{_esc(r["SetInfo"])}</div>\n'
+        f'</div></dd></dl>'
+    )
+
+def page_count(rows, per_page=CARDS_PER_PAGE):
+    return max(1, (len(rows) + per_page - 1) // per_page)
+
+def render_card_page(rows, page, per_page=CARDS_PER_PAGE):
+    """page は1始まり。最終ページ以外の pager には NEXT を付ける"""
+    chunk = rows[(page - 1) * per_page: page * per_page]
+    pager = '<div class="pager">'
+    if page > 1: pager += f'<a href="?page={page - 1}">PREV</a>'
+    if page < page_count(rows, per_page): pager += f'<a href="?page={page + 1}">NEXT</a>'
+    pager += '</div>'
+    cards = '\n'.join(render_card(r) for r in chunk)
+    return PAGE_HEAD + '<div class="resultCol">\n' + cards + '\n</div>\n' + pager + PAGE_FOOT
+
+def card_page_filename(code, page):
+    return f"{code}_p{page}.html"
+
+def build_corpus(data_dir, out_dir, codes=None, per_page=CARDS_PER_PAGE):
+    """シリーズ一覧ページと各シリーズのカードリストページを out_dir に書き出す"""
+    series = load_series_rows(data_dir, codes)
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, SERIES_LIST_FILE), 'w', encoding='utf-8') as f:
+        f.write(render_series_list(series))
+    written = 1
+    for code, rows in series.items():
+        for page in range(1, page_count(rows, per_page) + 1):
+            with open(os.path.join(out_dir, card_page_filename(code, page)), 'w', encoding='utf-8') as f:
+                f.write(render_card_page(rows, page, per_page))
+            written += 1
+    return written
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description='Render offline HTML fixtures from data/*.csv')
+    parser.add_argument('--data', default='data', help='Source CSV directory')
+    parser.add_argument('--out', default=os.path.join('fixtures', 'pages'), help='Output directory')
+    parser.add_argument('--codes', nargs='*', help='Series codes to include (default: all)')
+    parser.add_argument('--per-page', type=int, default=CARDS_PER_PAGE)
+    args = parser.parse_args()
+    n = build_corpus(args.data, args.out, args.codes, args.per_page)
+    print(f"Wrote {n} pages to {args.out}")
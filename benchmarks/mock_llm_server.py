@@ -0,0 +1,153 @@
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- LLM (generateContent) のスタンドイン ---
+# POST /v1beta/models/<model>:generateContent
+# プロンプト末尾の JSON 配列 (カード名) を読み、{"カード名": "ヨミ"} を返す。
+# 以下を再現できる:
+#   latency     : 1リクエストあたりの応答時間
+#   quota       : window 秒あたりの受付件数。超えると 429 + Retry-After
+#   max_names   : これより多い名前を含むバッチは出力が途中で切れた (壊れた JSON) 応答にする
+#   error_rate  : ランダムに 500 を返す割合
+#   models      : 存在するモデル名 (それ以外は 404)
+
+KANA_TO_KATA = {c: c + 0x60 for c in range(0x3041, 0x3097)}
+
+class MockLLM:
+    def __init__(self, readings=None, latency=0.5, quota=0, window=1.0, max_names=0,
+                 error_rate=0.0, models=None, seed=0):
+        self.readings = readings or {}
+        self.latency = latency
+        self.quota = quota
+        self.window = window
+        self.max_names = max_names
+        self.error_rate = error_rate
+        self.models = set(models) if models else None
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.accepted = deque()
+        self.stats = {'requests': 0, 'ok': 0, 'rate_limited': 0, 'truncated': 0, 'errors': 0, 'not_found': 0,
+                      'max_in_flight': 0}
+        self.in_flight = 0
+
+    def reading_for(self, name):
+        if name in self.readings: return self.readings[name]
+        kata = name.translate(KANA_TO_KATA)
+        return kata if re.fullmatch(r'[ァ-ー]+', kata) else 'ヨミ'
+
+    def admit(self):
+        """クォータ内なら None、超えていれば Retry-After 秒を返す"""
+        if not self.quota: return None
+        now = time.monotonic()
+        with self.lock:
+            while self.accepted and now - self.accepted[0] >= self.window:
+                self.accepted.popleft()
+            if len(self.accepted) >= self.quota:
+                return max(0.0, self.window - (now - self.accepted[0]))
+            self.accepted.append(now)
+        return None
+
+    def count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+def extract_names(prompt):
+    match = re.search(r'(\[[^\[\]]*\])\s*$', prompt)
+    return json.loads(match.group(1)) if match else []
+
+def make_handler(llm):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def send_json(self, status, data, headers=None):
+            body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            for k, v in (headers or {}).items(): self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            llm.count('requests')
+            match = re.search(r'/models/([^/:]+):generateContent$', self.path.split('?')[0])
+            if not match:
+                self.send_json(404, {'error': {'code': 404, 'message': 'Not found'}}); return
+            model = match.group(1)
+            if llm.models is not None and model not in llm.models:
+                llm.count('not_found')
+                self.send_json(404, {'error': {'code': 404, 'message': f'models/{model} is not found'}}); return
+            retry_after = llm.admit()
+            if retry_after is not None:
+                llm.count('rate_limited')
+                self.send_json(429, {'error': {'code': 429, 'message': 'Resource has been exhausted (e.g. check quota).'}},
+                               {'Retry-After': f'{retry_after:.2f}'})
+                return
+
+            with llm.lock:
+                llm.in_flight += 1
+                llm.stats['max_in_flight'] = max(llm.stats['max_in_flight'], llm.in_flight)
+            try:
+                if llm.latency: time.sleep(llm.latency)
+                if llm.error_rate and llm.random.random() < llm.error_rate:
+                    llm.count('errors')
+                    self.send_json(500, {'error': {'code': 500, 'message': 'Internal error'}}); return
+                prompt = json.loads(body)['contents'][0]['parts'][0]['text']
+                names = extract_names(prompt)
+                text = json.dumps({n: llm.reading_for(n) for n in names}, ensure_ascii=False, indent=1)
+                if llm.max_names and len(names) > llm.max_names:
+                    # 出力トークン上限で切れたような応答
+                    llm.count('truncated')
+                    text = text[:len(text) // 2]
+                else:
+                    llm.count('ok')
+                self.send_json(200, {'candidates': [{'content': {'parts': [{'text': text}]}}]})
+            finally:
+                with llm.lock:
+                    llm.in_flight -= 1
+
+        def log_message(self, format, *args):
+            pass
+    return Handler
+
+def start_server(llm, host='127.0.0.1', port=0):
+    """バックグラウンドスレッドでサーバーを起動し、(server, ベースURL) を返す"""
+    server = ThreadingHTTPServer((host, port), make_handler(llm))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}/v1beta"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Local stand-in for the Gemini generateContent API')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--latency', type=float, default=0.5)
+    parser.add_argument('--quota', type=int, default=0, help='Requests accepted per window (0 = unlimited)')
+    parser.add_argument('--window', type=float, default=1.0)
+    parser.add_argument('--max-names', type=int, default=0, help='Truncate responses for larger batches')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--dictionary', default='', help='furigana_dictionary.json used for the readings')
+    args = parser.parse_args()
+
+    readings = {}
+    if args.dictionary and os.path.exists(args.dictionary):
+        with open(args.dictionary, 'r', encoding='utf-8') as f:
+            readings = json.load(f)
+    llm = MockLLM(readings, latency=args.latency, quota=args.quota, window=args.window,
+                  max_names=args.max_names, error_rate=args.error_rate)
+    server, base_url = start_server(llm, port=args.port)
+    print(f"Serving mock LLM at {base_url} (set FURIGANA_LLM_URL={base_url}; Ctrl+C to stop)")
+    try:
+        while True: time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        sys.exit(0)
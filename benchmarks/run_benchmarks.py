@@ -0,0 +1,195 @@
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import argparse
+import resource
+import tempfile
+import subprocess
+import contextlib
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from benchmarks import fixtures
+from benchmarks.stub_server import FixtureSite, start_server
+
+# --- スクレイピング経路のベンチマーク ---
+# 各ケースは別プロセスで実行し、ピークメモリ (ru_maxrss) をケースごとに測る。
+#   parse:<engine>  レンダリング済みページをメモリ上で解析 (HTTPなし)
+#   fetch:<engine>  スタンドインサーバー経由で fetch_cards_from_series を全シリーズ実行
+#   merge           data/*.csv が揃った状態で main() を実行 (マージ + CSV/JSON出力のみ)
+#   e2e:<engine>    空の data/ から main() を実行 (取得 + 解析 + マージ + JSON出力)
+
+DATA_DIR = os.path.join(ROOT_DIR, 'data')
+THRESHOLDS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'thresholds.json')
+WORK_FILES = ['furigana_dictionary.json', 'unverified_cards.json', 'verified_cards.json', 'prompts']
+
+def peak_rss_mb():
+    # Linux では KB 単位
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def prepare_workdir(with_data):
+    workdir = tempfile.mkdtemp(prefix='op_bench_')
+    for name in WORK_FILES:
+        src = os.path.join(ROOT_DIR, name)
+        if os.path.isdir(src): shutil.copytree(src, os.path.join(workdir, name))
+        elif os.path.exists(src): shutil.copy(src, workdir)
+    if with_data: shutil.copytree(DATA_DIR, os.path.join(workdir, 'data'))
+    else: os.makedirs(os.path.join(workdir, 'data'))
+    return workdir
+
+def import_main():
+    import warnings
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        import main
+    return main
+
+def run_main(main, workdir, argv):
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        sys.argv = ['main.py', '--skip-ai', '--no-http-cache', '--rate', '0'] + argv
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            main.main()
+            elapsed = time.perf_counter() - start
+        with open(os.path.join(workdir, 'cards.json'), 'r', encoding='utf-8') as f:
+            cards = len(json.load(f))
+    finally:
+        os.chdir(cwd)
+    return elapsed, cards
+
+def case_parse(engine):
+    import card_parser
+    series = fixtures.load_series_rows(DATA_DIR)
+    pages = [fixtures.render_card_page(rows, p)
+             for rows in series.values() for p in range(1, fixtures.page_count(rows) + 1)]
+    start = time.perf_counter()
+    cards = 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        for html in pages:
+            rows, _ = card_parser.parse_card_page(html, engine)
+            cards += len(rows)
+    return {'seconds': time.perf_counter() - start, 'cards': cards, 'pages': len(pages)}
+
+def case_fetch(engine):
+    main = import_main()
+    site = FixtureSite.from_data_dir(DATA_DIR)
+    server, base_url = start_server(site)
+    main.BASE_URL = base_url
+    main.configure_http_client(4, 0, cache_dir=None)
+    codes = sorted(fixtures.load_series_rows(DATA_DIR))
+    start = time.perf_counter()
+    cards = 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        for code in codes:
+            cards += len(main.fetch_cards_from_series(code, engine=engine))
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+    return {'seconds': elapsed, 'cards': cards, 'requests': site.request_count, 'bytes': site.bytes_sent}
+
+def case_merge():
+    main = import_main()
+    site = FixtureSite()
+    site.set_series_list(fixtures.render_series_list({}))  # 取得対象なし
+    server, main.BASE_URL = start_server(site)
+    workdir = prepare_workdir(with_data=True)
+    try:
+        elapsed, cards = run_main(main, workdir, [])
+    finally:
+        server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {'seconds': elapsed, 'cards': cards}
+
+def case_e2e(engine):
+    main = import_main()
+    site = FixtureSite.from_data_dir(DATA_DIR)
+    server, main.BASE_URL = start_server(site)
+    workdir = prepare_workdir(with_data=False)
+    try:
+        elapsed, cards = run_main(main, workdir, ['--parser', engine])
+    finally:
+        server.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {'seconds': elapsed, 'cards': cards, 'requests': site.request_count}
+
+def run_case(name):
+    kind, _, engine = name.partition(':')
+    if kind == 'parse': result = case_parse(engine)
+    elif kind == 'fetch': result = case_fetch(engine)
+    elif kind == 'merge': result = case_merge()
+    elif kind == 'e2e': result = case_e2e(engine)
+    else: raise ValueError(f"Unknown case: {name}")
+    result['case'] = name
+    if result.get('cards') and result['seconds'] > 0:
+        result['cards_per_sec'] = result['cards'] / result['seconds']
+    result['peak_rss_mb'] = peak_rss_mb()
+    return result
+
+def run_in_subprocess(name):
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--case', name],
+                          capture_output=True, text=True, cwd=ROOT_DIR)
+    if proc.returncode != 0:
+        print(proc.stderr, file=sys.stderr)
+        raise RuntimeError(f"Benchmark case failed: {name}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def check_thresholds(results, thresholds):
+    failures = []
+    by_case = {r['case']: r for r in results}
+    for case, minimum in thresholds.get('min_cards_per_sec', {}).items():
+        if case in by_case and by_case[case].get('cards_per_sec', 0) < minimum:
+            failures.append(f"{case}: {by_case[case].get('cards_per_sec', 0):.0f} cards/sec < {minimum}")
+    for case, maximum in thresholds.get('max_seconds', {}).items():
+        if case in by_case and by_case[case]['seconds'] > maximum:
+            failures.append(f"{case}: {by_case[case]['seconds']:.2f}s > {maximum}s")
+    for case, maximum in thresholds.get('max_peak_rss_mb', {}).items():
+        if case in by_case and by_case[case]['peak_rss_mb'] > maximum:
+            failures.append(f"{case}: {by_case[case]['peak_rss_mb']:.0f}MB > {maximum}MB")
+    return failures
+
+def default_cases():
+    from card_parser import PARSER_ENGINES
+    engines = sorted(PARSER_ENGINES)
+    return ([f"parse:{e}" for e in engines] + [f"fetch:{e}" for e in engines]
+            + ['merge'] + [f"e2e:{e}" for e in engines])
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline benchmarks for the scraping hot path')
+    parser.add_argument('--case', help=argparse.SUPPRESS)  # 子プロセス用
+    parser.add_argument('--cases', nargs='*', help='Cases to run (default: all)')
+    parser.add_argument('--output', help='Write results as JSON to this path')
+    parser.add_argument('--check', action='store_true', help='Exit 1 when a threshold in thresholds.json is violated')
+    parser.add_argument('--thresholds', default=THRESHOLDS_FILE)
+    args = parser.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(args.case)))
+        return 0
+
+    results = []
+    print(f"{'case':<12} {'seconds':>9} {'cards':>7} {'cards/sec':>10} {'peak MB':>8}")
+    for name in args.cases or default_cases():
+        r = run_in_subprocess(name)
+        results.append(r)
+        print(f"{name:<12} {r['seconds']:9.3f} {r.get('cards', 0):7d} {r.get('cards_per_sec', 0):10.0f} {r['peak_rss_mb']:8.1f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.check:
+        with open(args.thresholds, 'r', encoding='utf-8') as f:
+            failures = check_thresholds(results, json.load(f))
+        for msg in failures:
+            print(f"[Regression] {msg}")
+        if failures: return 1
+        print("All benchmark thresholds passed.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+import os
+import sys
+import time
+import glob
+import hashlib
+import argparse
+import threading
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks import fixtures
+
+# --- 公式カードリストのスタンドイン ---
+# /cardlist/                      -> シリーズ一覧 (select[name=series])
+# /cardlist/?series=X&page=N      -> カードリスト N ページ目 (pager に NEXT)
+# ETag / Last-Modified を返し、条件付きGETには 304 で応答する。
+
+class FixtureSite:
+    """(series, page) -> HTML本文 を保持する。ページは後から差し替え可能 (更新検知のテスト用)"""
+    def __init__(self):
+        self.series_list = b''
+        self.pages = {}
+        self.modified = {}
+        self.lock = threading.Lock()
+        self.request_count = 0
+        self.bytes_sent = 0
+
+    @classmethod
+    def from_data_dir(cls, data_dir, codes=None, per_page=fixtures.CARDS_PER_PAGE):
+        site = cls()
+        series = fixtures.load_series_rows(data_dir, codes)
+        site.set_series_list(fixtures.render_series_list(series))
+        for code, rows in series.items():
+            site.set_series(code, rows, per_page)
+        return site
+
+    @classmethod
+    def from_corpus(cls, corpus_dir):
+        site = cls()
+        with open(os.path.join(corpus_dir, fixtures.SERIES_LIST_FILE), 'r', encoding='utf-8') as f:
+            site.set_series_list(f.read())
+        for path in glob.glob(os.path.join(corpus_dir, '*_p*.html')):
+            code, page = os.path.basename(path)[:-len('.html')].rsplit('_p', 1)
+            with open(path, 'r', encoding='utf-8') as f:
+                site.set_page(code, int(page), f.read())
+        return site
+
+    def set_series_list(self, text):
+        with self.lock:
+            self.series_list = text.encode('utf-8')
+            self.modified[None] = time.time()
+
+    def set_page(self, code, page, text):
+        with self.lock:
+            self.pages[(code, page)] = text.encode('utf-8')
+            self.modified[(code, page)] = time.time()
+
+    def set_series(self, code, rows, per_page=fixtures.CARDS_PER_PAGE):
+        with self.lock:
+            for key in [k for k in self.pages if k[0] == code]:
+                del self.pages[key]
+        for page in range(1, fixtures.page_count(rows, per_page) + 1):
+            self.set_page(code, page, fixtures.render_card_page(rows, page, per_page))
+
+    def lookup(self, series, page):
+        with self.lock:
+            if series is None:
+                return self.series_list, self.modified.get(None, 0)
+            key = (series, page)
+            if key in self.pages:
+                return self.pages[key], self.modified[key]
+            # 範囲外のページはカード0件のページを返す (実サイトと同じく最終ページ扱い)
+            return (fixtures.PAGE_HEAD + fixtures.PAGE_FOOT).encode('utf-8'), 0
+
+def make_handler(site, latency=0.0):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            parsed = urlparse(self.path)
+            if not parsed.path.rstrip('/').endswith('cardlist'):
+                self.send_error(404); return
+            qs = parse_qs(parsed.query)
+            series = qs.get('series', [None])[0]
+            page = int(qs.get('page', ['1'])[0] or 1)
+            body, mtime = site.lookup(series, page)
+            etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+            last_modified = formatdate(mtime, usegmt=True)
+            if latency: time.sleep(latency)
+            with site.lock:
+                site.request_count += 1
+
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('ETag', etag)
+            self.send_header('Last-Modified', last_modified)
+            self.end_headers()
+            self.wfile.write(body)
+            with site.lock:
+                site.bytes_sent += len(body)
+
+        def log_message(self, format, *args):
+            pass
+    return Handler
+
+def start_server(site, host='127.0.0.1', port=0, latency=0.0):
+    """バックグラウンドスレッドでサーバーを起動し、(server, BASE_URL) を返す"""
+    server = ThreadingHTTPServer((host, port), make_handler(site, latency))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}/cardlist/"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Local stand-in for the official card list site')
+    parser.add_argument('--corpus', default='', help='Fixture corpus directory (default: render from --data)')
+    parser.add_argument('--data', default='data', help='data/*.csv directory used when --corpus is not given')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='Artificial latency per request (seconds)')
+    args = parser.parse_args()
+
+    site = FixtureSite.from_corpus(args.corpus) if args.corpus else FixtureSite.from_data_dir(args.data)
+    server, base_url = start_server(site, port=args.port, latency=args.latency)
+    print(f"Serving fixtures at {base_url} (Ctrl+C to stop)")
+    try:
+        while True: time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,152 @@
+import os
+import sys
+import json
+import argparse
+
+import pandas as pd
+
+from card_export import temp_path_for
+
+try:
+    import msgpack
+except ImportError:  # msgpack が無い環境では .msgpack を作らない
+    msgpack = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow が無い環境では .parquet を作らない
+    pa = None
+
+HAS_MSGPACK = msgpack is not None
+HAS_PARQUET = pa is not None
+
+# --- バイナリ形式の出力 (Parquet / MessagePack) ---
+# cards.json と同じレコードを、JSON を解析せずに読める形でも書き出す。
+#   cards.parquet : 列指向 (zstd 圧縮)。必要な列だけ読める
+#     - costLifeValue / power / counter / block は nullable int32。'-' や 'X' など数値でない値は null にし、
+#       元の文字列は <列名>Text 列 (数値のときは null) に残す
+#     - color / features は list<string>、その他は string
+#   cards.msgpack : cards.json と同じレコードの配列 (MessagePack)
+# load_cards_parquet(as_records=True) / load_cards_msgpack は cards.json と同じレコードを返す。
+
+DEFAULT_PARQUET_PATH = 'cards.parquet'
+DEFAULT_MSGPACK_PATH = 'cards.msgpack'
+
+INT_FIELDS = ('costLifeValue', 'power', 'counter', 'block')
+LIST_FIELDS = ('color', 'features')
+TEXT_SUFFIX = 'Text'
+
+class ParquetExporter:
+    """write_cards に渡すレコードを tap() で横取りして列に集め、finish() で Parquet に書き出す"""
+    def __init__(self, path=DEFAULT_PARQUET_PATH):
+        self.path = path
+        self.fields = None
+        self.columns = {}
+        self.count = 0
+
+    def add(self, record):
+        if self.fields is None:
+            # 列の並びは最初のレコードのキー順 (数値でない値の列は最後にまとめる)
+            self.fields = list(record)
+            self.columns = {f: [] for f in self.fields}
+            self.columns.update({f + TEXT_SUFFIX: [] for f in INT_FIELDS if f in record})
+        for field in self.fields:
+            value = record.get(field)
+            if field in INT_FIELDS:
+                self.columns[field].append(value if isinstance(value, int) else None)
+                self.columns[field + TEXT_SUFFIX].append(value if isinstance(value, str) else None)
+            else:
+                self.columns[field].append(value)
+        self.count += 1
+
+    def tap(self, records):
+        for record in records:
+            self.add(record)
+            yield record
+
+    def schema(self):
+        def field_type(name):
+            if name in INT_FIELDS: return pa.int32()
+            if name in LIST_FIELDS: return pa.list_(pa.string())
+            return pa.string()
+        return pa.schema([(name, field_type(name)) for name in self.columns])
+
+    def finish(self):
+        table = pa.table(self.columns, schema=self.schema()) if self.count else pa.table({})
+        tmp_path = temp_path_for(self.path)
+        try:
+            pq.write_table(table, tmp_path, compression='zstd')
+            os.replace(tmp_path, self.path)
+        finally:
+            if os.path.exists(tmp_path): os.remove(tmp_path)
+        return self.count
+
+class MsgpackExporter:
+    """レコードを1件ずつ MessagePack にして溜め、finish() で配列として書き出す"""
+    def __init__(self, path=DEFAULT_MSGPACK_PATH):
+        self.path = path
+        self.packer = msgpack.Packer(use_bin_type=True)
+        self.chunks = []
+
+    def add(self, record):
+        self.chunks.append(self.packer.pack(record))
+
+    def tap(self, records):
+        for record in records:
+            self.add(record)
+            yield record
+
+    def finish(self):
+        tmp_path = temp_path_for(self.path)
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(self.packer.pack_array_header(len(self.chunks)))
+                for chunk in self.chunks:
+                    f.write(chunk)
+            os.replace(tmp_path, self.path)
+        finally:
+            if os.path.exists(tmp_path): os.remove(tmp_path)
+        return len(self.chunks)
+
+# --- 読み込み ---
+def load_cards_parquet(path=DEFAULT_PARQUET_PATH, columns=None, as_records=False):
+    """
+    cards.parquet を DataFrame (数値列は pandas の Int32、null は <NA>) で返す。columns で読む列を絞れる。
+    as_records=True なら cards.json と同じレコードのリストを返す (数値でない値は <列名>Text 列から戻す)。
+    """
+    if as_records:
+        table = pq.read_table(path, columns=columns)
+        data = table.to_pydict()
+        fields = [f for f in table.column_names
+                  if not (f.endswith(TEXT_SUFFIX) and f[:-len(TEXT_SUFFIX)] in INT_FIELDS)]
+        for field in INT_FIELDS:
+            if field in data and field + TEXT_SUFFIX in data:
+                data[field] = [t if t is not None else v for v, t in zip(data[field], data[field + TEXT_SUFFIX])]
+        return [dict(zip(fields, values)) for values in zip(*(data[f] for f in fields))]
+    return pq.read_table(path, columns=columns).to_pandas(types_mapper={pa.int32(): pd.Int32Dtype()}.get)
+
+def load_cards_msgpack(path=DEFAULT_MSGPACK_PATH):
+    """cards.msgpack を cards.json と同じレコードのリストで返す"""
+    with open(path, 'rb') as f:
+        return msgpack.unpackb(f.read(), raw=False)
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert cards.json to Parquet / MessagePack')
+    parser.add_argument('--json', default='cards.json')
+    parser.add_argument('--parquet', default=DEFAULT_PARQUET_PATH, help='Parquet output path ("" to skip)')
+    parser.add_argument('--msgpack', default=DEFAULT_MSGPACK_PATH, help='MessagePack output path ("" to skip)')
+    args = parser.parse_args()
+
+    with open(args.json, 'r', encoding='utf-8') as f:
+        records = json.load(f)
+    for path, exporter in ((args.parquet, ParquetExporter), (args.msgpack, MsgpackExporter)):
+        if not path: continue
+        builder = exporter(path)
+        for record in records:
+            builder.add(record)
+        print(f"Saved {builder.finish()} cards to {path} ({os.path.getsize(path):,} bytes)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
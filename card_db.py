@@ -0,0 +1,186 @@
+import os
+import sys
+import json
+import sqlite3
+import argparse
+
+from card_export import dumps_record, temp_path_for
+
+# --- カードDB (SQLite) ---
+# cards.json と同じレコードを正規化して保存する。
+#   cards          : 1カード1行 (record 列に cards.json のレコードをそのまま保持)
+#   card_colors    : カード × 色
+#   card_features  : カード × 特徴
+# cost/power などは to_int の結果をそのまま入れる (数値 or '-' などの文字列)。
+# SQLite では文字列は常に数値より大きく比較されるので、`cost <= 3` で '-' は除外される。
+
+DEFAULT_DB_PATH = 'cards.sqlite'
+
+SCHEMA = '''
+CREATE TABLE cards (
+    ordinal INTEGER PRIMARY KEY,
+    unique_id TEXT NOT NULL UNIQUE,
+    card_number TEXT NOT NULL,
+    card_name TEXT NOT NULL,
+    furigana TEXT NOT NULL,
+    rarity TEXT NOT NULL,
+    card_type TEXT NOT NULL,
+    cost_life_type TEXT NOT NULL,
+    cost_life_value,
+    power,
+    counter,
+    attribute TEXT NOT NULL,
+    block,
+    effect_text TEXT NOT NULL,
+    trigger_text TEXT NOT NULL,
+    get_info TEXT NOT NULL,
+    series_title TEXT NOT NULL,
+    series_code TEXT NOT NULL,
+    record TEXT NOT NULL
+);
+CREATE TABLE card_colors (card INTEGER NOT NULL REFERENCES cards(ordinal), color TEXT NOT NULL, PRIMARY KEY (color, card));
+CREATE TABLE card_features (card INTEGER NOT NULL REFERENCES cards(ordinal), feature TEXT NOT NULL, PRIMARY KEY (feature, card));
+CREATE INDEX idx_cards_number ON cards (card_number);
+CREATE INDEX idx_cards_series ON cards (series_code);
+CREATE INDEX idx_cards_type ON cards (card_type);
+CREATE INDEX idx_cards_cost ON cards (cost_life_value);
+CREATE INDEX idx_cards_power ON cards (power);
+CREATE INDEX idx_colors_card ON card_colors (card);
+CREATE INDEX idx_features_card ON card_features (card);
+'''
+
+CARD_FIELDS = [
+    ('unique_id', 'uniqueId'), ('card_number', 'cardNumber'), ('card_name', 'cardName'), ('furigana', 'furigana'),
+    ('rarity', 'rarity'), ('card_type', 'cardType'), ('cost_life_type', 'costLifeType'),
+    ('cost_life_value', 'costLifeValue'), ('power', 'power'), ('counter', 'counter'), ('attribute', 'attribute'),
+    ('block', 'block'), ('effect_text', 'effectText'), ('trigger_text', 'trigger'), ('get_info', 'getInfo'),
+    ('series_title', 'seriesTitle'), ('series_code', 'seriesCode'),
+]
+
+class CardDbBuilder:
+    """
+    write_cards に渡すレコードを tap() で横取りして DB に入れる。
+    一時ファイルに作り、finish() で path に置き換える。
+    """
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        self.tmp_path = temp_path_for(path)
+        if os.path.exists(self.tmp_path): os.remove(self.tmp_path)
+        self.conn = sqlite3.connect(self.tmp_path)
+        self.conn.executescript('PRAGMA journal_mode = OFF; PRAGMA synchronous = OFF;' + SCHEMA)
+        self.count = 0
+        columns = ', '.join(c for c, _ in CARD_FIELDS)
+        self.insert_sql = f"INSERT INTO cards (ordinal, {columns}, record) VALUES (?, {', '.join('?' for _ in CARD_FIELDS)}, ?)"
+
+    def add(self, record):
+        ordinal = self.count
+        self.conn.execute(self.insert_sql, (ordinal, *[record.get(k) for _, k in CARD_FIELDS], dumps_record(record)))
+        self.conn.executemany('INSERT OR IGNORE INTO card_colors VALUES (?, ?)', [(ordinal, c) for c in record.get('color', [])])
+        self.conn.executemany('INSERT OR IGNORE INTO card_features VALUES (?, ?)', [(ordinal, f) for f in record.get('features', [])])
+        self.count += 1
+
+    def tap(self, records):
+        for record in records:
+            self.add(record)
+            yield record
+
+    def finish(self):
+        self.conn.commit()
+        self.conn.execute('ANALYZE')
+        self.conn.close()
+        os.replace(self.tmp_path, self.path)
+        return self.count
+
+def build_database(records, path=DEFAULT_DB_PATH):
+    builder = CardDbBuilder(path)
+    for record in records:
+        builder.add(record)
+    return builder.finish()
+
+# --- 検索API ---
+def connect(path=DEFAULT_DB_PATH):
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Card database not found: {path}")
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    return conn
+
+def query_cards(conn, color=None, card_type=None, feature=None, series_code=None, card_number=None,
+                rarity=None, min_cost=None, max_cost=None, min_power=None, max_power=None,
+                name=None, limit=None):
+    """
+    条件をすべて満たすカードを cards.json と同じ形式のレコードで返す (cards.json の並び順)。
+    color / feature は複数指定 (リスト) で「すべて持つ」条件になる。
+    """
+    where, params = [], []
+    for values, table, column in ((color, 'card_colors', 'color'), (feature, 'card_features', 'feature')):
+        if values is None: continue
+        for v in ([values] if isinstance(values, str) else values):
+            where.append(f"ordinal IN (SELECT card FROM {table} WHERE {column} = ?)")
+            params.append(v)
+    for value, clause in ((card_type, 'card_type = ?'), (series_code, 'series_code = ?'),
+                          (card_number, 'card_number = ?'), (rarity, 'rarity = ?'),
+                          (min_cost, 'cost_life_value >= ?'), (max_cost, 'cost_life_value <= ?'),
+                          (min_power, 'power >= ?'), (max_power, 'power <= ?')):
+        if value is None: continue
+        where.append(clause)
+        params.append(value)
+    if min_cost is not None or max_cost is not None:
+        where.append("typeof(cost_life_value) = 'integer'")
+    if min_power is not None or max_power is not None:
+        where.append("typeof(power) = 'integer'")
+    if name:
+        where.append("(card_name LIKE ? OR furigana LIKE ?)")
+        params += [f"%{name}%", f"%{name}%"]
+
+    sql = 'SELECT record FROM cards'
+    if where: sql += ' WHERE ' + ' AND '.join(where)
+    sql += ' ORDER BY ordinal'
+    if limit: sql += f' LIMIT {int(limit)}'
+    return [json.loads(r[0]) for r in conn.execute(sql, params)]
+
+def main():
+    parser = argparse.ArgumentParser(description='Query the card SQLite database')
+    parser.add_argument('--db', default=DEFAULT_DB_PATH)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_build = sub.add_parser('build', help='Build the database from an existing cards.json')
+    p_build.add_argument('--json', default='cards.json')
+
+    p_query = sub.add_parser('query', help='Search cards')
+    p_query.add_argument('--color', action='append', help='Color (repeat for multi-color)')
+    p_query.add_argument('--type', dest='card_type')
+    p_query.add_argument('--feature', action='append', help='Feature (repeat to require several)')
+    p_query.add_argument('--series', dest='series_code')
+    p_query.add_argument('--number', dest='card_number')
+    p_query.add_argument('--rarity')
+    p_query.add_argument('--min-cost', type=int)
+    p_query.add_argument('--max-cost', type=int)
+    p_query.add_argument('--min-power', type=int)
+    p_query.add_argument('--max-power', type=int)
+    p_query.add_argument('--name', help='Substring of card name or furigana')
+    p_query.add_argument('--limit', type=int)
+    p_query.add_argument('--json', action='store_true', help='Print full records as JSON')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        with open(args.json, 'r', encoding='utf-8') as f:
+            count = build_database(json.load(f), args.db)
+        print(f"Saved {count} cards to {args.db}")
+        return 0
+
+    conn = connect(args.db)
+    results = query_cards(conn, color=args.color, card_type=args.card_type, feature=args.feature,
+                          series_code=args.series_code, card_number=args.card_number, rarity=args.rarity,
+                          min_cost=args.min_cost, max_cost=args.max_cost, min_power=args.min_power,
+                          max_power=args.max_power, name=args.name, limit=args.limit)
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        for r in results:
+            print(f"{r['cardNumber']:<10} {r['rarity']:<4} {r['cardType']:<10} {'/'.join(r['color']):<6} "
+                  f"{str(r['costLifeValue']):>3} {str(r['power']):>6}  {r['cardName']}")
+        print(f"{len(results)} cards")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+import os
+import re
+import gzip
+import json
+import hashlib
+import shutil
+import threading
+from contextlib import contextmanager, ExitStack
+
+try:
+    import orjson  # 入っていれば高速にシリアライズする (出力は json.dumps と同一)
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # brotli が無い環境では .br を作らない
+    brotli = None
+
+# --- cards.json の出力 ---
+# pretty  : 従来通り indent=2 (デフォルト)
+# compact : 空白なしの1行
+# いずれもレコードを1件ずつ書き出すので、全件のリストをメモリに持たなくてよい。
+# キーの順序はレコードの生成順 (generate_card_json_from_df のスキーマ順) で固定。
+
+JSON_FORMATS = ('pretty', 'compact')
+PRECOMPRESSED_SUFFIXES = ('.gz', '.br')
+# brotli の圧縮レベル。11 は cards.json で 8 秒ほどかかり出力ステージの大半を占めるので、
+# 毎回のビルドでは 9 にする (11 より 1 割ほど大きいが 0.1 秒程度で終わる)
+BROTLI_QUALITY = 9
+
+def temp_path_for(path):
+    # 同じディレクトリに作る一時ファイル名 (プロセス・スレッドごとに別名)
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+@contextmanager
+def atomic_open(path, mode='w', encoding='utf-8'):
+    """同じディレクトリの一時ファイルに書き、成功したら置き換える"""
+    tmp_path = temp_path_for(path)
+    try:
+        if 'b' in mode: f = open(tmp_path, mode)
+        else: f = open(tmp_path, mode, encoding=encoding, newline='')
+        with f:
+            yield f
+        os.replace(tmp_path, path)
+    except:
+        if os.path.exists(tmp_path): os.remove(tmp_path)
+        raise
+
+def dumps_record(record, pretty=False):
+    if orjson is not None:
+        return orjson.dumps(record, option=orjson.OPT_INDENT_2 if pretty else 0).decode('utf-8')
+    if pretty:
+        return json.dumps(record, ensure_ascii=False, indent=2)
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':'))
+
+def write_cards(records, json_path, fmt='pretty', ndjson_path=None):
+    """
+    records (イテラブル) を json_path に JSON 配列として、ndjson_path があれば NDJSON としても
+    1パスで書き出し、件数を返す。pretty は json.dump(..., indent=2) とバイト単位で同じ出力になる。
+    """
+    if fmt not in JSON_FORMATS:
+        raise ValueError(f"Unknown JSON format: {fmt} (available: {', '.join(JSON_FORMATS)})")
+    pretty = fmt == 'pretty'
+    count = 0
+    with ExitStack() as stack:
+        f = stack.enter_context(atomic_open(json_path))
+        nd = stack.enter_context(atomic_open(ndjson_path)) if ndjson_path else None
+        for record in records:
+            text = dumps_record(record, pretty)
+            if pretty:
+                f.write(('[\n  ' if count == 0 else ',\n  ') + text.replace('\n', '\n  '))
+            else:
+                f.write(('[' if count == 0 else ',') + text)
+            if nd is not None:
+                nd.write((text if not pretty else dumps_record(record)) + '\n')
+            count += 1
+        if count == 0: f.write('[]')
+        else: f.write('\n]' if pretty else ']')
+    return count
+
+def precompressed_paths(path):
+    """write_precompressed(path) がこの環境で作るファイル"""
+    return [path + '.gz'] + ([path + '.br'] if brotli is not None else [])
+
+def write_precompressed(path):
+    """
+    path の隣に .gz (と brotli があれば .br) を作る。
+    gzip はヘッダのタイムスタンプ・ファイル名を固定し、同じ入力なら同じバイト列になるようにする。
+    """
+    written = []
+    with open(path, 'rb') as src, atomic_open(path + '.gz', 'wb') as dst:
+        with gzip.GzipFile(filename='', mode='wb', fileobj=dst, compresslevel=9, mtime=0) as gz:
+            shutil.copyfileobj(src, gz, 1024 * 1024)
+    written.append(path + '.gz')
+
+    if brotli is not None:
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        with open(path, 'rb') as src, atomic_open(path + '.br', 'wb') as dst:
+            for chunk in iter(lambda: src.read(1024 * 1024), b''):
+                dst.write(compressor.process(chunk))
+            dst.write(compressor.finish())
+        written.append(path + '.br')
+    elif os.path.exists(path + '.br'):
+        # 古い .br が残ると本体と食い違うので削除する
+        print(f"Warning: brotli is not installed. Removing stale {path}.br")
+        os.remove(path + '.br')
+    return written
+
+def remove_precompressed(path):
+    """事前圧縮しないときに、前回の path.gz / path.br が本体と食い違ったまま残らないよう削除する"""
+    removed = []
+    for suffix in PRECOMPRESSED_SUFFIXES:
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+            removed.append(path + suffix)
+    return removed
+
+# --- 差分配信用の出力 ---
+# shards/<seriesCode>.<内容ハッシュ>.json : シリーズごとのレコード (compact)
+# cards.manifest.json                    : シリーズ -> シャードファイル名/ハッシュ/件数
+# cards.delta.json                       : 前回ビルドからの追加・変更・削除 uniqueId
+# 内容が変わらないシャードはファイル名も変わらないので、配信側は変わったシャードだけ取得すればよい。
+
+SHARD_HASH_LENGTH = 16
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:SHARD_HASH_LENGTH]
+
+def shard_basename(series_code):
+    # ファイル名に使えない文字は '_' にする (シリーズコード無しは '_')
+    return re.sub(r'[^0-9A-Za-z_-]', '_', series_code) or '_'
+
+def load_card_hashes(path):
+    """既存の cards.json から {uniqueId: (レコードのハッシュ, seriesCode)} を作る。無い・壊れている場合は None"""
+    if not os.path.exists(path): return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            records = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Warning: Could not read previous {path} for delta export ({e})")
+        return None
+    return {r['uniqueId']: (content_hash(dumps_record(r).encode('utf-8')), r.get('seriesCode', ''))
+            for r in records if isinstance(r, dict) and 'uniqueId' in r}
+
+class ShardExporter:
+    """
+    write_cards に渡すレコードを tap() で横取りし、シリーズごとのシャードと
+    uniqueId ごとのハッシュを同じ1パスで集める。
+    """
+    def __init__(self, shard_dir):
+        self.shard_dir = shard_dir
+        self.series = {}   # seriesCode -> [compact JSON 文字列]
+        self.hashes = {}   # uniqueId -> レコードのハッシュ
+        self.series_of = {}
+
+    def tap(self, records):
+        for record in records:
+            text = dumps_record(record)
+            code = record.get('seriesCode', '')
+            self.series.setdefault(code, []).append(text)
+            self.hashes[record['uniqueId']] = content_hash(text.encode('utf-8'))
+            self.series_of[record['uniqueId']] = code
+            yield record
+
+    def write(self, manifest_path, delta_path, previous_hashes=None):
+        os.makedirs(self.shard_dir, exist_ok=True)
+        shards = []
+        for code in sorted(self.series):
+            data = ('[' + ','.join(self.series[code]) + ']').encode('utf-8')
+            digest = content_hash(data)
+            filename = f"{shard_basename(code)}.{digest}.json"
+            path = os.path.join(self.shard_dir, filename)
+            if not os.path.exists(path):
+                with atomic_open(path, 'wb') as f:
+                    f.write(data)
+            shards.append({'seriesCode': code, 'file': filename, 'hash': digest, 'count': len(self.series[code])})
+
+        # 参照されなくなった古いシャードを削除
+        current = {s['file'] for s in shards}
+        for name in os.listdir(self.shard_dir):
+            if name.endswith('.json') and name not in current:
+                os.remove(os.path.join(self.shard_dir, name))
+
+        manifest = {
+            'cardCount': len(self.hashes),
+            'contentHash': content_hash(''.join(s['hash'] for s in shards).encode('utf-8')),
+            'shardDir': os.path.basename(os.path.normpath(self.shard_dir)),
+            'shards': shards,
+        }
+        with atomic_open(manifest_path) as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+        delta = self.compute_delta(previous_hashes)
+        with atomic_open(delta_path) as f:
+            json.dump(delta, f, ensure_ascii=False, indent=2)
+        return manifest, delta
+
+    def compute_delta(self, previous_hashes):
+        if previous_hashes is None:
+            # 前回ビルドが無い場合は全件を追加扱いにする
+            return {'fullRebuild': True, 'added': sorted(self.hashes), 'changed': [], 'removed': [],
+                    'changedSeries': sorted(self.series)}
+        added = sorted(k for k in self.hashes if k not in previous_hashes)
+        removed = sorted(k for k in previous_hashes if k not in self.hashes)
+        changed = sorted(k for k, h in self.hashes.items() if k in previous_hashes and previous_hashes[k][0] != h)
+        changed_series = sorted({self.series_of[k] for k in added + changed} | {previous_hashes[k][1] for k in removed})
+        return {'fullRebuild': False, 'added': added, 'changed': changed, 'removed': removed,
+                'changedSeries': changed_series}
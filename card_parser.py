@@ -0,0 +1,343 @@
+import os
+import re
+import sys
+import copy
+import glob
+import argparse
+import hashlib
+import threading
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    from lxml import etree
+    from lxml import html as lxml_html
+except ImportError:  # lxml が無い環境では BeautifulSoup 版のみ使用する
+    lxml_html = None
+
+# --- カードリストHTMLの解析 ---
+# エンジンごとに parse(html) -> (行データのリスト, 次ページの有無) と
+# scan(html) -> 次ページの有無 を実装する。
+# 'bs4' は従来の html.parser + copy.copy による実装で、出力の基準 (リファレンス) として残す。
+
+CARD_COLUMNS = [
+    'CardID', 'Name', 'Rarity', 'Type', 'Color', 'Cost_Life_Type', 'Cost_Life_Value',
+    'Power', 'Counter', 'Attribute', 'Feature', 'Block', 'Text', 'Trigger', 'SetInfo',
+    'ImageFileID', 'ImageFileID_small'
+]
+
+# (div の class, 取り除くラベル, 列名)
+VALUE_FIELDS = [
+    ('attribute', '属性', 'Attribute'), ('power', 'パワー', 'Power'), ('counter', 'カウンター', 'Counter'),
+    ('color', '色', 'Color'), ('feature', '特徴', 'Feature'), ('block', 'ブロックアイコン', 'Block'),
+    ('text', 'テキスト', 'Text'), ('trigger', 'トリガー', 'Trigger'), ('getInfo', '入手情報', 'SetInfo'),
+]
+
+# --- テキストクリーニング関数 ---
+def clean_text(text):
+    if text is None: return ""
+    if isinstance(text, float) and text != text: return ""  # NaN
+    text = str(text)
+    if text.lower() == 'nan': return ""
+    text = re.sub(r'<[^>]+>', '', text)
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text
+
+def get_text_with_alt(element):
+    if not element: return ""
+    elem_copy = copy.copy(element)
+    for img in elem_copy.find_all('img'):
+        alt_text = img.get('alt', '')
+        img.replace_with(alt_text)
+    for br in elem_copy.find_all('br'):
+        br.replace_with(' ')
+    return clean_text(elem_copy.get_text(strip=True))
+
+def extract_image_id(img_tag):
+    if img_tag is None: return ""
+    src = img_tag.get('src', '')
+    if not src: return ""
+    filename = os.path.basename(src)
+    return filename
+
+def make_row(values):
+    row = {col: values.get(col, '') for col in CARD_COLUMNS}
+    row['ImageFileID_small'] = ''
+    return row
+
+# --- BeautifulSoup (html.parser) 版: リファレンス実装 ---
+def parse_card_page_bs4(html):
+    rows = []
+    soup = BeautifulSoup(html, 'html.parser')
+    card_modals = soup.find_all('dl', class_='modalCol')
+    if not card_modals: return rows, False
+
+    for modal in card_modals:
+        try:
+            dt = modal.find('dt')
+            info_col = dt.find('div', class_='infoCol')
+            spans = info_col.find_all('span')
+            values = {}
+            for i, col in enumerate(['CardID', 'Rarity', 'Type']):
+                values[col] = clean_text(spans[i].get_text(strip=True)) if len(spans) > i else ""
+            values['Name'] = get_text_with_alt(dt.find('div', class_='cardName'))
+            values['ImageFileID'] = extract_image_id(modal.find('img'))
+            dd = modal.find('dd')
+            back_col = dd.find('div', class_='backCol')
+
+            cost_life_div = back_col.find('div', class_='cost')
+            if cost_life_div:
+                cl_copy = copy.copy(cost_life_div)
+                h3 = cl_copy.find('h3')
+                if h3:
+                    values['Cost_Life_Type'] = clean_text(h3.get_text(strip=True))
+                    h3.decompose()
+                values['Cost_Life_Value'] = get_text_with_alt(cl_copy)
+
+            for cls, label, col in VALUE_FIELDS:
+                div = back_col.find('div', class_=cls)
+                if not div: continue
+                d_copy = copy.copy(div)
+                h3 = d_copy.find('h3')
+                if h3: h3.decompose()
+                values[col] = get_text_with_alt(d_copy).replace(label, '')
+
+            rows.append(make_row(values))
+        except Exception as e:
+            print(f"Skipping card parse error: {e}")
+            continue
+
+    pager = soup.find('div', class_='pager')
+    return rows, bool(pager and 'NEXT' in pager.get_text())
+
+def scan_card_page_bs4(html):
+    # カード有無と pager だけを見る軽量チェック
+    strainer = SoupStrainer(['dl', 'div'], class_=['modalCol', 'pager'])
+    soup = BeautifulSoup(html, 'html.parser', parse_only=strainer)
+    if not soup.find('dl', class_='modalCol'): return False
+    pager = soup.find('div', class_='pager')
+    return bool(pager and 'NEXT' in pager.get_text())
+
+# --- lxml 版: 部分木をコピーせずにテキストを組み立てる ---
+def _has_class(el, cls):
+    return cls in (el.get('class') or '').split()
+
+def _find(el, tag, cls=None):
+    # BeautifulSoup の find と同じく自分自身は含めず、子孫から最初の1件を返す
+    for d in el.iterdescendants(tag):
+        if cls is None or _has_class(d, cls): return d
+    return None
+
+def _collect_strings(el, out, with_alt, skip):
+    if el.text: out.append(el.text)
+    for child in el:
+        if child is not skip and isinstance(child.tag, str):
+            if child.tag == 'img':
+                if with_alt: out.append(child.get('alt', ''))
+            elif child.tag != 'br':
+                _collect_strings(child, out, with_alt, skip)
+        if child.tail: out.append(child.tail)
+
+def _text(el, with_alt=True, skip=None):
+    """
+    get_text(strip=True) と同じ結合結果を返す。
+    with_alt=True で img を alt に置き換え (get_text_with_alt 相当)、skip の要素は除外する。
+    """
+    if el is None: return ""
+    out = []
+    _collect_strings(el, out, with_alt, skip)
+    return clean_text(''.join(s.strip() for s in out if s.strip()))
+
+def _lxml_document(html):
+    if not html or not html.strip(): return None
+    try:
+        return lxml_html.document_fromstring(html)
+    except (etree.ParserError, ValueError):
+        return None
+
+def _lxml_pager_has_next(doc):
+    for div in doc.iter('div'):
+        if _has_class(div, 'pager'):
+            return 'NEXT' in div.text_content()
+    return False
+
+def parse_card_page_lxml(html):
+    rows = []
+    doc = _lxml_document(html)
+    if doc is None: return rows, False
+    card_modals = [dl for dl in doc.iter('dl') if _has_class(dl, 'modalCol')]
+    if not card_modals: return rows, False
+
+    for modal in card_modals:
+        try:
+            dt = _find(modal, 'dt')
+            info_col = _find(dt, 'div', 'infoCol')
+            spans = list(info_col.iterdescendants('span'))
+            values = {}
+            for i, col in enumerate(['CardID', 'Rarity', 'Type']):
+                values[col] = _text(spans[i], with_alt=False) if len(spans) > i else ""
+            values['Name'] = _text(_find(dt, 'div', 'cardName'))
+            values['ImageFileID'] = extract_image_id(_find(modal, 'img'))
+            dd = _find(modal, 'dd')
+            back_col = _find(dd, 'div', 'backCol')
+
+            cost_life_div = _find(back_col, 'div', 'cost')
+            if cost_life_div is not None:
+                h3 = _find(cost_life_div, 'h3')
+                if h3 is not None:
+                    values['Cost_Life_Type'] = _text(h3, with_alt=False)
+                values['Cost_Life_Value'] = _text(cost_life_div, skip=h3)
+
+            for cls, label, col in VALUE_FIELDS:
+                div = _find(back_col, 'div', cls)
+                if div is None: continue
+                values[col] = _text(div, skip=_find(div, 'h3')).replace(label, '')
+
+            rows.append(make_row(values))
+        except Exception as e:
+            print(f"Skipping card parse error: {e}")
+            continue
+
+    return rows, _lxml_pager_has_next(doc)
+
+def scan_card_page_lxml(html):
+    doc = _lxml_document(html)
+    if doc is None: return False
+    if not any(_has_class(dl, 'modalCol') for dl in doc.iter('dl')): return False
+    return _lxml_pager_has_next(doc)
+
+# --- エンジン選択 ---
+PARSER_ENGINES = {'bs4': (parse_card_page_bs4, scan_card_page_bs4)}
+if lxml_html is not None:
+    PARSER_ENGINES['lxml'] = (parse_card_page_lxml, scan_card_page_lxml)
+
+DEFAULT_PARSER_ENGINE = 'lxml' if 'lxml' in PARSER_ENGINES else 'bs4'
+REFERENCE_ENGINE = 'bs4'
+
+def get_parser_engine(name=None):
+    name = name or DEFAULT_PARSER_ENGINE
+    if name not in PARSER_ENGINES:
+        raise ValueError(f"Unknown parser engine: {name} (available: {', '.join(PARSER_ENGINES)})")
+    return PARSER_ENGINES[name]
+
+# --- 実サイトのページでの照合 ---
+# bs4 以外のエンジンでは、プロセスごとに最初の VERIFY_PAGES ページを bs4 でも解析して結果を比べる。
+# 食い違ったらそのページと bs4 の出力を fixtures に real_mismatch_<ハッシュ> として保存し
+# (ゴールデンチェックで再現できるように)、そのプロセスの残りは bs4 で解析する。
+VERIFY_PAGES = 5
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+_verify_lock = threading.Lock()
+_verify_state = {'remaining': VERIFY_PAGES, 'fallback': False}
+
+def _select_engine(engine):
+    """(使うエンジン名, このページを bs4 と照合するか)"""
+    name = engine or DEFAULT_PARSER_ENGINE
+    if name == REFERENCE_ENGINE: return name, False
+    with _verify_lock:
+        if _verify_state['fallback']: return REFERENCE_ENGINE, False
+        if _verify_state['remaining'] <= 0: return name, False
+        _verify_state['remaining'] -= 1
+        return name, True
+
+def save_mismatch(html, rows, fixture_dir=FIXTURE_DIR):
+    name = 'real_mismatch_' + hashlib.sha256(html.encode('utf-8')).hexdigest()[:12]
+    try:
+        os.makedirs(os.path.join(fixture_dir, 'pages'), exist_ok=True)
+        os.makedirs(os.path.join(fixture_dir, 'golden'), exist_ok=True)
+        with open(os.path.join(fixture_dir, 'pages', name + '.html'), 'w', encoding='utf-8') as f:
+            f.write(html)
+        with open(os.path.join(fixture_dir, 'golden', name + '.csv'), 'wb') as f:
+            f.write(rows_to_csv_bytes(rows))
+    except OSError as e:
+        print(f"Warning: could not save {name} ({e})")
+    return name
+
+def parse_card_page(html, engine=None):
+    """カードリスト1ページ分のHTMLを解析し、(行データのリスト, 次ページの有無) を返す"""
+    name, verify = _select_engine(engine)
+    result = get_parser_engine(name)[0](html)
+    if not verify: return result
+    expected = get_parser_engine(REFERENCE_ENGINE)[0](html)
+    if result == expected: return result
+    with _verify_lock:
+        _verify_state['fallback'] = True
+    saved = save_mismatch(html, expected[0])
+    print(f"Warning: {name} parser differs from {REFERENCE_ENGINE} on a live page (saved fixtures/pages/{saved}.html). "
+          f"Using {REFERENCE_ENGINE} for the rest of this run.")
+    return expected
+
+def scan_card_page(html, engine=None):
+    """内容が前回と同じページ用。解析せずに次ページの有無だけを返す"""
+    name = engine or DEFAULT_PARSER_ENGINE
+    if _verify_state['fallback']: name = REFERENCE_ENGINE
+    return get_parser_engine(name)[1](html)
+
+# --- ゴールデンチェック ---
+# fixtures/pages/*.html を各エンジンで解析し、fixtures/golden/*.csv (リファレンス実装の出力) と
+# バイト単位で一致するかを確認する。
+# 550xxx_p*.html と edge_cases.html は data/*.csv から組み立てたページ (実サイトのHTMLではない)。
+# 実サイトのページは --capture で real_<series>_p<page>.html として保存し、bs4 の出力を golden にする
+# (daily_scrape.yml が毎回取り直してコミットする)。照合は実行時の切り替えを通さず、各エンジンを直接呼ぶ。
+def rows_to_csv_bytes(rows):
+    import io
+    import pandas as pd
+    buf = io.StringIO()
+    pd.DataFrame(rows, columns=CARD_COLUMNS).to_csv(buf, index=False)
+    return buf.getvalue().encode('utf-8')
+
+def check_golden(fixture_dir, update=False):
+    pages = sorted(glob.glob(os.path.join(fixture_dir, 'pages', '*.html')))
+    golden_dir = os.path.join(fixture_dir, 'golden')
+    os.makedirs(golden_dir, exist_ok=True)
+    failures = 0
+    for path in pages:
+        name = os.path.splitext(os.path.basename(path))[0]
+        if name == 'series_list': continue  # シリーズ一覧ページ (スタンドインサーバー用) は対象外
+        with open(path, 'r', encoding='utf-8') as f:
+            html = f.read()
+        golden_path = os.path.join(golden_dir, name + '.csv')
+        if update:
+            rows, has_next = get_parser_engine(REFERENCE_ENGINE)[0](html)
+            with open(golden_path, 'wb') as f:
+                f.write(rows_to_csv_bytes(rows))
+            print(f"[Update] {golden_path} ({len(rows)} cards, next={has_next})")
+            continue
+        with open(golden_path, 'rb') as f:
+            expected = f.read()
+        reference_next = get_parser_engine(REFERENCE_ENGINE)[1](html)
+        for engine in PARSER_ENGINES:
+            parse, scan = get_parser_engine(engine)
+            rows, has_next = parse(html)
+            ok = rows_to_csv_bytes(rows) == expected and has_next == reference_next == scan(html)
+            print(f"[{'OK' if ok else 'NG'}] {engine:5s} {name} ({len(rows)} cards)")
+            if not ok: failures += 1
+    return failures
+
+def capture_page(fixture_dir, base_url, series_code, page=1):
+    """実サイトのカードリストを1ページ保存し、bs4 の出力を golden にする"""
+    import requests
+    response = requests.get(f"{base_url}?series={series_code}&page={page}",
+                            headers={'User-Agent': 'Mozilla/5.0 (compatible; Bot/1.0)'}, timeout=30)
+    response.raise_for_status()
+    response.encoding = response.encoding or response.apparent_encoding
+    name = f"real_{series_code}_p{page}"
+    os.makedirs(os.path.join(fixture_dir, 'pages'), exist_ok=True)
+    os.makedirs(os.path.join(fixture_dir, 'golden'), exist_ok=True)
+    with open(os.path.join(fixture_dir, 'pages', name + '.html'), 'w', encoding='utf-8') as f:
+        f.write(response.text)
+    rows, has_next = get_parser_engine(REFERENCE_ENGINE)[0](response.text)
+    with open(os.path.join(fixture_dir, 'golden', name + '.csv'), 'wb') as f:
+        f.write(rows_to_csv_bytes(rows))
+    print(f"[Capture] {name} ({len(rows)} cards, next={has_next})")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Card list parser golden check')
+    parser.add_argument('--fixtures', default='fixtures', help='Directory containing pages/ and golden/')
+    parser.add_argument('--update', action='store_true', help='Regenerate golden CSVs with the bs4 reference engine')
+    parser.add_argument('--capture', nargs='+', metavar='SERIES[:PAGE]',
+                        help='Save real card list pages from the site into the fixtures, then run the check')
+    parser.add_argument('--base-url', default=os.environ.get('CARDLIST_BASE_URL', 'https://www.onepiece-cardgame.com/cardlist/'))
+    args = parser.parse_args()
+    for target in args.capture or []:
+        code, _, page = target.partition(':')
+        capture_page(args.fixtures, args.base_url, code, int(page or 1))
+    sys.exit(1 if check_golden(args.fixtures, args.update) else 0)
@@ -0,0 +1,111 @@
+import json
+import time
+import sqlite3
+import threading
+
+# --- シリーズ取得のチェックポイント (SQLite) ---
+# ページを取得するたびに、そのページの行データと次ページの有無、本文の SHA-256 を記録する。
+#   series          : シリーズごとの状態 ('in_progress' / 'complete')、ページ数・行数、完了日時
+#   pages           : 取得済みページ (rows は JSON。前回から変わっていないページで未解析のものは NULL)
+#   completed_pages : 最後に CSV を保存できたときの各ページの SHA-256
+# CSV を保存したあとで complete にする (完了マーカー)。complete でないシリーズは次回の実行で
+# 記録済みの最後のページの次から取得を再開する。complete にしたシリーズのページは completed_pages に
+# ハッシュだけ残して削除する。「前回と同じページ」は HTTPキャッシュではなくこのハッシュと比べる
+# (失敗した実行で取得したページもキャッシュには入るため)。
+# 複数のスレッドから使うので、接続は1つにしてロックで直列化する。
+
+CHECKPOINT_VERSION = 2
+
+class FetchCheckpoints:
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+        if version not in (0, CHECKPOINT_VERSION):
+            # 形式が変わったら作り直す (完了マーカーが消えるので、全シリーズを取り直す)
+            self.conn.executescript('DROP TABLE IF EXISTS series; DROP TABLE IF EXISTS pages; '
+                                    'DROP TABLE IF EXISTS completed_pages;')
+        self.conn.executescript(f'''
+            CREATE TABLE IF NOT EXISTS series (
+                code TEXT PRIMARY KEY, status TEXT NOT NULL, pages INTEGER NOT NULL DEFAULT 0,
+                rows INTEGER NOT NULL DEFAULT 0, started REAL NOT NULL, completed REAL
+            );
+            CREATE TABLE IF NOT EXISTS pages (
+                code TEXT NOT NULL, page INTEGER NOT NULL, rows TEXT, row_count INTEGER NOT NULL,
+                has_next INTEGER NOT NULL, unchanged INTEGER NOT NULL DEFAULT 0, fetched REAL NOT NULL,
+                digest TEXT, PRIMARY KEY (code, page)
+            );
+            CREATE TABLE IF NOT EXISTS completed_pages (
+                code TEXT NOT NULL, page INTEGER NOT NULL, digest TEXT NOT NULL, PRIMARY KEY (code, page)
+            );
+            PRAGMA user_version = {CHECKPOINT_VERSION};
+        ''')
+
+    def is_complete(self, code):
+        with self.lock:
+            row = self.conn.execute('SELECT status FROM series WHERE code = ?', (code,)).fetchone()
+        return bool(row) and row[0] == 'complete'
+
+    def status(self):
+        """{code: {'status', 'pages', 'rows'}}"""
+        with self.lock:
+            return {code: {'status': status, 'pages': pages, 'rows': rows}
+                    for code, status, pages, rows in self.conn.execute('SELECT code, status, pages, rows FROM series')}
+
+    def completed_digests(self, code):
+        """最後に CSV を保存できたときの {page: SHA-256} (一度も完了していなければ空)"""
+        with self.lock:
+            return dict(self.conn.execute('SELECT page, digest FROM completed_pages WHERE code = ?', (code,)))
+
+    def begin(self, code, max_age=None):
+        """
+        シリーズの取得を始める。前回が途中で終わっていればその記録をそのまま使い、
+        完了済み (取り直し) なら新しく始める。記録済みのページを [(page, rows, has_next, unchanged)] で返す。
+        途中の記録でも max_age 秒より古いもの (その間にページ構成が変わっているかもしれない) は捨てる。
+        """
+        with self.lock, self.conn:
+            row = self.conn.execute('SELECT status, started FROM series WHERE code = ?', (code,)).fetchone()
+            if row and row[0] == 'in_progress' and (max_age is None or time.time() - row[1] <= max_age):
+                pages = self.conn.execute(
+                    'SELECT page, rows, has_next, unchanged FROM pages WHERE code = ? ORDER BY page', (code,)).fetchall()
+                return [(p, None if r is None else json.loads(r), bool(n), bool(u)) for p, r, n, u in pages]
+            self.conn.execute('DELETE FROM pages WHERE code = ?', (code,))
+            self.conn.execute('INSERT OR REPLACE INTO series (code, status, started) VALUES (?, ?, ?)',
+                              (code, 'in_progress', time.time()))
+            return []
+
+    def save_page(self, code, page, rows, has_next, unchanged=False, digest=None):
+        """1ページ分を記録する。rows が None のページは未解析 (unchanged の場合のみ)。digest は本文の SHA-256"""
+        with self.lock, self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO pages (code, page, rows, row_count, has_next, unchanged, fetched, digest) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (code, page, None if rows is None else json.dumps(rows, ensure_ascii=False),
+                 0 if rows is None else len(rows), int(has_next), int(unchanged), time.time(), digest))
+            self.conn.execute('UPDATE series SET pages = (SELECT COUNT(*) FROM pages WHERE code = ?), '
+                              'rows = (SELECT COALESCE(SUM(row_count), 0) FROM pages WHERE code = ?) WHERE code = ?',
+                              (code, code, code))
+
+    def complete(self, code, row_count=None):
+        """CSV の保存 (または既存 CSV の維持) が終わったシリーズに完了マーカーを付け、各ページのハッシュを残す"""
+        with self.lock, self.conn:
+            self.conn.execute('UPDATE series SET status = ?, rows = COALESCE(?, rows), completed = ? WHERE code = ?',
+                              ('complete', row_count, time.time(), code))
+            self.conn.execute('DELETE FROM completed_pages WHERE code = ?', (code,))
+            self.conn.execute('INSERT INTO completed_pages (code, page, digest) '
+                              'SELECT code, page, digest FROM pages WHERE code = ? AND digest IS NOT NULL', (code,))
+            self.conn.execute('DELETE FROM pages WHERE code = ?', (code,))
+
+    def report(self):
+        status = self.status()
+        done = sum(1 for s in status.values() if s['status'] == 'complete')
+        pending = {c: s for c, s in status.items() if s['status'] != 'complete'}
+        text = f"Checkpoints: {done} series complete, {len(pending)} incomplete"
+        if pending:
+            text += " (" + ", ".join(f"{c}: {s['pages']} pages/{s['rows']} rows" for c, s in sorted(pending.items())) + ")"
+        return text
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
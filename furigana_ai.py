@@ -0,0 +1,374 @@
+import re
+import json
+import time
+import random
+import sqlite3
+import asyncio
+import hashlib
+from collections import deque
+
+import requests
+
+# --- AIによるフリガナ生成エンジン (asyncio) ---
+# 複数のバッチを同時にリクエストし、以下で流量を調整する。
+#   QuotaRateLimiter    : 429/クォータエラーで速度を半減 + 指数バックオフ、成功が続くと少しずつ戻す
+#   AdaptiveBatchSizer  : プロンプトのトークン予算と失敗率からバッチサイズを決める
+# バッチが終わるたびに on_batch_done を呼ぶので、呼び出し側で途中結果を保存できる。
+# バックエンドは Gemini SDK (GeminiBackend) と generateContent 形式の REST (RestBackend) の2種類。
+# RestBackend をローカルのモックサーバー (benchmarks/mock_llm_server.py) に向けてテストできる。
+# ReadingCache を渡すと、(モデル名, プロンプトテンプレートのハッシュ, カード名) で応答を保存・再利用する。
+
+class QuotaError(Exception):
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class ModelNotFoundError(Exception):
+    pass
+
+def classify_error(e):
+    """例外を 'quota' / 'not_found' / 'error' に分類する (SDK の例外はメッセージで判定)"""
+    if isinstance(e, QuotaError): return 'quota'
+    if isinstance(e, ModelNotFoundError): return 'not_found'
+    # 応答の解析失敗 (JSONDecodeError のメッセージには "(char 429)" のような位置が入る)
+    if isinstance(e, ValueError): return 'error'
+    msg = str(e)
+    code = getattr(e, 'code', None)
+    if code == 429 or '429' in msg or 'quota' in msg.lower() or 'ResourceExhausted' in type(e).__name__: return 'quota'
+    if code == 404 or '404' in msg or 'NotFound' in type(e).__name__: return 'not_found'
+    return 'error'
+
+class QuotaRateLimiter:
+    """
+    リクエスト開始間隔を 1/rate 秒以上空ける。
+    クォータエラーで rate を半分にし、連続回数に応じた指数バックオフ (ジッター付き) の間は全員待つ。
+    成功するたびに rate を increase ずつ max_rate まで戻す (AIMD)。
+    """
+    def __init__(self, rate, min_rate=0.05, max_rate=None, increase=0.05,
+                 base_backoff=2.0, max_backoff=60.0):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate or rate
+        self.increase = increase
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.consecutive_errors = 0
+        self.cooldown_until = 0.0
+        self.next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot, self.cooldown_until)
+            self.next_slot = slot + 1.0 / self.rate
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    def on_success(self):
+        self.consecutive_errors = 0
+        self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_quota_error(self, retry_after=None):
+        self.consecutive_errors += 1
+        self.rate = max(self.min_rate, self.rate / 2)
+        backoff = min(self.max_backoff, self.base_backoff * 2 ** (self.consecutive_errors - 1))
+        backoff *= random.uniform(0.8, 1.2)
+        wait = max(backoff, retry_after or 0)
+        self.cooldown_until = max(self.cooldown_until, time.monotonic() + wait)
+        return wait
+
+def estimate_tokens(text):
+    # 大まかな見積もり: ASCII は4文字で1トークン、それ以外 (日本語) は1文字1トークン
+    ascii_chars = sum(1 for c in text if ord(c) < 128)
+    return ascii_chars // 4 + (len(text) - ascii_chars) + 1
+
+class AdaptiveBatchSizer:
+    """
+    バッチに入れる件数を決める。入力 (テンプレート + 名前) と出力 (読み ≒ 名前の2倍) の
+    見積もりトークン数が token_budget を超えない範囲で、size 件まで詰める。
+    失敗 (応答が壊れている等) で size を半分にし、失敗したサイズ未満を上限にする。
+    成功で1ずつ増やし、上限は relax_after 回連続で成功するたびに1つ緩める。
+    """
+    def __init__(self, template, token_budget=8000, start=10, min_size=1, max_size=30, relax_after=20):
+        self.base_tokens = estimate_tokens(template)
+        self.token_budget = token_budget
+        self.size = start
+        self.min_size = min_size
+        self.max_size = max_size
+        self.ceiling = max_size
+        self.relax_after = relax_after
+        self.streak = 0
+        self.failures = 0
+        self.successes = 0
+
+    def name_tokens(self, name):
+        # 入力の "名前", と 出力の "名前": "ヨミ", の分
+        return estimate_tokens(name) * 3 + 8
+
+    def take(self, queue):
+        batch, tokens = [], self.base_tokens
+        while queue and len(batch) < self.size:
+            cost = self.name_tokens(queue[0])
+            if batch and tokens + cost > self.token_budget: break
+            batch.append(queue.popleft())
+            tokens += cost
+        return batch
+
+    def on_success(self):
+        self.successes += 1
+        self.streak += 1
+        if self.streak % self.relax_after == 0:
+            self.ceiling = min(self.max_size, self.ceiling + 1)
+        self.size = min(self.ceiling, self.size + 1)
+
+    def on_failure(self, batch_size=None):
+        self.failures += 1
+        self.streak = 0
+        failed = batch_size or self.size
+        self.ceiling = max(self.min_size, failed - 1)
+        self.size = max(self.min_size, min(self.size, failed) // 2)
+
+    @property
+    def failure_rate(self):
+        total = self.successes + self.failures
+        return self.failures / total if total else 0.0
+
+def build_prompt(template, names):
+    return template.replace("{{JSON_DATA}}", json.dumps(names, ensure_ascii=False))
+
+def parse_response(text):
+    """
+    応答から最初の {...} を JSON として取り出す。取り出せなければ ValueError。
+    読みが文字列でないもの (null や数値) は 'None' などの文字列にせず、応答に含まれなかった名前として捨てる。
+    """
+    match = re.search(r'\{.*\}', text or '', re.DOTALL)
+    if not match: raise ValueError("No JSON object in response")
+    data = json.loads(match.group(0))
+    if not isinstance(data, dict): raise ValueError("Response JSON is not an object")
+    return {str(k): v for k, v in data.items() if isinstance(v, str)}
+
+# --- 応答キャッシュ ---
+DEFAULT_CACHE_TTL = 90 * 24 * 3600
+DEFAULT_CACHE_MAX_ENTRIES = 50000
+
+def template_hash(template):
+    return hashlib.sha256(template.encode('utf-8')).hexdigest()[:16]
+
+class ReadingCache:
+    """
+    (モデル名, テンプレートのハッシュ, カード名) -> 解析済みの読み と 元の応答本文 を SQLite に保存する。
+    応答本文は同じバッチの名前で共有する (responses テーブル)。
+    読みが None のエントリは「応答に含まれなかった名前」で、従来通り処理済みとして扱う。
+    ttl 秒より古いものと、max_entries を超えた分 (最終利用が古い順) を evict() で削除する。
+    """
+    def __init__(self, path, ttl=DEFAULT_CACHE_TTL, max_entries=DEFAULT_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stats = {'hits': 0, 'misses': 0, 'stored': 0, 'evicted': 0}
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS responses (id INTEGER PRIMARY KEY, sha256 TEXT UNIQUE NOT NULL, raw TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS readings (
+                model TEXT NOT NULL, template TEXT NOT NULL, name TEXT NOT NULL, reading TEXT,
+                response_id INTEGER REFERENCES responses(id), created REAL NOT NULL, last_used REAL NOT NULL,
+                PRIMARY KEY (template, name, model)
+            );
+            CREATE INDEX IF NOT EXISTS idx_readings_last_used ON readings (last_used);
+        ''')
+
+    def lookup(self, models, template_key, names):
+        """models の優先順で探し、{name: reading (None あり)} を返す。見つからない名前は含まない"""
+        now = time.time()
+        found = {}
+        order = {m: i for i, m in enumerate(models)}
+        for name in names:
+            rows = self.conn.execute(
+                'SELECT model, reading, created FROM readings WHERE template = ? AND name = ?',
+                (template_key, name)).fetchall()
+            rows = [r for r in rows if r[0] in order and now - r[2] < self.ttl]
+            if not rows:
+                self.stats['misses'] += 1
+                continue
+            model, reading, _ = min(rows, key=lambda r: order[r[0]])
+            found[name] = reading
+            self.stats['hits'] += 1
+            self.conn.execute('UPDATE readings SET last_used = ? WHERE model = ? AND template = ? AND name = ?',
+                              (now, model, template_key, name))
+        self.conn.commit()
+        return found
+
+    def store(self, model, template_key, names, raw, readings):
+        now = time.time()
+        digest = hashlib.sha256(raw.encode('utf-8')).hexdigest()
+        with self.conn:
+            self.conn.execute('INSERT OR IGNORE INTO responses (sha256, raw) VALUES (?, ?)', (digest, raw))
+            response_id = self.conn.execute('SELECT id FROM responses WHERE sha256 = ?', (digest,)).fetchone()[0]
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO readings VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [(model, template_key, name, readings.get(name), response_id, now, now) for name in names])
+        self.stats['stored'] += len(names)
+
+    def evict(self):
+        with self.conn:
+            cur = self.conn.execute('DELETE FROM readings WHERE created < ?', (time.time() - self.ttl,))
+            evicted = cur.rowcount
+            count = self.conn.execute('SELECT COUNT(*) FROM readings').fetchone()[0]
+            if count > self.max_entries:
+                cur = self.conn.execute(
+                    'DELETE FROM readings WHERE rowid IN (SELECT rowid FROM readings ORDER BY last_used LIMIT ?)',
+                    (count - self.max_entries,))
+                evicted += cur.rowcount
+            self.conn.execute('DELETE FROM responses WHERE id NOT IN (SELECT DISTINCT response_id FROM readings)')
+        self.stats['evicted'] += evicted
+        return evicted
+
+    def report(self):
+        s = self.stats
+        total = s['hits'] + s['misses']
+        rate = (s['hits'] / total * 100) if total else 0.0
+        return (f"LLM cache: {s['hits']} hits, {s['misses']} misses, hit rate {rate:.1f}%, "
+                f"{s['stored']} stored, {s['evicted']} evicted")
+
+    def close(self):
+        self.evict()
+        self.conn.close()
+
+# --- バックエンド ---
+class GeminiBackend:
+    def __init__(self, api_key, temperature=0.1):
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        self.genai = genai
+        self.temperature = temperature
+
+    async def generate(self, model_name, prompt):
+        model = self.genai.GenerativeModel(model_name)
+        response = await model.generate_content_async(prompt, generation_config={"temperature": self.temperature})
+        return response.text
+
+class RestBackend:
+    """
+    generateContent 形式の REST API を呼ぶ (POST {base_url}/models/{model}:generateContent)。
+    ブロッキングの requests をスレッドに逃がして使う。
+    """
+    def __init__(self, base_url, api_key=None, temperature=0.1, timeout=120):
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self.temperature = temperature
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def _post(self, model_name, prompt):
+        url = f"{self.base_url}/models/{model_name}:generateContent"
+        body = {"contents": [{"parts": [{"text": prompt}]}], "generationConfig": {"temperature": self.temperature}}
+        params = {'key': self.api_key} if self.api_key else None
+        response = self.session.post(url, json=body, params=params, timeout=self.timeout)
+        if response.status_code == 429:
+            retry_after = response.headers.get('Retry-After')
+            raise QuotaError(f"429 quota exceeded for {model_name}", float(retry_after) if retry_after else None)
+        if response.status_code == 404:
+            raise ModelNotFoundError(f"404 model not found: {model_name}")
+        response.raise_for_status()
+        data = response.json()
+        return ''.join(p.get('text', '') for p in data['candidates'][0]['content']['parts'])
+
+    async def generate(self, model_name, prompt):
+        return await asyncio.to_thread(self._post, model_name, prompt)
+
+# --- 生成エンジン ---
+async def generate_readings(names, template, backend, models, on_batch_done=None,
+                            concurrency=4, rate=0.25, token_budget=8000, batch_size=10,
+                            max_batch_size=30, max_attempts=4, max_consecutive_quota_errors=6,
+                            cache=None, log=print):
+    """
+    names の読みを生成する。成功したバッチごとに on_batch_done(batch_names, readings) を呼ぶ。
+    cache (ReadingCache) があれば先に引き、見つかった名前は API を呼ばずに1回の on_batch_done で返す。
+    backend が None ならキャッシュだけを使う。
+    戻り値は統計 (requests, quota_errors, errors, batches, succeeded, cached, failed, remaining, elapsed, ...)。
+    failed は max_attempts 回失敗した名前、remaining はクォータ切れ等で手を付けなかった名前
+    (どちらも呼び出し側で未処理のまま残す)。
+    """
+    template_key = template_hash(template)
+    cached = cache.lookup(models, template_key, names) if cache else {}
+    if cached and on_batch_done:
+        on_batch_done([n for n in names if n in cached], {n: r for n, r in cached.items() if r is not None})
+    queue = deque(n for n in names if n not in cached)
+    attempts = {}
+    available_models = list(models)
+    limiter = QuotaRateLimiter(rate)
+    sizer = AdaptiveBatchSizer(template, token_budget=token_budget, start=batch_size, max_size=max_batch_size)
+    stats = {'requests': 0, 'quota_errors': 0, 'errors': 0, 'batches': 0, 'succeeded': 0,
+             'cached': len(cached), 'failed': []}
+    stopped = False
+    start = time.monotonic()
+
+    def requeue(batch, count_attempt):
+        # 失敗したバッチは先頭に戻す (次は縮んだバッチサイズで切り直される)
+        # クォータエラーは名前のせいではないので試行回数に数えない (連続回数で打ち切る)
+        for name in reversed(batch):
+            if count_attempt: attempts[name] = attempts.get(name, 0) + 1
+            if attempts.get(name, 0) >= max_attempts: stats['failed'].append(name)
+            else: queue.appendleft(name)
+
+    async def worker(worker_id):
+        nonlocal stopped
+        while queue and available_models and backend and not stopped:
+            # 送信枠を得てからバッチを切り出す (待っている間に失敗・成功の結果がサイズに反映される)
+            await limiter.acquire()
+            if stopped: break
+            batch = sizer.take(queue)
+            if not batch: break
+            prompt = build_prompt(template, batch)
+            result = None
+            failed_size = 0
+            # クォータ・その他のエラーでも次のモデルを試し (従来と同じ)、全モデルが失敗したときだけ戻す
+            for i, model_name in enumerate(list(available_models)):
+                if stopped: break
+                if i > 0: await limiter.acquire()
+                stats['requests'] += 1
+                try:
+                    text = await backend.generate(model_name, prompt)
+                    result = parse_response(text)
+                    limiter.on_success()
+                    if cache: cache.store(model_name, template_key, batch, text, result)
+                    break
+                except Exception as e:
+                    kind = classify_error(e)
+                    if kind == 'not_found':
+                        if model_name in available_models: available_models.remove(model_name)
+                        log(f"    Model {model_name} not available. Next: {available_models[0] if available_models else 'none'}")
+                        continue
+                    if kind == 'quota':
+                        stats['quota_errors'] += 1
+                        wait = limiter.on_quota_error(getattr(e, 'retry_after', None))
+                        log(f"    Rate limit on {model_name}. Backing off {wait:.1f}s (rate {limiter.rate:.2f}/s)")
+                        if limiter.consecutive_errors >= max_consecutive_quota_errors and not stopped:
+                            # 日次クォータ切れなどで回復しない場合は打ち切って次回の実行に回す
+                            log(f"    {limiter.consecutive_errors} quota errors in a row. Stopping for this run.")
+                            stopped = True
+                    else:
+                        stats['errors'] += 1
+                        failed_size = len(batch)
+                        log(f"    Error with {model_name}: {str(e).splitlines()[0] if str(e) else type(e).__name__} "
+                            f"(batch of {len(batch)})")
+
+            if result is None:
+                if failed_size: sizer.on_failure(failed_size)
+                requeue(batch, count_attempt=bool(failed_size))
+                continue
+            sizer.on_success()
+            stats['batches'] += 1
+            stats['succeeded'] += len(batch)
+            # 応答に含まれなかった名前も処理済みとして扱う (従来と同じ)
+            if on_batch_done: on_batch_done(batch, result)
+            log(f"  [{worker_id}] Batch of {len(batch)} done ({stats['succeeded']}/{len(names)}, rate {limiter.rate:.2f}/s)")
+
+    await asyncio.gather(*(worker(i) for i in range(max(1, concurrency))))
+    stats['remaining'] = list(queue)
+    stats['elapsed'] = time.monotonic() - start
+    stats['final_rate'] = limiter.rate
+    stats['final_batch_size'] = sizer.size
+    stats['failure_rate'] = sizer.failure_rate
+    return stats
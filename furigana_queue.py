@@ -0,0 +1,179 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+
+from card_export import atomic_open
+
+# --- フリガナ処理キュー (SQLite) ---
+# unverified_cards.json (処理待ち) と verified_cards.json (チェック済み) の代わりに使う。
+#   queue    : 処理待ち。優先度・試行回数・リース期限を持つ
+#   verified : チェック済み {カード名: 読み} (登録順を保持)
+# 操作はすべて1トランザクションで行うので、途中で落ちても直前のコミットまでの状態が残る。
+# JSON ファイルとは import_json / export_json で相互変換する (リポジトリ上は従来通り JSON で管理)。
+# 前回書き出した JSON のハッシュを meta に記録し、JSON が外部で編集されていたら開いたときに取り込み直す。
+
+QUEUE_VERSION = 1
+DEFAULT_LEASE_SECONDS = 3600
+
+def _file_digest(paths):
+    h = hashlib.sha256()
+    for path in paths:
+        h.update(path.encode('utf-8') + b'\0')
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                h.update(f.read())
+        h.update(b'\0')
+    return h.hexdigest()
+
+def _read_json(path, default):
+    if not os.path.exists(path): return default
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Warning: Could not read {path} ({e})")
+        return default
+
+class FuriganaQueue:
+    def __init__(self, path):
+        self.path = path
+        # isolation_level=None でトランザクションを明示的に管理する
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode = WAL')
+        self.conn.executescript(f'''
+            CREATE TABLE IF NOT EXISTS queue (
+                name TEXT PRIMARY KEY, priority INTEGER NOT NULL DEFAULT 0,
+                attempts INTEGER NOT NULL DEFAULT 0, lease_until REAL NOT NULL DEFAULT 0,
+                enqueued INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_queue_order ON queue (priority DESC, attempts, enqueued);
+            CREATE TABLE IF NOT EXISTS verified (name TEXT PRIMARY KEY, reading TEXT NOT NULL DEFAULT '');
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+            PRAGMA user_version = {QUEUE_VERSION};
+        ''')
+        self._seq = self.conn.execute('SELECT COALESCE(MAX(enqueued), 0) FROM queue').fetchone()[0]
+
+    def _transaction(self):
+        return _Transaction(self.conn)
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM queue').fetchone()[0]
+
+    def names(self):
+        return {r[0] for r in self.conn.execute('SELECT name FROM queue')}
+
+    def enqueue(self, priorities):
+        """{name: 優先度} を追加する (既にあるものは無視)。追加した件数を返す"""
+        added = 0
+        with self._transaction():
+            for name, priority in priorities.items():
+                self._seq += 1
+                cur = self.conn.execute('INSERT OR IGNORE INTO queue (name, priority, enqueued) VALUES (?, ?, ?)',
+                                        (name, priority, self._seq))
+                added += cur.rowcount
+        return added
+
+    def remove(self, names):
+        with self._transaction():
+            self.conn.executemany('DELETE FROM queue WHERE name = ?', [(n,) for n in names])
+
+    def dequeue(self, limit, lease_seconds=DEFAULT_LEASE_SECONDS):
+        """
+        優先度の高い順 (同じなら試行回数が少なく古い順) に最大 limit 件を取り出し、リースを付けて返す。
+        ack されないまま期限が切れたもの (途中で落ちた実行の分) は再び取り出せる。
+        """
+        now = time.time()
+        with self._transaction():
+            names = [r[0] for r in self.conn.execute(
+                'SELECT name FROM queue WHERE lease_until <= ? ORDER BY priority DESC, attempts, enqueued LIMIT ?',
+                (now, limit))]
+            self.conn.executemany('UPDATE queue SET lease_until = ?, attempts = attempts + 1 WHERE name = ?',
+                                  [(now + lease_seconds, n) for n in names])
+        return names
+
+    def ack(self, readings):
+        """{name: 読み} を処理済みにする (キューから削除し verified に登録)"""
+        with self._transaction():
+            self.conn.executemany('DELETE FROM queue WHERE name = ?', [(n,) for n in readings])
+            self.conn.executemany(
+                'INSERT INTO verified (name, reading) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET reading = excluded.reading',
+                list(readings.items()))
+
+    def release(self, names):
+        """処理できなかった名前のリースを外し、すぐ取り出せるようにする"""
+        with self._transaction():
+            self.conn.executemany('UPDATE queue SET lease_until = 0 WHERE name = ?', [(n,) for n in names])
+
+    def verified(self):
+        return dict(self.conn.execute('SELECT name, reading FROM verified ORDER BY rowid'))
+
+    def ordered_names(self):
+        return [r[0] for r in self.conn.execute('SELECT name FROM queue ORDER BY priority DESC, attempts, enqueued')]
+
+    # --- JSON との相互変換 ---
+    def import_json(self, unverified_path, verified_path, priority_func=None, readings=None):
+        """
+        JSON の内容にキューと verified を合わせる。既にある名前の優先度・試行回数は保持する。
+        verified が名前のリスト (旧形式) の場合、読みは readings (フリガナ辞書) から引き、無いものは除く。
+        """
+        unverified = _read_json(unverified_path, [])
+        verified = _read_json(verified_path, {})
+        if isinstance(verified, list):
+            readings = readings or {}
+            verified = {k: readings.get(k, '') for k in verified if k in readings}
+        names = [n for n in unverified if isinstance(n, str)] if isinstance(unverified, list) else []
+        with self._transaction():
+            keep = set(names)
+            for name in self.names() - keep:
+                self.conn.execute('DELETE FROM queue WHERE name = ?', (name,))
+            for name in names:
+                self._seq += 1
+                priority = priority_func(name) if priority_func else 0
+                self.conn.execute('INSERT OR IGNORE INTO queue (name, priority, enqueued) VALUES (?, ?, ?)',
+                                  (name, priority, self._seq))
+            self.conn.execute('DELETE FROM verified')
+            self.conn.executemany('INSERT INTO verified (name, reading) VALUES (?, ?)',
+                                  [(k, str(v)) for k, v in verified.items()])
+            self._set_meta('json_digest', _file_digest([unverified_path, verified_path]))
+        return len(names), len(verified)
+
+    def export_json(self, unverified_path, verified_path):
+        """キューを JSON に書き出す。内容が変わらないファイルは書き換えない"""
+        written = []
+        for path, data in ((unverified_path, self.ordered_names()), (verified_path, self.verified())):
+            current = _read_json(path, None)
+            if current == data or (not current and not data and current is not None): continue
+            with atomic_open(path) as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            written.append(path)
+        with self._transaction():
+            self._set_meta('json_digest', _file_digest([unverified_path, verified_path]))
+        return written
+
+    def is_in_sync(self, unverified_path, verified_path):
+        return self._get_meta('json_digest') == _file_digest([unverified_path, verified_path])
+
+    def _get_meta(self, key):
+        row = self.conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        self.conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, value))
+
+    def close(self):
+        self.conn.close()
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT (例外時は ROLLBACK)"""
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+        return False
@@ -0,0 +1,41 @@
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# --- フリガナの正規化・チェック ---
+# 従来の re.sub 2回 / re.fullmatch 2回 と同じ結果を、
+#   normalize_furigana : 削除文字の str.translate テーブル (モジュール読み込み時に1回だけ作る)
+#   is_valid_furigana  : 文字集合がカタカナ集合かひらがな集合に収まるか (1パス)
+# で返す。どちらも名前ごとにメモ化する (同じカード名・読みが何千行も繰り返されるため)。
+
+# 空白 (正規表現の \s と同じ = str.isspace、すべて BMP 内) と全角スペース
+_WHITESPACE = ''.join(chr(c) for c in range(0x10000) if chr(c).isspace()) + '　'
+# 記号。従来の正規表現では「，-－」が範囲 (U+FF0C-U+FF0D) として解釈されており、
+# 半角の '-' は削除されていなかったので、互換のためそのままにしている
+_SYMBOLS = '!！?？"”#＃$＄%％&＆\'’(（)）*＊+＋,，－.．/／:：;；<＜=＝>＞@＠[［\\￥]］^＾_＿`｀{｛|｜}｝~～'
+_REMOVE_TABLE = str.maketrans('', '', _WHITESPACE + _SYMBOLS)
+
+# カタカナ(30A1-30F6) / 平仮名(3041-3096) と 中黒(30FB)・長音(30FC)
+_KATAKANA = frozenset(chr(c) for c in range(0x30A1, 0x30F7)) | {'・', 'ー'}
+_HIRAGANA = frozenset(chr(c) for c in range(0x3041, 0x3097)) | {'・', 'ー'}
+
+CACHE_SIZE = 65536
+
+@lru_cache(maxsize=CACHE_SIZE)
+def normalize_furigana(reading):
+    if not reading: return ""
+    return reading.translate(_REMOVE_TABLE)
+
+@lru_cache(maxsize=CACHE_SIZE)
+def is_valid_furigana(reading):
+    if not reading: return False
+    chars = set(reading)
+    return chars <= _KATAKANA or chars <= _HIRAGANA
+
+def normalize_furigana_series(series):
+    """Series 版。ユニーク値ごとに1回だけ正規化して全行に配る"""
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    mapped = np.empty(len(uniques), dtype=object)
+    mapped[:] = [normalize_furigana(u) for u in uniques]
+    return pd.Series(mapped[codes], index=series.index, name=series.name)
@@ -0,0 +1,259 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# --- 設定 ---
+DEFAULT_HEADERS = {'User-Agent': 'Mozilla/5.0 (compatible; Bot/1.0)'}
+DEFAULT_TIMEOUT = 30  # 秒
+DEFAULT_CACHE_MAX_BYTES = 200 * 1024 * 1024  # キャッシュ本体の合計サイズ上限
+
+# --- レート制限 (トークンバケット) ---
+class TokenBucket:
+    """
+    rate 件/秒 でトークンを補充し、最大 capacity 個まで貯める。
+    acquire() はトークンが取れるまで待機する (スレッドセーフ)。
+    """
+    def __init__(self, rate, capacity=1):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0: return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+# --- レスポンス ---
+class FetchResult:
+    """
+    HttpClient.get() の戻り値。unchanged は「前回の HTTP 取得時と内容が同じ」
+    (304 Not Modified もしくは本文のハッシュが一致) を表す。前回の取得が途中で失敗した実行のものでも
+    キャッシュは更新されているので、「前回保存した出力と同じ」かどうかは sha256 を保存時のハッシュと比べること。
+    """
+    def __init__(self, url, content, encoding, status_code, unchanged=False):
+        self.url = url
+        self.content = content
+        self.encoding = encoding
+        self.status_code = status_code
+        self.unchanged = unchanged
+
+    @property
+    def sha256(self):
+        return hashlib.sha256(self.content).hexdigest()
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or 'utf-8', errors='replace')
+
+# --- ディスクキャッシュ ---
+class ResponseCache:
+    """
+    URLをキーにレスポンス本文と ETag / Last-Modified / SHA-256 を保存する。
+    index.json にメタ情報、<URLのハッシュ>.body に本文を置き、
+    合計サイズが max_bytes を超えたら最終アクセスが古いものから削除する。
+    """
+    INDEX_FILE = 'index.json'
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'not_modified': 0, 'identical': 0, 'bytes_saved': 0}
+        os.makedirs(cache_dir, exist_ok=True)
+        self.index = self._load_index()
+
+    def _load_index(self):
+        path = os.path.join(self.cache_dir, self.INDEX_FILE)
+        if not os.path.exists(path): return {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+                return data if isinstance(data, dict) else {}
+        except Exception as e:
+            print(f"Warning: HTTP cache index is broken, starting empty ({e})")
+            return {}
+
+    def _body_path(self, url):
+        return os.path.join(self.cache_dir, hashlib.sha1(url.encode('utf-8')).hexdigest() + '.body')
+
+    def lookup(self, url):
+        with self.lock:
+            entry = self.index.get(url)
+            if entry and os.path.exists(self._body_path(url)):
+                return dict(entry)
+            return None
+
+    def conditional_headers(self, entry):
+        headers = {}
+        if not entry: return headers
+        if entry.get('etag'): headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'): headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def read_body(self, url):
+        """キャッシュ済みの本文。lookup() の後に追い出された場合は None"""
+        with self.lock:
+            if url not in self.index: return None
+            try:
+                with open(self._body_path(url), 'rb') as f:
+                    return f.read()
+            except FileNotFoundError:
+                return None
+
+    def touch(self, url, not_modified):
+        with self.lock:
+            entry = self.index.get(url)
+            if entry: entry['last_access'] = time.time()
+            self.stats['hits'] += 1
+            if not_modified:
+                self.stats['not_modified'] += 1
+                self.stats['bytes_saved'] += entry['size'] if entry else 0
+            else:
+                self.stats['identical'] += 1
+
+    def store(self, url, response, content, digest):
+        body_path = self._body_path(url)
+        fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=self.cache_dir)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        with self.lock:
+            os.replace(tmp_path, body_path)
+            self.stats['misses'] += 1
+            self.index[url] = {
+                'etag': response.headers.get('ETag', ''),
+                'last_modified': response.headers.get('Last-Modified', ''),
+                'sha256': digest,
+                'size': len(content),
+                'encoding': response.encoding or response.apparent_encoding,
+                'last_access': time.time(),
+            }
+            self._evict()
+
+    def _evict(self):
+        total = sum(e.get('size', 0) for e in self.index.values())
+        if total <= self.max_bytes: return
+        for url, entry in sorted(self.index.items(), key=lambda kv: kv[1].get('last_access', 0)):
+            if total <= self.max_bytes: break
+            total -= entry.get('size', 0)
+            del self.index[url]
+            body_path = self._body_path(url)
+            if os.path.exists(body_path): os.remove(body_path)
+
+    def save(self):
+        with self.lock:
+            path = os.path.join(self.cache_dir, self.INDEX_FILE)
+            fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=self.cache_dir)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self.index, f, ensure_ascii=False, indent=2, sort_keys=True)
+            os.replace(tmp_path, path)
+
+    def report(self):
+        s = self.stats
+        total = s['hits'] + s['misses']
+        rate = (s['hits'] / total * 100) if total else 0.0
+        return (f"HTTP cache: {s['hits']} hits ({s['not_modified']} not modified, {s['identical']} identical), "
+                f"{s['misses']} misses, hit rate {rate:.1f}%, {s['bytes_saved']:,} bytes saved")
+
+# --- HTTPクライアント ---
+class HttpClient:
+    """
+    1つの requests.Session (keep-alive のコネクションプール) を全スレッドで共有し、
+    ホストごとのトークンバケットでリクエスト間隔を制御する。
+    """
+    def __init__(self, max_workers=4, rate=1.0, burst=1, timeout=DEFAULT_TIMEOUT, cache=None):
+        self.cache = cache
+        self.rate = rate
+        self.burst = burst
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update(DEFAULT_HEADERS)
+        adapter = HTTPAdapter(pool_connections=max(1, max_workers), pool_maxsize=max(1, max_workers))
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def limiter_for(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._limiters:
+                self._limiters[host] = TokenBucket(self.rate, self.burst)
+            return self._limiters[host]
+
+    def get(self, url):
+        """
+        キャッシュがあれば条件付きGET (If-None-Match / If-Modified-Since) を送る。
+        304 の場合はキャッシュ済みの本文を返す。
+        """
+        entry = self.cache.lookup(url) if self.cache else None
+        headers = self.cache.conditional_headers(entry) if self.cache else None
+        self.limiter_for(url).acquire()
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+
+        refetched = False
+        if response.status_code == 304 and entry:
+            body = self.cache.read_body(url)
+            if body is not None:
+                self.cache.touch(url, not_modified=True)
+                return FetchResult(url, body, entry.get('encoding'), 304, unchanged=True)
+            # 条件付きGETの間に本文が追い出された (別スレッドの store) 場合は、条件なしで取り直す
+            self.limiter_for(url).acquire()
+            response = self.session.get(url, timeout=self.timeout)
+            refetched = True
+
+        response.raise_for_status()
+        content = response.content
+        encoding = response.encoding or response.apparent_encoding
+        if not self.cache:
+            return FetchResult(url, content, encoding, response.status_code)
+
+        digest = hashlib.sha256(content).hexdigest()
+        unchanged = bool(entry) and entry.get('sha256') == digest
+        if unchanged and not refetched:
+            self.cache.touch(url, not_modified=False)
+            return FetchResult(url, content, encoding, response.status_code, unchanged=True)
+        # 取り直した場合は、内容が同じでも本文をキャッシュに戻す
+        self.cache.store(url, response, content, digest)
+        return FetchResult(url, content, encoding, response.status_code, unchanged=unchanged)
+
+    def download(self, url, path, chunk_size=256 * 1024):
+        """
+        url の本文を path にストリーミングで保存し、書き込んだバイト数を返す (キャッシュは使わない)。
+        同じディレクトリの一時ファイルに書いてから置き換えるので、途中で失敗しても壊れたファイルは残らない。
+        """
+        self.limiter_for(url).acquire()
+        with self.session.get(url, stream=True, timeout=self.timeout) as response:
+            response.raise_for_status()
+            fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(os.path.abspath(path)))
+            try:
+                size = 0
+                with os.fdopen(fd, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=chunk_size):
+                        f.write(chunk)
+                        size += len(chunk)
+                os.replace(tmp_path, path)
+            except:
+                if os.path.exists(tmp_path): os.remove(tmp_path)
+                raise
+        return size
+
+    def close(self):
+        if self.cache: self.cache.save()
+        self.session.close()
@@ -0,0 +1,118 @@
+import os
+import hashlib
+
+from card_export import temp_path_for
+
+# --- 画像の派生ファイル (フルサイズJPEG・サムネイル・WebP/AVIF) ---
+# 1回のデコードから、設定した派生ファイルをまとめて書き出す。
+# 出力名は「元の出力名の拡張子なし + suffix + ext」 (例: OP01-001.jpg / OP01-001_small.webp)。
+# main.py もこの命名規則で ImageFileID_small を埋めるため、Pillow はここでは読み込まない
+# (render_derivatives の中でだけ import する)。
+#
+#   format / ext : 保存形式と拡張子
+#   quality      : 画質
+#   max_size     : (幅, 高さ) に収まるよう縮小する。None ならフルサイズ
+#   options      : save() に渡すその他の引数
+
+DERIVATIVE_SPECS = {
+    # 従来の出力と同じ (バイト単位で一致する)
+    'full': {'suffix': '', 'format': 'JPEG', 'ext': '.jpg', 'quality': 20, 'max_size': None,
+             'options': {'optimize': True}},
+    # 一覧表示用のサムネイル (ImageFileID_small)
+    'small': {'suffix': '_small', 'format': 'WEBP', 'ext': '.webp', 'quality': 60, 'max_size': (200, 280),
+              'options': {'method': 4}},
+    'webp': {'suffix': '', 'format': 'WEBP', 'ext': '.webp', 'quality': 50, 'max_size': None,
+             'options': {'method': 4}},
+    'avif': {'suffix': '', 'format': 'AVIF', 'ext': '.avif', 'quality': 40, 'max_size': None,
+             'options': {}},
+    'small_avif': {'suffix': '_small', 'format': 'AVIF', 'ext': '.avif', 'quality': 45, 'max_size': (200, 280),
+                   'options': {}},
+}
+# 既定はフルサイズだけ。small を既定にすると既存の画像がすべて「出力不足」になり Drive から取り直すため、
+# 既存画像のサムネイルを作り終えるまでは --derivatives full,small で明示したときだけ作る
+DEFAULT_DERIVATIVES = ('full',)
+SMALL_DERIVATIVE = 'small'
+
+# サイトの画像が遅延読み込みのときに src に入っているプレースホルダー
+PLACEHOLDER_IMAGE_IDS = {'dummy.gif'}
+
+def parse_derivatives(value):
+    """'full,small,webp' -> ['full', 'small', 'webp'] (未知の名前は ValueError)"""
+    names = [v.strip() for v in value.split(',') if v.strip()] if isinstance(value, str) else list(value)
+    unknown = [n for n in names if n not in DERIVATIVE_SPECS]
+    if unknown:
+        raise ValueError(f"未知の派生ファイル: {', '.join(unknown)} (使用可能: {', '.join(DERIVATIVE_SPECS)})")
+    return names
+
+def supported_derivatives(names):
+    """この環境の Pillow で保存できる形式だけを返す (AVIF は Pillow のビルドによっては使えない)"""
+    from PIL import features
+    checks = {'WEBP': 'webp', 'AVIF': 'avif'}
+    return [n for n in names
+            if DERIVATIVE_SPECS[n]['format'] not in checks or features.check(checks[DERIVATIVE_SPECS[n]['format']])]
+
+def derivative_path(output_path, name):
+    """フルサイズの出力パス (拡張子は問わない) から派生ファイルのパスを作る"""
+    spec = DERIVATIVE_SPECS[name]
+    return os.path.splitext(output_path)[0] + spec['suffix'] + spec['ext']
+
+def encoder_settings(names):
+    """マニフェストに記録する変換設定 (変わったら変換し直す)"""
+    return {n: {k: (list(v) if isinstance(v, tuple) else v) for k, v in DERIVATIVE_SPECS[n].items()} for n in names}
+
+def small_image_id(image_file_id):
+    """ImageFileID に対応するサムネイルのファイル名 (プレースホルダーや空なら '')"""
+    image_file_id = (image_file_id or '').split('?')[0]
+    if not image_file_id or image_file_id in PLACEHOLDER_IMAGE_IDS:
+        return ''
+    return derivative_path(os.path.splitext(image_file_id)[0], SMALL_DERIVATIVE)
+
+def _flatten(img, Image):
+    # 透過情報(RGBAなど)があれば、白背景のRGBに変換して警告を防ぐ
+    if img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info):
+        background = Image.new("RGB", img.size, (255, 255, 255)) # 白背景
+        if img.mode == 'P':
+            img = img.convert('RGBA')
+        background.paste(img, mask=img.split()[3]) # 透過部分を合成
+        return background
+    return img.convert("RGB")
+
+def _downscale(img, max_size, Image):
+    """reduce() で整数分の1まで高速に縮小してから、残りを LANCZOS で合わせる"""
+    width, height = img.size
+    factor = min(width // max_size[0], height // max_size[1])
+    if factor >= 2:
+        img = img.reduce(factor)
+    else:
+        img = img.copy()
+    img.thumbnail(max_size, Image.LANCZOS)
+    return img
+
+def render_derivatives(src_path, output_path, names=DEFAULT_DERIVATIVES):
+    """
+    src_path を1回だけデコードし、names の派生ファイルを output_path を基準に書き出す。
+    各ファイルは一時ファイルに書いてから置き換える。{出力パス: SHA-256} を返す。
+    """
+    from PIL import Image
+
+    specs = {n: DERIVATIVE_SPECS[n] for n in names}
+    hashes = {}
+    with Image.open(src_path) as img:
+        # 縮小版しか要らないときは、JPEG ソースなら draft() でデコード時点から縮小する
+        if all(s['max_size'] for s in specs.values()) and img.format == 'JPEG':
+            largest = max((s['max_size'] for s in specs.values()), key=lambda m: m[0] * m[1])
+            img.draft('RGB', largest)
+        img_rgb = _flatten(img, Image)
+
+    for name, spec in specs.items():
+        image = _downscale(img_rgb, spec['max_size'], Image) if spec['max_size'] else img_rgb
+        path = derivative_path(output_path, name)
+        tmp_path = temp_path_for(path)
+        try:
+            image.save(tmp_path, spec['format'], quality=spec['quality'], **spec['options'])
+            with open(tmp_path, 'rb') as f:
+                hashes[path] = hashlib.sha256(f.read()).hexdigest()
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path): os.remove(tmp_path)
+    return hashes
@@ -0,0 +1,124 @@
+import os
+import json
+import hashlib
+
+from card_export import atomic_open
+
+# --- 画像マニフェスト ---
+# 出力済み画像を Drive のファイルID ごとに記録する JSON。
+#   path / output : リスト上のパスと出力ファイル (出力フォルダからの相対パス)
+#   source        : リストにあればソースの更新日時・サイズ・MD5 (modifiedTime / size / md5Checksum)
+#   outputHash    : 出力ファイルの SHA-256
+#   derivatives   : 同じソースから作った他の出力 (サムネイル等) の {相対パス: SHA-256}
+#   encoder       : 変換設定 (コピーしただけのファイルは null)
+# 出力フォルダの中身を1件ずつ os.path.exists で確かめる代わりに、ID の集合演算で差分を出す。
+# そのため出力フォルダ (画像リポジトリ) を丸ごとクローンしなくても差分だけ処理できる。
+
+MANIFEST_VERSION = 1
+
+# ファイルリストのキー -> マニフェストのキー (GAS の出力と Drive API の両方の名前を受け付ける)
+SOURCE_FIELDS = {
+    'modifiedTime': 'modifiedTime', 'mtime': 'modifiedTime',
+    'size': 'size',
+    'md5Checksum': 'md5', 'md5': 'md5',
+}
+
+def source_signature(file_info):
+    """ファイルリストの1件から、ソースの変更検出に使う項目を取り出す"""
+    signature = {}
+    for key, field in SOURCE_FIELDS.items():
+        value = file_info.get(key)
+        if value not in (None, ''):
+            signature[field] = str(value)
+    return signature
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+class ImageManifest:
+    def __init__(self, path, files=None):
+        self.path = path
+        self.files = files or {}  # {ファイルID: エントリ}
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path):
+        if not os.path.exists(path):
+            return cls(path)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"警告: マニフェストを読み込めませんでした ({path}: {e})")
+            return cls(path)
+        if data.get('version') != MANIFEST_VERSION:
+            print(f"警告: マニフェストのバージョンが異なるため作り直します ({path})")
+            return cls(path)
+        return cls(path, data.get('files', {}))
+
+    def __len__(self):
+        return len(self.files)
+
+    def __contains__(self, file_id):
+        return file_id in self.files
+
+    def diff(self, tasks):
+        """
+        tasks ({ファイルID: タスク}) とマニフェストを比べ、(new, changed, unchanged, deleted) の ID リストを返す。
+        changed: パス・出力先・変換設定が変わったもの、またはソースの項目 (両方にあるもの) が変わったもの。
+        """
+        recorded = self.files.keys()
+        new = [i for i in tasks if i not in recorded]
+        deleted = [i for i in self.files if i not in tasks]
+        changed, unchanged = [], []
+        for file_id, task in tasks.items():
+            if file_id not in recorded: continue
+            entry = self.files[file_id]
+            old_source = entry.get('source', {})
+            source_changed = any(old_source[k] != v for k, v in task['source'].items() if k in old_source)
+            if (source_changed or entry.get('path') != task['rel_path'] or entry.get('output') != task['output_filename']
+                    or entry.get('encoder') != task['encoder']):
+                changed.append(file_id)
+            else:
+                unchanged.append(file_id)
+        return new, changed, unchanged, deleted
+
+    def record(self, file_id, task, hashes):
+        """hashes: {出力フォルダからの相対パス: SHA-256} (task['output_filename'] 以外は派生ファイルとして記録)"""
+        hashes = dict(hashes)
+        entry = {
+            'path': task['rel_path'],
+            'output': task['output_filename'],
+            'source': task['source'],
+            'outputHash': hashes.pop(task['output_filename'], ''),
+            'encoder': task['encoder'],
+        }
+        if hashes: entry['derivatives'] = dict(sorted(hashes.items()))
+        self.files[file_id] = entry
+        self.dirty = True
+
+    def outputs(self, file_id):
+        """記録されている出力ファイル (相対パス) をすべて返す"""
+        entry = self.files[file_id]
+        return ([entry['output']] if entry.get('outputHash') else []) + list(entry.get('derivatives', {}))
+
+    def output_names(self):
+        """記録されている全出力 (派生ファイルを含む) のファイル名 (ディレクトリを除く) の集合"""
+        return {os.path.basename(o) for file_id in self.files for o in self.outputs(file_id)}
+
+    def forget(self, file_id):
+        if self.files.pop(file_id, None) is not None:
+            self.dirty = True
+
+    def save(self):
+        if not self.dirty: return False
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with atomic_open(self.path) as f:
+            json.dump({'version': MANIFEST_VERSION, 'files': dict(sorted(self.files.items()))},
+                      f, ensure_ascii=False, indent=1)
+        self.dirty = False
+        return True
@@ -3,24 +3,106 @@ import time
 import json
 import requests
 import pandas as pd
+import numpy as np
 from bs4 import BeautifulSoup
 import re
-import copy
-import uuid
+import hashlib
+import unicodedata
 import google.generativeai as genai
 import importlib.metadata
 import argparse  # 【追加】引数処理用
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from http_client import HttpClient, ResponseCache
+from card_export import write_cards, write_precompressed, remove_precompressed, precompressed_paths, temp_path_for, atomic_open, load_card_hashes, ShardExporter, JSON_FORMATS
+from merge_store import MergeStore, read_data_files, sort_priority, categorize
+from card_db import CardDbBuilder
+from search_index import SearchIndexBuilder
+from card_binary import ParquetExporter, MsgpackExporter, HAS_PARQUET, HAS_MSGPACK
+from furigana_ai import generate_readings, GeminiBackend, RestBackend, ReadingCache
+from furigana_queue import FuriganaQueue
+from furigana_text import normalize_furigana, is_valid_furigana, normalize_furigana_series
+from card_parser import get_text_with_alt, parse_card_page, scan_card_page, PARSER_ENGINES, DEFAULT_PARSER_ENGINE
+from image_derivatives import small_image_id
+from image_manifest import ImageManifest
+from run_metrics import metrics, run_profiled, PROFILERS
+from fetch_checkpoint import FetchCheckpoints
+from series_watch import WatchState, content_digest
 
 # --- 設定 ---
-BASE_URL = 'https://www.onepiece-cardgame.com/cardlist/'
+# 環境変数 CARDLIST_BASE_URL でローカルのスタンドインサーバー (benchmarks/stub_server.py) に向けられる
+BASE_URL = os.environ.get('CARDLIST_BASE_URL', 'https://www.onepiece-cardgame.com/cardlist/')
 DATA_DIR = 'data'
 PROMPT_DIR = 'prompts'
 OUTPUT_CSV = 'OnePiece_Card_List_All.csv'
 OUTPUT_JSON = 'cards.json'
+OUTPUT_NDJSON = 'cards.ndjson'
+# cards.json の書式 ('pretty' = indent=2, 'compact' = 空白なし)。--json-format で上書き可能
+OUTPUT_JSON_FORMAT = 'pretty'
+# cards.json.gz / cards.json.br を併せて出力するか (--no-precompress で無効)
+PRECOMPRESS_JSON = True
+# 差分配信用の出力 (シリーズ別シャード + マニフェスト + 前回からの差分)。--no-shards で無効
+EXPORT_SHARDS = True
+SHARD_DIR = 'shards'
+OUTPUT_MANIFEST = 'cards.manifest.json'
+OUTPUT_DELTA = 'cards.delta.json'
+# 検索用の正規化SQLiteデータベース (card_db.py で検索できる)。--sqlite で出力
+EXPORT_SQLITE = False
+OUTPUT_SQLITE = 'cards.sqlite'
+# 列指向 (Parquet) / MessagePack のバイナリ出力 (card_binary.py で読み込める)。--parquet / --msgpack で出力
+EXPORT_PARQUET = False
+OUTPUT_PARQUET = 'cards.parquet'
+EXPORT_MSGPACK = False
+OUTPUT_MSGPACK = 'cards.msgpack'
+# 名前・読み・効果テキストの n-gram 検索インデックス (search_index.py)。--no-search-index で無効
+EXPORT_SEARCH_INDEX = True
+OUTPUT_SEARCH_INDEX = 'cards.search.json'
+# ステージ別の所要時間・リクエスト数・転送量・ピークメモリのレポート (run_metrics.py)
+RUN_REPORT_FILE = 'run_report.json'
+# --profile 指定時のプロファイル出力 (拡張子はプロファイラで決まる)
+PROFILE_OUTPUT = 'run_profile'
+# 画像リポジトリの image_manifest.json (process_images.py が作成)。ImageFileID_small には
+# ここに記録されているサムネイルの名前だけを入れる (無ければ空のまま)。--image-manifest で上書き可能
+IMAGE_MANIFEST_FILE = 'image_manifest.json'
+# 入力が前回から変わっていなければマージ/出力を省略するためのフィンガープリント
+BUILD_FINGERPRINT_FILE = 'build_fingerprint.json'
+# 前回ビルドの所要時間 (省略したときの表示用)。実行ごとに変わるのでフィンガープリントとは分けてコミットしない
+BUILD_TIMINGS_FILE = '.build_timings.json'
+# フィンガープリントに含めるコード (出力内容に影響するもの)
+CODE_VERSION_FILES = ['main.py', 'card_export.py', 'card_db.py', 'search_index.py', 'image_derivatives.py', 'merge_store.py', 'card_binary.py',
+                      'furigana_text.py']
+# マージ済みテーブルの永続ストア。変更された CSV の行だけを入れ替える (--full-merge で毎回フルマージ)
+INCREMENTAL_MERGE = True
+MERGE_STORE_FILE = '.merge_store.sqlite'
 FURIGANA_DICT_FILE = 'furigana_dictionary.json'
 VERIFIED_FILE = 'verified_cards.json'       # 【完了】チェック済み
 UNVERIFIED_FILE = 'unverified_cards.json'   # 【未完】処理待ちキュー
+# 上の2ファイルの実体 (SQLite)。実行の最後に JSON へ書き出し、JSON が編集されていれば取り込み直す
+FURIGANA_QUEUE_FILE = '.furigana_queue.sqlite'
+# 取り出したカードのリース (秒)。途中で落ちた実行の分は期限切れ後に再び取り出される
+FURIGANA_LEASE_SECONDS = 3600
 ALWAYS_FETCH_CODES = ['550901', '550801'] 
+# シリーズ取得のチェックポイント (ページごとの進捗と完了マーカー)。完了マーカーの無いシリーズは次回続きから取得する
+FETCH_CHECKPOINT_FILE = '.fetch_checkpoints.sqlite'
+# これより古い途中の記録は捨てて1ページ目から取り直す
+FETCH_CHECKPOINT_MAX_AGE_HOURS = 72
+
+# 監視モード (--watch) の状態ファイル・確認間隔 (秒)・1ページ目を並列に確認する数
+WATCH_STATE_FILE = '.watch_state.json'
+WATCH_INTERVAL_SECONDS = 900
+WATCH_WORKERS = 4
+
+# ImageFileID の無いカードの uniqueId に付けるハッシュの長さ (16進の桁数)
+UNIQUE_ID_HASH_LENGTH = 12
+
+# シリーズ取得の並列数 (コマンドライン引数 --workers で上書き可能)
+MAX_WORKERS = 4
+# 同一ホストへのリクエスト上限 (件/秒)。固定の time.sleep の代わりにトークンバケットで制御
+REQUESTS_PER_SECOND = 1.0
+
+# HTTPレスポンスのディスクキャッシュ (条件付きGETで未変更ページの再取得・再解析を省く)
+HTTP_CACHE_DIR = '.http_cache'
+HTTP_CACHE_MAX_BYTES = 200 * 1024 * 1024
 
 # AI処理を実行するかどうかのデフォルトフラグ (True: 実行, False: スキップ)
 # ※ コマンドライン引数 --skip-ai を指定すると、ここがTrueでもスキップされます
@@ -30,6 +112,18 @@ ENABLE_AI_GENERATION = False
 # unverified_cards.json全体からこの件数分だけキューイングして処理されます
 MAX_VERIFY_PER_RUN = 50 
 
+# AI生成の同時リクエスト数と、開始時のリクエスト速度 (件/秒)。429 が返ると自動で速度を落とす
+FURIGANA_CONCURRENCY = 4
+FURIGANA_REQUESTS_PER_SECOND = 0.25
+# 1リクエストあたりのトークン予算 (入力+出力の見積もり)。バッチサイズはこの範囲で自動調整
+FURIGANA_TOKEN_BUDGET = 8000
+# generateContent 形式のエンドポイントを直接使う場合に指定 (ローカルのモックサーバー等)
+FURIGANA_LLM_URL = os.environ.get('FURIGANA_LLM_URL')
+# AIの応答キャッシュ ((モデル, プロンプトのハッシュ, カード名) ごと)。再実行時は API を呼ばずに再利用する
+LLM_CACHE_FILE = '.llm_cache.sqlite'
+LLM_CACHE_TTL_DAYS = 90
+LLM_CACHE_MAX_ENTRIES = 50000
+
 # 校正優先キーワード
 REFINE_KEYWORDS = [
     "ゴムゴム", "火拳", "神避", "芳香脚", "悪魔風脚", "大秘宝", "超新星", 
@@ -43,33 +137,6 @@ GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
 if GEMINI_API_KEY:
     genai.configure(api_key=GEMINI_API_KEY)
 
-# --- テキストクリーニング関数 ---
-def clean_text(text):
-    if text is None: return ""
-    if isinstance(text, float) and pd.isna(text): return ""
-    text = str(text)
-    if text.lower() == 'nan': return ""
-    text = re.sub(r'<[^>]+>', '', text)
-    text = re.sub(r'\s+', ' ', text).strip()
-    return text
-
-def get_text_with_alt(element):
-    if not element: return ""
-    elem_copy = copy.copy(element)
-    for img in elem_copy.find_all('img'):
-        alt_text = img.get('alt', '')
-        img.replace_with(alt_text)
-    for br in elem_copy.find_all('br'):
-        br.replace_with(' ')
-    return clean_text(elem_copy.get_text(strip=True))
-
-def extract_image_id(img_tag):
-    if not img_tag: return ""
-    src = img_tag.get('src', '')
-    if not src: return ""
-    filename = os.path.basename(src)
-    return filename
-
 # --- ヘルパー関数 ---
 def load_prompt_template(filename):
     path = os.path.join(PROMPT_DIR, filename)
@@ -93,12 +160,7 @@ def load_json_list(filename):
         except: return set() if "unverified" in filename else {}
     return set() if "unverified" in filename else {}
 
-def save_json_list(filename, data):
-    with open(filename, 'w', encoding='utf-8') as f:
-        if isinstance(data, set):
-            json.dump(list(data), f, ensure_ascii=False, indent=2)
-        else:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+# 【削除】save_json_list は FuriganaQueue.export_json に置き換えたため削除
 
 def load_furigana_dict():
     if os.path.exists(FURIGANA_DICT_FILE):
@@ -109,15 +171,47 @@ def load_furigana_dict():
     return {}
 
 def save_furigana_dict(data):
-    with open(FURIGANA_DICT_FILE, 'w', encoding='utf-8') as f:
+    with atomic_open(FURIGANA_DICT_FILE) as f:
         json.dump(data, f, ensure_ascii=False, indent=2)
 
+def save_csv_atomic(df, path):
+    # 同じディレクトリの一時ファイルに書き出してから置き換える (途中で落ちても壊れたCSVを残さない)
+    tmp_path = temp_path_for(path)
+    try:
+        df.to_csv(tmp_path, index=False, encoding='utf-8-sig')
+        os.replace(tmp_path, path)
+    except:
+        if os.path.exists(tmp_path): os.remove(tmp_path)
+        raise
+
+# --- HTTPクライアント (全スレッドで共有) ---
+_http_client = None
+
+def get_http_client():
+    global _http_client
+    if _http_client is None:
+        _http_client = HttpClient(max_workers=MAX_WORKERS, rate=REQUESTS_PER_SECOND)
+    return _http_client
+
+def http_get(url):
+    # リクエスト数・転送量 (304 は 0) と待ち時間を含めた所要時間を 'http' ステージに記録する
+    with metrics.stage('http'):
+        response = get_http_client().get(url)
+    metrics.add('http', requests=1, bytes=0 if response.status_code == 304 else len(response.content),
+                not_modified=int(response.status_code == 304))
+    return response
+
+def configure_http_client(max_workers, rate, cache_dir=HTTP_CACHE_DIR):
+    global _http_client
+    if _http_client is not None: _http_client.close()
+    cache = ResponseCache(cache_dir, max_bytes=HTTP_CACHE_MAX_BYTES) if cache_dir else None
+    _http_client = HttpClient(max_workers=max_workers, rate=rate, cache=cache)
+    return _http_client
+
 # --- スクレイピング関連 ---
 def get_all_series_list():
-    headers = {'User-Agent': 'Mozilla/5.0 (compatible; Bot/1.0)'}
     try:
-        response = requests.get(BASE_URL, headers=headers)
-        response.raise_for_status()
+        response = http_get(BASE_URL)
         soup = BeautifulSoup(response.text, 'html.parser')
         series_options = []
         select_tag = soup.find('select', {'name': 'series'})
@@ -133,89 +227,91 @@ def get_all_series_list():
         print(f"Error fetching series list: {e}")
         return []
 
-def fetch_cards_from_series(series_code):
-    all_cards = []
-    page = 1
+class SeriesFetchError(Exception):
+    """シリーズの途中のページで取得・解析に失敗した (途中までの行は返さない)"""
+
+def fetch_cards_from_series(series_code, skip_if_unchanged=False, engine=None, checkpoints=None):
+    """
+    シリーズの全ページを取得して DataFrame を返す。
+    skip_if_unchanged=True で全ページの本文が前回 CSV を保存したときと同じ (チェックポイントに残したハッシュと一致)
+    場合は解析せずに None を返す。比べるのはチェックポイントが完了状態から始まったときだけで、
+    checkpoints が無い場合や途中の記録がある場合は常に解析する。
+    engine は card_parser の解析エンジン名 (省略時は DEFAULT_PARSER_ENGINE)。
+    checkpoints (FetchCheckpoints) を渡すとページごとに記録し、前回途中で終わっていれば続きのページから取得する。
+    途中のページで失敗した場合は SeriesFetchError を送出する (途中までの行で CSV を上書きしないように)。
+    """
+    pages = []  # [(page, html, rows, unchanged)] rows が None のページは未解析 (再開分は html も None)
     has_next = True
-    headers = {'User-Agent': 'Mozilla/5.0 (compatible; Bot/1.0)'}
+    known_digests = {}
+    if checkpoints:
+        # 前回完了していたシリーズだけを比べる。途中の記録から再開する場合や、古い途中の記録を捨てて
+        # 1ページ目からやり直す場合は、全ページを解析し直す
+        if skip_if_unchanged and checkpoints.is_complete(series_code):
+            known_digests = checkpoints.completed_digests(series_code)
+        for page_no, rows, has_next, unchanged in checkpoints.begin(series_code, max_age=FETCH_CHECKPOINT_MAX_AGE_HOURS * 3600):
+            pages.append((page_no, None, rows, unchanged))
+        if pages: print(f"  [{series_code}] Resuming after page {pages[-1][0]} ({sum(len(r or []) for _, _, r, _ in pages)} rows checkpointed)")
+    page = pages[-1][0] + 1 if pages else 1
 
     while has_next:
         url = f"{BASE_URL}?series={series_code}&page={page}"
-        print(f"  Fetching Page {page}...")
+        print(f"  [{series_code}] Fetching Page {page}...")
         try:
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'html.parser')
-            card_modals = soup.find_all('dl', class_='modalCol')
-            if not card_modals: break
-
-            for modal in card_modals:
-                try:
-                    dt = modal.find('dt')
-                    info_col = dt.find('div', class_='infoCol')
-                    spans = info_col.find_all('span')
-                    
-                    card_id = clean_text(spans[0].get_text(strip=True)) if len(spans) > 0 else ""
-                    rarity = clean_text(spans[1].get_text(strip=True)) if len(spans) > 1 else ""
-                    card_type = clean_text(spans[2].get_text(strip=True)) if len(spans) > 2 else ""
-                    card_name_div = dt.find('div', class_='cardName')
-                    card_name = get_text_with_alt(card_name_div)
-                    img_tag = modal.find('img')
-                    image_file_id = extract_image_id(img_tag)
-                    dd = modal.find('dd')
-                    back_col = dd.find('div', class_='backCol')
-                    
-                    cost_life_div = back_col.find('div', class_='cost')
-                    cost_life_type = ""
-                    cost_life_value = ""
-                    if cost_life_div:
-                        cl_copy = copy.copy(cost_life_div)
-                        h3 = cl_copy.find('h3')
-                        if h3:
-                            cost_life_type = clean_text(h3.get_text(strip=True))
-                            h3.decompose()
-                        cost_life_value = get_text_with_alt(cl_copy)
-
-                    def get_val(cls, label):
-                        div = back_col.find('div', class_=cls)
-                        if not div: return ""
-                        d_copy = copy.copy(div)
-                        h3 = d_copy.find('h3')
-                        if h3: h3.decompose()
-                        return get_text_with_alt(d_copy).replace(label, '')
-
-                    attribute = get_val('attribute', '属性')
-                    power = get_val('power', 'パワー')
-                    counter = get_val('counter', 'カウンター')
-                    color = get_val('color', '色')
-                    feature = get_val('feature', '特徴')
-                    block = get_val('block', 'ブロックアイコン') 
-                    text = get_val('text', 'テキスト')
-                    trigger = get_val('trigger', 'トリガー')
-                    set_info = get_val('getInfo', '入手情報')
-
-                    row = {
-                        'CardID': card_id, 'Name': card_name, 'Rarity': rarity, 'Type': card_type,
-                        'Color': color, 'Cost_Life_Type': cost_life_type, 'Cost_Life_Value': cost_life_value,
-                        'Power': power, 'Counter': counter, 'Attribute': attribute, 'Feature': feature,
-                        'Block': block, 'Text': text, 'Trigger': trigger, 'SetInfo': set_info,
-                        'ImageFileID': image_file_id, 'ImageFileID_small': ''
-                    }
-                    all_cards.append(row)
-                except Exception as e:
-                    print(f"Skipping card parse error: {e}")
-                    continue
-            
-            pager = soup.find('div', class_='pager')
-            if pager and 'NEXT' in pager.get_text():
-                page += 1
-                time.sleep(1)
-            else: has_next = False
+            response = http_get(url)
+            html = response.text
+            digest = response.sha256
+            unchanged = bool(skip_if_unchanged and known_digests.get(page) == digest)
+            with metrics.stage('parse'):
+                if unchanged:
+                    rows = None
+                    has_next = scan_card_page(html, engine)
+                else:
+                    rows, has_next = parse_card_page(html, engine)
         except Exception as e:
-            print(f"Error fetching page {page}: {e}")
-            has_next = False
+            print(f"Error fetching page {page} of {series_code}: {e}")
+            metrics.add('fetch_series', errors=1)
+            raise SeriesFetchError(f"page {page} of {series_code} failed: {e}") from e
+        pages.append((page, html, rows, unchanged))
+        if checkpoints: checkpoints.save_page(series_code, page, rows, has_next, unchanged, digest)
+        if has_next: page += 1
+
+    if known_digests and pages and all(unchanged for _, _, _, unchanged in pages):
+        return None
+
+    all_cards = []
+    for page_no, html, rows, _ in pages:
+        if rows is None:
+            # 未解析のページ。再開分は本文が無いので取り直す (HTTPキャッシュがあれば 304 で済む)
+            try:
+                if html is None: html = http_get(f"{BASE_URL}?series={series_code}&page={page_no}").text
+                with metrics.stage('parse'):
+                    rows, _ = parse_card_page(html, engine)
+            except Exception as e:
+                metrics.add('fetch_series', errors=1)
+                raise SeriesFetchError(f"page {page_no} of {series_code} failed: {e}") from e
+        all_cards.extend(rows)
+    metrics.add('parse', items=len(all_cards), pages=len(pages))
     return pd.DataFrame(all_cards)
 
+# --- 処理キュー ---
+def get_furigana_priority(name, current_dict):
+    # キューに入れる時点で計算して保存する (大きいほど先に処理)
+    score = 0
+    current_reading = current_dict.get(name, "")
+    if name not in current_dict: score += 20
+    elif re.search(r'[一-龥]', current_reading): score += 10
+    if any(k in name for k in REFINE_KEYWORDS): score += 5
+    return score
+
+def open_furigana_queue(f_dict):
+    queue = FuriganaQueue(FURIGANA_QUEUE_FILE)
+    if not queue.is_in_sync(UNVERIFIED_FILE, VERIFIED_FILE):
+        # 初回 (キャッシュ無し) や JSON が手で編集された場合は JSON の内容を取り込む
+        n_queue, n_verified = queue.import_json(UNVERIFIED_FILE, VERIFIED_FILE,
+                                                lambda n: get_furigana_priority(n, f_dict), readings=f_dict)
+        print(f"Imported queue from JSON: {n_queue} unverified, {n_verified} verified.")
+    return queue
+
 # --- 未チェックリストの同期 ---
 # 【修正】: verified_cards.json ではなく、f_dict に存在しないもののみを unverified_cards.json に追加するように変更
 def sync_unverified_list(all_card_names, f_dict):
@@ -223,73 +319,60 @@ def sync_unverified_list(all_card_names, f_dict):
     全カードの中でフリガナ辞書(f_dict)に含まれていないものを
     すべて「未処理(Unverified)」キューに追加する
     """
-    unverified_set = load_json_list(UNVERIFIED_FILE) # set型で返る
-    
-    dict_keys = set(f_dict.keys())
+    queue = open_furigana_queue(f_dict)
+    try:
+        queued = queue.names()
+        dict_keys = set(f_dict.keys())
 
-    new_cards = []
-    for name in all_card_names:
-        # 名前があり、かつフリガナ辞書にない、かつまだキューにもない場合
-        if name and name not in dict_keys and name not in unverified_set:
-            new_cards.append(name)
-            
-    if new_cards:
-        unverified_set.update(new_cards)
-        save_json_list(UNVERIFIED_FILE, unverified_set)
-        print(f"Synced queue: Added {len(new_cards)} new cards to unverified list.")
-    else:
-        # 【追記】未処理キューから、辞書に載っているカードを削除し、キューをクリーンアップ
-        keys_to_remove = unverified_set.intersection(dict_keys)
-        if keys_to_remove:
-            unverified_set -= keys_to_remove
-            save_json_list(UNVERIFIED_FILE, unverified_set)
-            print(f"Synced queue: Removed {len(keys_to_remove)} verified cards from unverified list.")
-        
-        print("Queue sync: No new cards found (or all remaining are verified).")
-
-# --- フリガナのクリーニング関数 ---
-def normalize_furigana(reading):
-    if not reading: return ""
-    # 制御文字や空白を削除
-    cleaned = re.sub(r'[\s\u3000]', '', reading)
-    # 特定の記号を削除
-    cleaned = re.sub(r'[!！?？"”#＃$＄%％&＆\'’(（)）*＊+＋,，-－.．/／:：;；<＜=＝>＞@＠[［\\￥\]］^＾_＿`｀{｛|｜}｝~～]', '', cleaned)
-    return cleaned
-
-# --- フリガナのチェック関数 ---
-def is_valid_furigana(reading):
-    if not reading: return False
-    # カタカナ(30A0-30FF) と 中黒(30FB) と 長音(30FC)
-    is_katakana = re.fullmatch(r'[\u30A1-\u30F6\u30FB\u30FC]+', reading)
-    if is_katakana: return True
-    # 平仮名(3040-309F) と 中黒(30FB) と 長音(30FC)
-    is_hiragana = re.fullmatch(r'[\u3041-\u3096\u30FB\u30FC]+', reading)
-    if is_hiragana: return True
-    return False
+        new_cards = []
+        for name in all_card_names:
+            # 名前があり、かつフリガナ辞書にない、かつまだキューにもない場合
+            if name and name not in dict_keys and name not in queued:
+                new_cards.append(name)
+
+        if new_cards:
+            queue.enqueue({n: get_furigana_priority(n, f_dict) for n in new_cards})
+            print(f"Synced queue: Added {len(new_cards)} new cards to unverified list.")
+        else:
+            # 【追記】未処理キューから、辞書に載っているカードを削除し、キューをクリーンアップ
+            keys_to_remove = queued.intersection(dict_keys)
+            if keys_to_remove:
+                queue.remove(keys_to_remove)
+                print(f"Synced queue: Removed {len(keys_to_remove)} verified cards from unverified list.")
+
+            print("Queue sync: No new cards found (or all remaining are verified).")
+        queue.export_json(UNVERIFIED_FILE, VERIFIED_FILE)
+    finally:
+        queue.close()
+
+# --- フリガナのクリーニング・チェック関数 ---
+# 【移動】normalize_furigana / is_valid_furigana は furigana_text.py へ移動 (translate テーブル + メモ化)
 
 # --- Proモデルによるフリガナ生成関数 ---
 def generate_furigana_with_pro(current_dict):
     """
-    未処理リスト(UNVERIFIED_FILE)から少しずつカードを取り出し、
+    未処理キューから少しずつカードを取り出し、
     Proモデルでフリガナを生成して辞書に登録する。
     """
-    # 1. 未処理リストの読み込み
-    unverified_set = load_json_list(UNVERIFIED_FILE)
-    verified_data = load_json_list(VERIFIED_FILE) # 辞書として読み込む (フリガナ辞書のバックアップと履歴として機能)
-    
-    if isinstance(verified_data, list) or isinstance(verified_data, set):
-        verified_data = {k: current_dict.get(k, "") for k in verified_data if k in current_dict}
+    # 1. 未処理キューを開く (最後に JSON へ書き出す)
+    queue = open_furigana_queue(current_dict)
+    try:
+        return _generate_furigana_from_queue(queue, current_dict)
+    finally:
+        queue.export_json(UNVERIFIED_FILE, VERIFIED_FILE)
+        queue.close()
 
-    if not unverified_set:
+def _generate_furigana_from_queue(queue, current_dict):
+    if not len(queue):
         print("Unverified queue is empty. All cards are up to date!")
         return current_dict
 
     # 2. 事前チェック (形式が正しいものを先に移動)
-    # ここでのチェックは、unverified_cards.jsonに含まれているが、f_dictに情報があり、それが正しい形式の場合、
-    # AI処理をスキップし verified_cards.json に移動させるための処理です。
+    # ここでのチェックは、キューに含まれているが、f_dictに情報があり、それが正しい形式の場合、
+    # AI処理をスキップし verified に移動させるための処理です。
     to_verify_now = {} 
     
-    for name in list(unverified_set):
+    for name in queue.ordered_names():
         reading = current_dict.get(name, "")
         
         # Case A: 辞書にフリガナがある
@@ -311,23 +394,18 @@ def generate_furigana_with_pro(current_dict):
     # チェック済みを一括移動 (AI実行前に保存)
     if to_verify_now:
         print(f"Skipping AI for {len(to_verify_now)} valid cards. Moving to verified list...")
-        verified_data.update(to_verify_now)
-        save_json_list(VERIFIED_FILE, verified_data)
-        
-        unverified_set = unverified_set - set(to_verify_now.keys())
-        save_json_list(UNVERIFIED_FILE, unverified_set)
+        queue.ack(to_verify_now)
     
-    unverified_list = list(unverified_set)
-    if not unverified_list:
+    if not len(queue):
         print("All cards in queue were valid. No AI processing needed.")
         return current_dict
 
     # --- AI処理 ---
-    if not GEMINI_API_KEY: 
-        print("Warning: GEMINI_API_KEY not set. Skipping AI generation.")
-        return current_dict
-
-    genai.configure(api_key=GEMINI_API_KEY)
+    # APIキーが無くても、キャッシュ済みの応答は使う
+    backend = None
+    if FURIGANA_LLM_URL: backend = RestBackend(FURIGANA_LLM_URL, api_key=GEMINI_API_KEY)
+    elif GEMINI_API_KEY: backend = GeminiBackend(GEMINI_API_KEY)
+    else: print("Warning: GEMINI_API_KEY not set. Using cached AI responses only.")
     # 利用可能なモデルリスト（新しいモデルを優先）
     pro_models = ['gemini-2.0-flash-exp', 'gemini-1.5-pro']
     prompt_template = load_prompt_template('generation_prompt.txt')
@@ -335,167 +413,347 @@ def generate_furigana_with_pro(current_dict):
         print("Error: generation_prompt.txt missing. Cannot run AI generation.")
         return current_dict
 
-    # 3. 優先度付け
-    def get_priority(name):
-        score = 0
-        current_reading = current_dict.get(name, "")
-        if name not in current_dict: score += 20
-        elif re.search(r'[一-龥]', current_reading): score += 10
-        if any(k in name for k in REFINE_KEYWORDS): score += 5
-        return -score
-
-    unverified_list.sort(key=get_priority)
-
-    # 4. 今回処理分 (MAX_VERIFY_PER_RUN件数分だけ処理する)
-    targets_list = unverified_list[:MAX_VERIFY_PER_RUN]
-    print(f"Processing {len(targets_list)} cards with Pro model (Remaining: {len(unverified_list) - len(targets_list)})...")
+    # 3-4. 優先度 (キュー登録時に保存済み) の高い順に MAX_VERIFY_PER_RUN 件を取り出す
+    targets_list = queue.dequeue(MAX_VERIFY_PER_RUN, lease_seconds=FURIGANA_LEASE_SECONDS)
+    print(f"Processing {len(targets_list)} cards with Pro model (Remaining: {len(queue) - len(targets_list)})...")
     
-    # 5. バッチ処理
-    batch_size = 10 
+    # 5. バッチ処理 (複数バッチを並行して投げ、終わったバッチから保存する)
     processed_keys = [] 
     generated_updates = {}
 
-    for i in range(0, len(targets_list), batch_size):
-        batch_keys = targets_list[i:i+batch_size]
-        print(f"  AI Generation batch {i+1}/{len(targets_list)}...")
+    def on_batch_done(batch_keys, updates):
+        cleaned_updates = {k: normalize_furigana(v) for k, v in updates.items()}
+        generated_updates.update(cleaned_updates)
+        current_dict.update(cleaned_updates)
+        processed_keys.extend(batch_keys)
 
-        prompt = prompt_template.replace("{{JSON_DATA}}", json.dumps(batch_keys, ensure_ascii=False))
-        
-        batch_success = False
-        for model_name in pro_models:
-            try:
-                model = genai.GenerativeModel(model_name)
-                response = model.generate_content(prompt, generation_config={"temperature": 0.1})
-                match = re.search(r'\{.*\}', response.text, re.DOTALL)
-                if match:
-                    updates = json.loads(match.group(0))
-                    if updates:
-                        cleaned_updates = {k: normalize_furigana(v) for k, v in updates.items()}
-                        generated_updates.update(cleaned_updates)
-                    batch_success = True
-                    break
-            except Exception as e:
-                err_msg = str(e)
-                if "429" in err_msg or "quota" in err_msg.lower():
-                    print(f"    Rate limit on {model_name}. Waiting 20s...")
-                    time.sleep(20) 
-                elif "404" in err_msg: continue
-                else: print(f"    Error with {model_name}: {err_msg.splitlines()[0]}")
-        
-        if batch_success:
-            processed_keys.extend(batch_keys)
-        else:
-            print(f"    Batch failed. Skipping these cards for now.")
-        
-        time.sleep(10)
+        # 6. 結果の保存 (途中で落ちても完了したバッチは失われない)
+        save_furigana_dict(current_dict)
+        queue.ack({k: current_dict.get(k, "") for k in batch_keys})
 
-    # 6. 結果の保存
+    cache = ReadingCache(LLM_CACHE_FILE, ttl=LLM_CACHE_TTL_DAYS * 24 * 3600, max_entries=LLM_CACHE_MAX_ENTRIES)
+    try:
+        stats = asyncio.run(generate_readings(
+            targets_list, prompt_template, backend, pro_models, on_batch_done=on_batch_done,
+            concurrency=FURIGANA_CONCURRENCY, rate=FURIGANA_REQUESTS_PER_SECOND, token_budget=FURIGANA_TOKEN_BUDGET,
+            cache=cache))
+    finally:
+        cache.close()
+    print(cache.report())
+    metrics.add('furigana_ai', items=stats['succeeded'], requests=stats['requests'], cached=stats['cached'],
+                retries=stats['quota_errors'] + stats['errors'], errors=len(stats['failed']))
+
+    skipped = stats['failed'] + stats['remaining']
+    if skipped:
+        queue.release(skipped)
+        print(f"    {len(skipped)} cards could not be processed. They stay in the unverified list.")
+    print(f"AI generation: {stats['cached']} cached, {stats['requests']} requests, {stats['batches']} batches, "
+          f"{stats['quota_errors']} rate limits, {stats['errors']} errors in {stats['elapsed']:.1f}s")
     if generated_updates:
-        current_dict.update(generated_updates)
         print(f"Successfully generated/updated {len(generated_updates)} readings.")
-    
     if processed_keys:
-        verified_updates = {k: current_dict.get(k, "") for k in processed_keys}
-        verified_data.update(verified_updates)
-        save_json_list(VERIFIED_FILE, verified_data)
-        
-        current_unverified = load_json_list(UNVERIFIED_FILE)
-        new_unverified = current_unverified - set(processed_keys)
-        save_json_list(UNVERIFIED_FILE, new_unverified)
         print(f"Verification progress: {len(processed_keys)} cards moved to verified list.")
     
     return current_dict
 
 # --- JSON生成 ---
+def to_int(v):
+    try: return None if not v or str(v).lower() == 'nan' else int(float(v))
+    except: return str(v)
+
+def map_unique(series, func):
+    # 値の種類が少ない列は、ユニーク値ごとに1回だけ func を評価して全行に配る
+    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+    mapped = np.empty(len(uniques), dtype=object)
+    mapped[:] = [func(u) for u in uniques]
+    return mapped[codes].tolist()
+
+def split_slash_list(series):
+    # "赤/緑" -> ["赤", "緑"] (空要素は除く)。行ごとに別のリストを返す
+    return [[x.strip() for x in parts if x.strip()] for parts in series.str.split('/')]
+
+def normalize_identity_text(text):
+    # 全角/半角・空白の揺れで ID が変わらないようにする
+    return re.sub(r'\s+', ' ', unicodedata.normalize('NFKC', text)).strip()
+
+def stable_card_ids(c_num, info, rarity):
+    """
+    ImageFileID の無いカードの uniqueId サフィックス。
+    カード番号・入手情報・レアリティ (正規化したもの) と、同じ組み合わせの中での出現順 (刷りの順番) の
+    ハッシュなので、入力が同じなら何度ビルドしても同じ ID になる。
+    """
+    keys = pd.DataFrame({'num': c_num.to_numpy(), 'info': map_unique(info, normalize_identity_text),
+                         'rarity': map_unique(rarity, normalize_identity_text)})
+    ordinal = keys.groupby(['num', 'info', 'rarity'], sort=False).cumcount()
+    return [hashlib.sha256('\x1f'.join((n, i, r, str(o))).encode('utf-8')).hexdigest()[:UNIQUE_ID_HASH_LENGTH]
+            for n, i, r, o in zip(keys['num'], keys['info'], keys['rarity'], ordinal)]
+
+def iter_card_records(df):
+    """
+    df_final (日本語列名) から cards.json 用のレコードを1件ずつ返す。
+    行ごとの iterrows ではなく列単位で処理し、最後に行へ組み立てる。
+    """
+    def col(name):
+        if name in df.columns: return df[name].astype(str).str.strip()
+        return pd.Series('', index=df.index, dtype=object)
+
+    if '重複フラグ' in df.columns:
+        df = df[(df['重複フラグ'] != '重複').to_numpy()]
+    c_num = col('カード番号')
+    has_num = (c_num != '').to_numpy()
+    df = df[has_num]; c_num = c_num[has_num]
+    if df.empty: return
+
+    # ImageFileID が空のカードは内容から決まるハッシュで区別する (毎回同じ ID になる)
+    # プレースホルダー ('dummy.gif') はそのまま ID に使う (今の uniqueId とカードの集合を変えないため)
+    img_id = col('ImageFileID') if 'ImageFileID' in df.columns else pd.Series('', index=df.index, dtype=object)
+    no_img = img_id == ''
+    suffix = img_id.astype(object)
+    if no_img.any():
+        suffix[no_img] = stable_card_ids(c_num[no_img], col('入手情報')[no_img], col('レアリティ')[no_img])
+    unique_id = c_num + '_' + suffix
+    keep = (~unique_id.duplicated(keep='first')).to_numpy()
+    df = df[keep]; unique_id = unique_id[keep]; c_num = c_num[keep]
+
+    info = col('入手情報')
+    series_match = info.str.extract(r'(.*)【(.*)】')
+    s_title = series_match[0].str.strip().where(series_match[0].notna(), info)
+    s_code = series_match[1].str.strip().fillna('')
+
+    columns = {
+        "uniqueId": unique_id.tolist(), "cardNumber": c_num.tolist(), "cardName": col('カード名').tolist(),
+        "furigana": col('フリガナ').tolist(), "rarity": col('レアリティ').tolist(),
+        "cardType": col('種類').tolist(), "color": split_slash_list(df['色'].astype(str)),
+        "costLifeType": col('コスト/ライフ種別').tolist(), "costLifeValue": map_unique(df['コスト/ライフ値'], to_int),
+        "power": map_unique(df['パワー'], to_int), "counter": map_unique(df['カウンター'], to_int),
+        "attribute": col('属性').tolist(), "features": split_slash_list(df['特徴'].astype(str)),
+        "block": map_unique(df['ブロック'], to_int), "effectText": col('効果テキスト').tolist(),
+        "trigger": col('トリガー').tolist(), "getInfo": info.tolist(), "seriesTitle": s_title.tolist(),
+        "seriesCode": s_code.tolist()
+    }
+    # サムネイルが1枚も無いうちは imageFileIdSmall を出さない (従来のレコードと同じ形のまま)。
+    # 1枚でもあれば全レコードに付け、サムネイルの無いカードは ''
+    small = col('ImageFileID_small')
+    if (small != '').any(): columns["imageFileIdSmall"] = small.tolist()
+    keys = list(columns)
+    for values in zip(*columns.values()):
+        yield dict(zip(keys, values))
+
 def generate_card_json_from_df(df):
-    cards_list = []
-    seen_ids = set()
-    for _, row in df.iterrows():
-        if row.get('重複フラグ') == '重複': continue
-        c_num = str(row['カード番号']).strip()
-        if not c_num: continue
-        
-        img_id = str(row.get('ImageFileID', '')).strip()
-        unique_suffix = img_id if img_id else str(uuid.uuid4())
-        unique_id = f"{c_num}_{unique_suffix}"
-        if unique_id in seen_ids: continue
-        seen_ids.add(unique_id)
-
-        info = str(row['入手情報']).strip()
-        s_title = info; s_code = ''
-        m = re.search(r'(.*)【(.*)】', info)
-        if m: s_title = m.group(1).strip(); s_code = m.group(2).strip()
-
-        def to_int(v):
-            try: return None if not v or str(v).lower() == 'nan' else int(float(v))
-            except: return str(v)
-
-        card_obj = {
-            "uniqueId": unique_id, "cardNumber": c_num, "cardName": str(row['カード名']).strip(),
-            "furigana": str(row.get('フリガナ', '')).strip(), "rarity": str(row['レアリティ']).strip(),
-            "cardType": str(row['種類']).strip(), "color": [c.strip() for c in str(row['色']).split('/') if c.strip()],
-            "costLifeType": str(row['コスト/ライフ種別']).strip(), "costLifeValue": to_int(row['コスト/ライフ値']),
-            "power": to_int(row['パワー']), "counter": to_int(row['カウンター']),
-            "attribute": str(row['属性']).strip(), "features": [f.strip() for f in str(row['特徴']).split('/') if f.strip()],
-            "block": to_int(row['ブロック']), "effectText": str(row['効果テキスト']).strip(),
-            "trigger": str(row['トリガー']).strip(), "getInfo": info, "seriesTitle": s_title, "seriesCode": s_code
-        }
-        cards_list.append(card_obj)
-    return cards_list
+    return list(iter_card_records(df))
 
 # --- main処理内の新しいヘルパー関数 ---
 # 【削除】この関数は、sync_unverified_listの修正により不要になったため削除
 
-# --- メイン処理 ---
-def main():
-    # --- 引数処理の追加 ---
-    parser = argparse.ArgumentParser(description='One Piece Card List Generator')
-    parser.add_argument('--skip-ai', action='store_true', help='Skip AI Furigana generation')
-    args = parser.parse_args()
+# --- ビルドのフィンガープリント ---
+# data/*.csv・フリガナ辞書・コード・出力オプションのハッシュを出力と一緒に保存し、
+# 何も変わっていなければマージ/出力ステージを丸ごと省略する。
+def file_sha256(path):
+    if not os.path.exists(path): return ''
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()
 
-    # 設定値と引数の両方を考慮して実行フラグを決定
-    should_run_ai = ENABLE_AI_GENERATION and not args.skip_ai
+def compute_build_fingerprint(data_files, options, image_manifest=IMAGE_MANIFEST_FILE):
+    code_dir = os.path.dirname(os.path.abspath(__file__))
+    inputs = {
+        'data': {os.path.basename(f): file_sha256(f) for f in sorted(data_files)},
+        'furigana_dictionary': file_sha256(FURIGANA_DICT_FILE),
+        'image_manifest': file_sha256(image_manifest) if image_manifest else '',
+        'code': {name: file_sha256(os.path.join(code_dir, name)) for name in CODE_VERSION_FILES},
+        'options': options,
+    }
+    digest = hashlib.sha256(json.dumps(inputs, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+    return {'hash': digest, 'inputs': inputs}
 
-    if not os.path.exists(DATA_DIR): os.makedirs(DATA_DIR)
-    if not os.path.exists(PROMPT_DIR): 
-        print(f"Warning: '{PROMPT_DIR}' directory missing. AI features may fail.")
+def load_build_fingerprint():
+    if not os.path.exists(BUILD_FINGERPRINT_FILE): return None
+    try:
+        with open(BUILD_FINGERPRINT_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Warning: Could not read {BUILD_FINGERPRINT_FILE} ({e}). Rebuilding.")
+        return None
 
-    series_list = get_all_series_list()
-    print(f"Found {len(series_list)} series.")
+def save_build_fingerprint(fingerprint, timings):
+    # フィンガープリントは入力が同じなら同じ内容になるようにし (毎回コミットされないように)、所要時間は別に保存する
+    with atomic_open(BUILD_FINGERPRINT_FILE) as f:
+        json.dump(fingerprint, f, ensure_ascii=False, indent=2)
+    with atomic_open(BUILD_TIMINGS_FILE) as f:
+        json.dump({k: round(v, 3) for k, v in timings.items()}, f, indent=2)
+
+def load_build_timings():
+    try:
+        with open(BUILD_TIMINGS_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def build_outputs(options):
+    """options のビルドが書き出すファイル (シャード本体は shard_files_exist で確認する)"""
+    outputs = [OUTPUT_CSV, OUTPUT_JSON]
+    if options.get('ndjson'): outputs.append(OUTPUT_NDJSON)
+    if options.get('shards'): outputs += [OUTPUT_MANIFEST, OUTPUT_DELTA]
+    if options.get('sqlite'): outputs.append(OUTPUT_SQLITE)
+    if options.get('search_index'): outputs.append(OUTPUT_SEARCH_INDEX)
+    if options.get('parquet'): outputs.append(OUTPUT_PARQUET)
+    if options.get('msgpack'): outputs.append(OUTPUT_MSGPACK)
+    if options.get('precompress'):
+        for target in [OUTPUT_JSON] + ([OUTPUT_SEARCH_INDEX] if options.get('search_index') else []):
+            outputs += precompressed_paths(target)
+    return outputs
 
-    for s in series_list:
+def shard_files_exist():
+    """マニフェストに載っているシャードがすべて SHARD_DIR にあるか"""
+    try:
+        with open(OUTPUT_MANIFEST, 'r', encoding='utf-8') as f:
+            shards = json.load(f).get('shards', [])
+    except (OSError, ValueError):
+        return False
+    return all(os.path.exists(os.path.join(SHARD_DIR, s['file'])) for s in shards)
+
+def is_build_up_to_date(previous, fingerprint, should_run_ai):
+    if not previous or previous.get('hash') != fingerprint['hash']: return False
+    # 出力が1つでも欠けていれば (シャードのディレクトリを消した場合なども) 作り直す
+    options = fingerprint['inputs']['options']
+    if not all(os.path.exists(p) for p in build_outputs(options)): return False
+    if options.get('shards') and not shard_files_exist(): return False
+    # AI処理が有効で未処理キューが残っている場合は辞書が更新されうるので省略しない
+    if should_run_ai and load_json_list(UNVERIFIED_FILE): return False
+    return True
+
+# --- 各ステージ ---
+def fetch_series(targets, args, checkpoints, force=False):
+    """
+    targets のシリーズを並列に取得して CSV を保存し、CSV を保存 (または維持) できたシリーズコードの集合を返す。
+    force=True なら前回と同じページでも解析して保存し直す (監視モードで変更を検知したシリーズ用)。
+    """
+    done = set()
+
+    def fetch_and_save(s):
         code = s['code']; name = s['name']
         fpath = os.path.join(DATA_DIR, f"{code}.csv")
-        if code not in ALWAYS_FETCH_CODES and os.path.exists(fpath):
-            print(f"[Skip] {name}"); continue
         print(f"[Fetch] {name} ({code})...")
-        df = fetch_cards_from_series(code)
-        if not df.empty:
-            df.to_csv(fpath, index=False, encoding='utf-8-sig')
-            print(f"  Saved {len(df)} cards.")
-        time.sleep(1)
+        try:
+            with metrics.stage('fetch_series'):
+                df = fetch_cards_from_series(code, skip_if_unchanged=not force and os.path.exists(fpath),
+                                             engine=args.parser, checkpoints=checkpoints)
+        except SeriesFetchError as e:
+            # 取得済みのページはチェックポイントに残っているので、次回はその続きから取得する
+            metrics.add('fetch_series', incomplete=1)
+            print(f"  [{code}] Incomplete ({e}). Keeping existing CSV; will resume next run.")
+            return
+        metrics.add('fetch_series', items=0 if df is None else len(df), unchanged=int(df is None))
+        if df is None:
+            print(f"  [{code}] Unchanged since last fetch. Keeping existing CSV.")
+            checkpoints.complete(code)
+        elif not df.empty:
+            save_csv_atomic(df, fpath)
+            checkpoints.complete(code, len(df))
+            print(f"  [{code}] Saved {len(df)} cards.")
+        else:
+            checkpoints.complete(code, 0)
+        done.add(code)
 
-    print("Merging data...")
-    files = [os.path.join(DATA_DIR, f) for f in os.listdir(DATA_DIR) if f.endswith('.csv')]
-    if not files: return
-    df_list = [pd.read_csv(f, dtype=str) for f in files]
-    df_all = pd.concat(df_list, ignore_index=True).fillna('')
+    # シリーズ単位で並列取得 (リクエスト間隔は HttpClient のレート制限で制御)
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        futures = [executor.submit(fetch_and_save, s) for s in targets]
+        for future in as_completed(futures):
+            future.result()
+    if targets: print(checkpoints.report())
+    return done
+
+def fetch_stage(args):
+    client = configure_http_client(max(1, args.workers), args.rate,
+                                   cache_dir=None if args.no_http_cache else HTTP_CACHE_DIR)
+
+    with metrics.stage('series_list'):
+        series_list = get_all_series_list()
+    metrics.add('series_list', items=len(series_list))
+    print(f"Found {len(series_list)} series.")
+
+    # CSV があっても完了マーカーが無いシリーズ (途中で失敗・中断したもの) は取得し直す
+    checkpoints = FetchCheckpoints(FETCH_CHECKPOINT_FILE)
+    try:
+        fetch_targets = []
+        for s in series_list:
+            code = s['code']; name = s['name']
+            fpath = os.path.join(DATA_DIR, f"{code}.csv")
+            if code not in ALWAYS_FETCH_CODES and os.path.exists(fpath) and checkpoints.is_complete(code):
+                print(f"[Skip] {name}"); continue
+            fetch_targets.append(s)
+        fetch_series(fetch_targets, args, checkpoints)
+    finally:
+        checkpoints.close()
+
+    if client.cache:
+        client.cache.save()
+        print(client.cache.report())
+
+def list_data_files():
+    # 同じ CardID・優先度の行の順序がファイル名順で決まるよう、並びを固定する
+    return sorted(os.path.join(DATA_DIR, f) for f in os.listdir(DATA_DIR) if f.endswith('.csv'))
+
+COLUMN_MAP = {
+    'CardID': 'カード番号', 'Name': 'カード名', 'Rarity': 'レアリティ', 'Type': '種類', 'Color': '色',
+    'Cost_Life_Type': 'コスト/ライフ種別', 'Cost_Life_Value': 'コスト/ライフ値', 'Power': 'パワー',
+    'Counter': 'カウンター', 'Attribute': '属性', 'Feature': '特徴', 'Block': 'ブロック',
+    'Text': '効果テキスト', 'Trigger': 'トリガー', 'SetInfo': '入手情報',
+    'ImageFileID': 'ImageFileID', 'ImageFileID_small': 'ImageFileID_small'
+}
+
+OUTPUT_COLUMNS = [
+    'カード番号', 'カード名', 'フリガナ', 'レアリティ', '種類', '色', 
+    'コスト/ライフ種別', 'コスト/ライフ値', 'パワー', 'カウンター', '属性', 
+    '特徴', 'ブロック', '効果テキスト', 'トリガー', '入手情報', 
+    '重複フラグ', 'ImageFileID', 'ImageFileID_small'
+]
+
+def merge_data_files(files):
+    # CSV は並列に読み、値の種類が少ない列はカテゴリ型にする (merge_store.read_data_files / categorize)
+    df_all = categorize(read_data_files(files))
     
-    df_all['SortPriority'] = df_all['Rarity'].apply(lambda x: 1 if 'SP' in str(x) else 0)
+    df_all['SortPriority'] = sort_priority(df_all['Rarity'])
     df_all = df_all.sort_values(by=['CardID', 'SortPriority']).reset_index(drop=True)
-    df_all['IsDuplicate'] = df_all.duplicated(subset=['CardID'], keep='first')
-    df_all['IsDuplicate'] = df_all['IsDuplicate'].apply(lambda x: '重複' if x else '')
+    df_all['IsDuplicate'] = np.where(df_all.duplicated(subset=['CardID'], keep='first').to_numpy(), '重複', '')
     df_all = df_all.drop(columns=['SortPriority'])
 
-    col_map = {
-        'CardID': 'カード番号', 'Name': 'カード名', 'Rarity': 'レアリティ', 'Type': '種類', 'Color': '色',
-        'Cost_Life_Type': 'コスト/ライフ種別', 'Cost_Life_Value': 'コスト/ライフ値', 'Power': 'パワー',
-        'Counter': 'カウンター', 'Attribute': '属性', 'Feature': '特徴', 'Block': 'ブロック',
-        'Text': '効果テキスト', 'Trigger': 'トリガー', 'SetInfo': '入手情報',
-        'ImageFileID': 'ImageFileID', 'ImageFileID_small': 'ImageFileID_small'
-    }
-    df_all.rename(columns=col_map, inplace=True)
+    df_all.rename(columns=COLUMN_MAP, inplace=True)
+    return df_all
+
+def merge_data_files_incremental(files, store_path=MERGE_STORE_FILE):
+    """merge_data_files と同じ結果を、変更のあった CSV だけを読み直して作る"""
+    store = MergeStore(store_path)
+    try:
+        stats = store.sync(files)
+        df_all = store.to_dataframe()
+    finally:
+        store.close()
+    print(f"Incremental merge: {len(stats['changed'])} changed, {len(stats['removed'])} removed, "
+          f"{stats['unchanged']} unchanged files ({stats['affected_ids']} CardIDs re-resolved)")
+    df_all.rename(columns=COLUMN_MAP, inplace=True)
+    return df_all
+
+def load_rendered_images(path):
+    """画像マニフェストに記録されている出力ファイル名の集合 (マニフェストが無ければ空)"""
+    if not path or not os.path.exists(path): return set()
+    return ImageManifest.load(path).output_names()
 
+def fill_small_image_ids(df_all, rendered=frozenset()):
+    # ImageFileID_small が空の行に、process_images.py が作ったサムネイルのファイル名を入れる
+    # (命名規則は image_derivatives.small_image_id)。実際の ImageFileID (プレースホルダー以外) があり、
+    # そのサムネイルが rendered (画像マニフェストの出力) にある行だけ。カード番号から名前を作ると
+    # 別イラストの刷りが同じサムネイルを指してしまうので、それ以外は空のままにする
+    if 'ImageFileID_small' not in df_all.columns: df_all['ImageFileID_small'] = ''
+    image_ids = df_all['ImageFileID'] if 'ImageFileID' in df_all.columns else pd.Series('', index=df_all.index)
+    empty = (df_all['ImageFileID_small'].astype(str) == '').to_numpy()
+    names = map_unique(image_ids[empty].astype(str), small_image_id)
+    df_all.loc[empty, 'ImageFileID_small'] = [n if n in rendered else '' for n in names]
+    return df_all
+
+def apply_furigana(df_all, should_run_ai):
     # --- フリガナ生成の分岐処理 ---
     # 【修正】: フリガナ辞書をここで読み込み、その情報を元にunverified_cards.jsonを更新する
     f_dict = load_furigana_dict()
@@ -507,33 +765,298 @@ def main():
     if should_run_ai:
         # Step 2 (AI): 未処理キューに残ったカードに対してAI処理を実行
         print(">> [AI Status] Enabled. Generating Furigana with Pro Model...")
-        f_dict = generate_furigana_with_pro(f_dict)
+        with metrics.stage('furigana_ai'):
+            f_dict = generate_furigana_with_pro(f_dict)
         save_furigana_dict(f_dict)
     else:
         # Step 2 (Skip): AI処理をスキップ
         print(">> [AI Status] Skipped. Using existing dictionary only.")
 
     # Step 3: 最新の辞書を使ってDataFrameにフリガナをマッピング
-    df_all['フリガナ'] = df_all['カード名'].map(f_dict).fillna('')
-    df_all['フリガナ'] = df_all['フリガナ'].apply(normalize_furigana)
-    
-    cols = [
-        'カード番号', 'カード名', 'フリガナ', 'レアリティ', '種類', '色', 
-        'コスト/ライフ種別', 'コスト/ライフ値', 'パワー', 'カウンター', '属性', 
-        '特徴', 'ブロック', '効果テキスト', 'トリガー', '入手情報', 
-        '重複フラグ', 'ImageFileID', 'ImageFileID_small'
-    ]
-    out_cols = [c for c in cols if c in df_all.columns]
-    df_final = df_all[out_cols]
+    df_all['フリガナ'] = normalize_furigana_series(df_all['カード名'].map(f_dict).fillna(''))
     
-    df_final.to_csv(OUTPUT_CSV, index=False, encoding='utf-8-sig')
+    out_cols = [c for c in OUTPUT_COLUMNS if c in df_all.columns]
+    return df_all[out_cols]
+
+def export_stage(df_final, args):
+    with metrics.stage('csv'):
+        df_final.to_csv(OUTPUT_CSV, index=False, encoding='utf-8-sig')
+    metrics.add('csv', items=len(df_final), bytes=os.path.getsize(OUTPUT_CSV))
     print(f"Saved CSV: {OUTPUT_CSV}")
 
     print("Generating JSON...")
-    json_data = generate_card_json_from_df(df_final)
-    with open(OUTPUT_JSON, 'w', encoding='utf-8') as f:
-        json.dump(json_data, f, ensure_ascii=False, indent=2)
-    print(f"Saved JSON: {OUTPUT_JSON}")
+    records = iter_card_records(df_final)
+    shard_exporter = None
+    if EXPORT_SHARDS and not args.no_shards:
+        # 上書きする前に前回の cards.json を読み、差分の基準にする
+        previous_hashes = load_card_hashes(OUTPUT_JSON)
+        shard_exporter = ShardExporter(SHARD_DIR)
+        records = shard_exporter.tap(records)
+    db_builder = None
+    if EXPORT_SQLITE or args.sqlite:
+        db_builder = CardDbBuilder(OUTPUT_SQLITE)
+        records = db_builder.tap(records)
+    search_builder = None
+    if EXPORT_SEARCH_INDEX and not args.no_search_index:
+        search_builder = SearchIndexBuilder(normalize_furigana)
+        records = search_builder.tap(records)
+    binary_exporters = []
+    if export_parquet_enabled(args):
+        binary_exporters.append(('parquet', OUTPUT_PARQUET, ParquetExporter(OUTPUT_PARQUET)))
+    if export_msgpack_enabled(args):
+        binary_exporters.append(('msgpack', OUTPUT_MSGPACK, MsgpackExporter(OUTPUT_MSGPACK)))
+    for _, _, exporter in binary_exporters:
+        records = exporter.tap(records)
+    # レコード生成 (generate_card_json_from_df 相当) と各出力への書き込みを合わせて計測する
+    with metrics.stage('json'):
+        count = write_cards(records, OUTPUT_JSON, fmt=args.json_format,
+                            ndjson_path=OUTPUT_NDJSON if args.ndjson else None)
+    metrics.add('json', items=count, bytes=os.path.getsize(OUTPUT_JSON))
+    print(f"Saved JSON: {OUTPUT_JSON} ({count} cards, {args.json_format})")
+    if args.ndjson: print(f"Saved NDJSON: {OUTPUT_NDJSON}")
+    if shard_exporter:
+        with metrics.stage('shards'):
+            manifest, delta = shard_exporter.write(OUTPUT_MANIFEST, OUTPUT_DELTA, previous_hashes)
+        print(f"Saved {len(manifest['shards'])} shards to {SHARD_DIR}/ and {OUTPUT_MANIFEST}")
+        print(f"Delta: +{len(delta['added'])} ~{len(delta['changed'])} -{len(delta['removed'])} "
+              f"({len(delta['changedSeries'])} series changed) -> {OUTPUT_DELTA}")
+    if db_builder:
+        with metrics.stage('sqlite'):
+            db_builder.finish()
+        print(f"Saved SQLite: {OUTPUT_SQLITE}")
+    if search_builder:
+        with metrics.stage('search_index'):
+            search_builder.write(OUTPUT_SEARCH_INDEX)
+        metrics.add('search_index', bytes=os.path.getsize(OUTPUT_SEARCH_INDEX))
+        print(f"Saved search index: {OUTPUT_SEARCH_INDEX} ({os.path.getsize(OUTPUT_SEARCH_INDEX):,} bytes)")
+    for stage, path, exporter in binary_exporters:
+        with metrics.stage(stage):
+            exporter.finish()
+        metrics.add(stage, items=count, bytes=os.path.getsize(path))
+        print(f"Saved {stage}: {path} ({os.path.getsize(path):,} bytes)")
+    precompress_targets = []
+    if PRECOMPRESS_JSON and not args.no_precompress:
+        precompress_targets = [OUTPUT_JSON] + ([OUTPUT_SEARCH_INDEX] if search_builder else [])
+        for target in precompress_targets:
+            with metrics.stage('precompress'):
+                paths = write_precompressed(target)
+            for path in paths:
+                metrics.add('precompress', items=1, bytes=os.path.getsize(path))
+                print(f"Saved {path} ({os.path.getsize(path):,} bytes)")
+    # 事前圧縮しなかったファイルの前回の .gz / .br は本体と食い違うので削除する (cards.* はそのまま配信されるため)
+    for target in [t for t in (OUTPUT_JSON, OUTPUT_SEARCH_INDEX) if t not in precompress_targets]:
+        for path in remove_precompressed(target):
+            print(f"Removed stale {path}")
+
+def export_parquet_enabled(args):
+    if not (EXPORT_PARQUET or args.parquet): return False
+    if not HAS_PARQUET:
+        print(f"Warning: pyarrow is not installed; skipping {OUTPUT_PARQUET}.")
+        return False
+    return True
+
+def export_msgpack_enabled(args):
+    if not (EXPORT_MSGPACK or args.msgpack): return False
+    if not HAS_MSGPACK:
+        print(f"Warning: msgpack is not installed; skipping {OUTPUT_MSGPACK}.")
+        return False
+    return True
+
+def build_options(args):
+    # 出力内容に影響するオプション (変わったらフィンガープリントも変わる)
+    return {
+        'json_format': args.json_format, 'ndjson': bool(args.ndjson),
+        'shards': EXPORT_SHARDS and not args.no_shards,
+        'precompress': PRECOMPRESS_JSON and not args.no_precompress,
+        'sqlite': EXPORT_SQLITE or args.sqlite,
+        'search_index': EXPORT_SEARCH_INDEX and not args.no_search_index,
+        'parquet': (EXPORT_PARQUET or args.parquet) and HAS_PARQUET,
+        'msgpack': (EXPORT_MSGPACK or args.msgpack) and HAS_MSGPACK,
+    }
+
+# --- メイン処理 ---
+def main():
+    # --- 引数処理の追加 ---
+    parser = argparse.ArgumentParser(description='One Piece Card List Generator')
+    parser.add_argument('--skip-ai', action='store_true', help='Skip AI Furigana generation')
+    parser.add_argument('--force', action='store_true', help='Rebuild outputs even if the build fingerprint is unchanged')
+    parser.add_argument('--full-merge', action='store_true', help='Re-read every CSV instead of using the incremental merge store')
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS, help='Number of series fetched concurrently (1 = serial)')
+    parser.add_argument('--rate', type=float, default=REQUESTS_PER_SECOND, help='Max requests per second per host')
+    parser.add_argument('--parser', choices=sorted(PARSER_ENGINES), default=DEFAULT_PARSER_ENGINE, help='HTML parser engine for card list pages')
+    parser.add_argument('--json-format', choices=JSON_FORMATS, default=OUTPUT_JSON_FORMAT, help='Layout of cards.json')
+    parser.add_argument('--ndjson', action='store_true', help=f'Also stream records to {OUTPUT_NDJSON} (one JSON object per line)')
+    parser.add_argument('--sqlite', action='store_true', help=f'Also build {OUTPUT_SQLITE} (normalized, indexed; query with card_db.py)')
+    parser.add_argument('--parquet', action='store_true', help=f'Also write {OUTPUT_PARQUET} (columnar; load with card_binary.py)')
+    parser.add_argument('--msgpack', action='store_true', help=f'Also write {OUTPUT_MSGPACK} (MessagePack array of the cards.json records)')
+    parser.add_argument('--image-manifest', default=IMAGE_MANIFEST_FILE,
+                        help='Image manifest from process_images.py; only thumbnails recorded there fill ImageFileID_small')
+    parser.add_argument('--no-search-index', action='store_true', help=f'Do not write the n-gram search index {OUTPUT_SEARCH_INDEX}')
+    parser.add_argument('--no-shards', action='store_true', help='Do not write per-series shards, manifest and delta')
+    parser.add_argument('--no-precompress', action='store_true', help='Do not write cards.json.gz / cards.json.br')
+    parser.add_argument('--no-http-cache', action='store_true', help='Disable the on-disk HTTP response cache')
+    parser.add_argument('--profile', nargs='?', const='cprofile', choices=PROFILERS,
+                        help=f'Profile the run and save {PROFILE_OUTPUT}.prof (cprofile, default) or {PROFILE_OUTPUT}.html (pyinstrument)')
+    parser.add_argument('--no-report', action='store_true', help=f'Do not write the stage metrics report {RUN_REPORT_FILE}')
+    parser.add_argument('--watch', action='store_true',
+                        help='Poll the series list and first pages; fetch and rebuild only series whose cards changed')
+    parser.add_argument('--watch-interval', type=float, default=WATCH_INTERVAL_SECONDS, help='Seconds between watch cycles')
+    parser.add_argument('--watch-workers', type=int, default=WATCH_WORKERS, help='First pages checked concurrently')
+    parser.add_argument('--watch-cycles', type=int, default=0, help='Stop after this many watch cycles (0 = run until interrupted)')
+    args = parser.parse_args()
+
+    metrics.reset()
+    try:
+        if args.profile: run_profiled(lambda: run_pipeline(args), args.profile, PROFILE_OUTPUT)
+        else: run_pipeline(args)
+    finally:
+        # 途中で失敗しても、どこまで進んだか分かるようにレポートは書く
+        if not args.no_report:
+            metrics.write_report(RUN_REPORT_FILE)
+            print("Stage metrics:")
+            print(metrics.summary())
+            print(f"Saved run report: {RUN_REPORT_FILE}")
+
+def run_pipeline(args):
+    if not os.path.exists(DATA_DIR): os.makedirs(DATA_DIR)
+    if not os.path.exists(PROMPT_DIR): 
+        print(f"Warning: '{PROMPT_DIR}' directory missing. AI features may fail.")
+
+    if args.watch:
+        run_watch(args)
+        return
+
+    with metrics.stage('fetch'):
+        fetch_stage(args)
+    build_stage(args)
+
+def build_stage(args):
+    """data/*.csv からマージして出力する。入力が前回から変わっていなければ何もしない"""
+    # 設定値と引数の両方を考慮して実行フラグを決定
+    should_run_ai = ENABLE_AI_GENERATION and not args.skip_ai
+
+    print("Merging data...")
+    files = list_data_files()
+    if not files: return
+
+    options = build_options(args)
+    fingerprint = compute_build_fingerprint(files, options, args.image_manifest)
+    previous = load_build_fingerprint()
+    if not args.force and is_build_up_to_date(previous, fingerprint, should_run_ai):
+        timings = load_build_timings()
+        print(f"[Skip] Inputs unchanged (fingerprint {fingerprint['hash'][:12]}). "
+              f"Skipped merge ({timings.get('merge', 0):.2f}s last run) and export ({timings.get('export', 0):.2f}s last run). "
+              f"Use --force to rebuild.")
+        metrics.add('build', skipped=1)
+        return
+
+    t_start = time.perf_counter()
+    with metrics.stage('merge'):
+        if INCREMENTAL_MERGE and not args.full_merge:
+            df_all = merge_data_files_incremental(files)
+        else:
+            df_all = merge_data_files(files)
+        df_all = fill_small_image_ids(df_all, load_rendered_images(args.image_manifest))
+    metrics.add('merge', items=len(df_all), files=len(files))
+    with metrics.stage('furigana'):
+        df_final = apply_furigana(df_all, should_run_ai)
+    t_merged = time.perf_counter()
+    with metrics.stage('export'):
+        export_stage(df_final, args)
+    t_exported = time.perf_counter()
+
+    # AI処理で辞書が更新されている可能性があるので、保存する値は出力後に計算し直す
+    save_build_fingerprint(compute_build_fingerprint(files, options, args.image_manifest),
+                           {'merge': t_merged - t_start, 'export': t_exported - t_merged})
+    print(f"Merge: {t_merged - t_start:.2f}s, Export: {t_exported - t_merged:.2f}s. Saved {BUILD_FINGERPRINT_FILE}")
+
+# --- 監視モード (--watch) ---
+# シリーズ一覧と各シリーズの1ページ目だけを定期的に確認し (HTTPキャッシュがあれば条件付きGET)、
+# 新しいシリーズと1ページ目のカード内容が変わったシリーズだけを全ページ取得して出力を作り直す。
+# 作り直しは通常と同じ build_stage なので、変わった CSV だけを読み直し、変わったシャードだけを書き換える。
+def first_page_digest(series_code, engine, known_digest=None):
+    """1ページ目のカード行 (と次ページの有無) のハッシュ。前回と同じ本文 (304 など) なら解析せずに known_digest を返す"""
+    response = http_get(f"{BASE_URL}?series={series_code}&page=1")
+    if response.unchanged and known_digest:
+        return known_digest
+    with metrics.stage('parse'):
+        rows, has_next = parse_card_page(response.text, engine)
+    return content_digest({'rows': rows, 'has_next': has_next})
+
+def watch_cycle(args, state):
+    """監視1回分。取得して CSV を保存したシリーズの数を返す"""
+    with metrics.stage('watch_poll'):
+        series_list = get_all_series_list()
+        if not series_list:
+            print("[Watch] Series list unavailable. Retrying next cycle.")
+            return 0
+        digests = {}
+        with ThreadPoolExecutor(max_workers=max(1, args.watch_workers)) as executor:
+            futures = {executor.submit(first_page_digest, s['code'], args.parser, state.digest(s['code'])): s['code']
+                       for s in series_list}
+            for future in as_completed(futures):
+                code = futures[future]
+                try:
+                    digests[code] = future.result()
+                except Exception as e:
+                    print(f"  [{code}] Watch check failed: {e}")
+    metrics.add('watch_poll', items=len(series_list), errors=len(series_list) - len(digests))
+
+    checkpoints = FetchCheckpoints(FETCH_CHECKPOINT_FILE)
+    try:
+        targets = []
+        for s in series_list:
+            code = s['code']
+            if code not in digests: continue
+            if code in state:
+                if not state.is_changed(code, digests[code]): continue
+                print(f"[Watch] {s['name']} ({code}) changed.")
+            elif os.path.exists(os.path.join(DATA_DIR, f"{code}.csv")) and checkpoints.is_complete(code):
+                # 監視を始めた時点で取得済みのシリーズは、今の内容を基準にする
+                state.record(code, s['name'], digests[code]); continue
+            else:
+                print(f"[Watch] New series {s['name']} ({code}).")
+            state.mark_pending(code, digests[code])
+            targets.append(s)
+        for code in [c for c in state.series if c not in {s['code'] for s in series_list}]:
+            print(f"[Watch] Series {code} is no longer listed. Keeping its CSV.")
+            state.forget(code)
+        state.save()
+
+        fetched = fetch_series(targets, args, checkpoints, force=True) if targets else set()
+    finally:
+        checkpoints.close()
+    for s in targets:
+        if s['code'] in fetched: state.record(s['code'], s['name'], state.pending[s['code']])
+    state.save()
+    metrics.add('watch_poll', changed=len(targets), fetched=len(fetched))
+    return len(fetched)
+
+def run_watch(args):
+    configure_http_client(max(1, args.workers, args.watch_workers), args.rate,
+                          cache_dir=None if args.no_http_cache else HTTP_CACHE_DIR)
+    state = WatchState.load(WATCH_STATE_FILE)
+    cycle = 0
+    try:
+        while True:
+            cycle += 1
+            start = time.perf_counter()
+            print(f"[Watch] Cycle {cycle}...")
+            try:
+                fetched = watch_cycle(args, state)
+                if fetched:
+                    build_stage(args)
+                print(f"[Watch] Cycle {cycle} done in {time.perf_counter() - start:.1f}s "
+                      f"({fetched} series fetched{', outputs rebuilt' if fetched else ''}).")
+            except Exception as e:
+                # 1回の失敗で監視を止めない (変更を検知したシリーズは pending に残り、次の周回で取得し直す)
+                metrics.add('watch_poll', errors=1)
+                print(f"[Watch] Cycle {cycle} failed: {e}")
+            if get_http_client().cache: get_http_client().cache.save()
+            if args.watch_cycles and cycle >= args.watch_cycles: break
+            time.sleep(max(0.0, args.watch_interval))
+    except KeyboardInterrupt:
+        print("[Watch] Stopped.")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,169 @@
+import os
+import csv
+import sqlite3
+import hashlib
+
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    # 入っていれば pyarrow で CSV を読み、Arrow 上で連結してから1回だけ DataFrame にする
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.compute as pa_compute
+except ImportError:
+    pa = None
+
+from card_parser import CARD_COLUMNS
+
+# --- マージ済みテーブルの永続ストア (SQLite) ---
+# data/*.csv の全行を (ファイル名, 行番号) をキーに保持し、ファイルごとの SHA-256 を記録する。
+# 変更・追加・削除された CSV の行だけを入れ替え、重複フラグはそれらに含まれる CardID だけ再計算する。
+# 並び順と重複判定はフルマージ (CardID, SortPriority, ファイル名順, 行順) と同じ。
+
+STORE_VERSION = 1
+DUPLICATE_FLAG = '重複'
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+# 値の種類が少ない列はカテゴリ型にする (値は共有され、行ごとには整数コードだけを持つ)
+CATEGORY_COLUMNS = ['Rarity', 'Type', 'Color', 'Cost_Life_Type', 'Attribute', 'SetInfo']
+# CSV を並列に読むスレッド数 (pyarrow は読み込み中に GIL を手放す)
+READ_WORKERS = 4
+# pd.read_csv が既定で欠損値として扱う文字列 (pyarrow でも同じ値を空欄にする)
+NA_VALUES = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+             '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null']
+
+def read_data_table(path):
+    """
+    CSV を全列文字列の Arrow テーブルとして読む (型推論すると '01' などが数値になるため)。
+    ファイル単位で並列に読むので、ファイル内ではスレッドを使わない。
+    """
+    # data/*.csv は utf-8-sig で保存しているので、BOM を除いて列名を読む (pyarrow も BOM を読み飛ばす)
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        header = next(csv.reader(f), [])
+    options = pa_csv.ConvertOptions(column_types={c: pa.string() for c in header},
+                                    null_values=NA_VALUES, strings_can_be_null=True)
+    # 効果テキストなどの引用符付きの改行を含む値も pd.read_csv と同じく1つの値として読む
+    return pa_csv.read_csv(path, read_options=pa_csv.ReadOptions(use_threads=False),
+                           parse_options=pa_csv.ParseOptions(newlines_in_values=True), convert_options=options)
+
+def table_to_frame(table):
+    """欠損を '' にして DataFrame (Arrow の文字列型) にする"""
+    table = pa.table({name: pa_compute.fill_null(table[name], '') for name in table.column_names})
+    return table.to_pandas(types_mapper={pa.string(): pd.StringDtype('pyarrow')}.get)
+
+def read_data_csv(path):
+    if pa is None:
+        return pd.read_csv(path, dtype=str).fillna('')
+    return table_to_frame(read_data_table(path))
+
+def read_data_files(files, workers=READ_WORKERS):
+    """
+    files を並列に読み、ファイル順に連結した1つの DataFrame を返す (列がそろわないファイルは欠けた列を '')。
+    pyarrow が無ければ pd.read_csv で順に読む。
+    """
+    if pa is None:
+        return pd.concat([read_data_csv(f) for f in files], ignore_index=True).fillna('')
+    if len(files) <= 1 or workers <= 1:
+        tables = [read_data_table(f) for f in files]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            tables = list(executor.map(read_data_table, files))
+    return table_to_frame(pa.concat_tables(tables, promote_options='default'))
+
+def sort_priority(rarity):
+    """レアリティに 'SP' を含む行は 1 (同じ CardID の中で後ろに回す)、それ以外は 0"""
+    return rarity.astype(str).str.contains('SP', regex=False).to_numpy(dtype=np.int8)
+
+def categorize(df):
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns: df[col] = df[col].astype('category')
+    return df
+
+class MergeStore:
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self._init_schema()
+
+    def _init_schema(self):
+        version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+        if version not in (0, STORE_VERSION):
+            # 形式が変わったら作り直す
+            self.conn.executescript('DROP TABLE IF EXISTS rows; DROP TABLE IF EXISTS files;')
+        cols = ', '.join(f'"{c}" TEXT NOT NULL' for c in CARD_COLUMNS)
+        self.conn.executescript(f'''
+            CREATE TABLE IF NOT EXISTS files (file TEXT PRIMARY KEY, sha256 TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS rows (
+                file TEXT NOT NULL, seq INTEGER NOT NULL, sort_priority INTEGER NOT NULL,
+                {cols}, is_duplicate TEXT NOT NULL DEFAULT '',
+                PRIMARY KEY (file, seq)
+            );
+            CREATE INDEX IF NOT EXISTS idx_rows_card ON rows ("CardID", sort_priority, file, seq);
+            PRAGMA user_version = {STORE_VERSION};
+        ''')
+
+    def sync(self, files):
+        """
+        files (data/*.csv のパス) とストアを同期し、{'changed', 'removed', 'unchanged', 'affected_ids'} を返す。
+        1トランザクションで行うので、途中で落ちても前回の状態が残る。
+        """
+        current = {os.path.basename(f): f for f in files}
+        stored = dict(self.conn.execute('SELECT file, sha256 FROM files'))
+        digests = {name: file_sha256(path) for name, path in current.items()}
+        changed = sorted(name for name in current if stored.get(name) != digests[name])
+        removed = sorted(name for name in stored if name not in current)
+
+        affected = set()
+        placeholders = ', '.join('?' for _ in CARD_COLUMNS)
+        col_names = ', '.join(f'"{c}"' for c in CARD_COLUMNS)
+        with self.conn:
+            for name in removed + changed:
+                affected.update(r[0] for r in self.conn.execute('SELECT DISTINCT "CardID" FROM rows WHERE file = ?', (name,)))
+                self.conn.execute('DELETE FROM rows WHERE file = ?', (name,))
+                self.conn.execute('DELETE FROM files WHERE file = ?', (name,))
+            for name in changed:
+                df = read_data_csv(current[name])
+                for col in CARD_COLUMNS:
+                    if col not in df.columns: df[col] = ''
+                values = df[CARD_COLUMNS].values.tolist()
+                priorities = sort_priority(df['Rarity']).tolist()
+                self.conn.executemany(
+                    f'INSERT INTO rows (file, seq, sort_priority, {col_names}) VALUES (?, ?, ?, {placeholders})',
+                    [(name, seq, priority, *row) for seq, (priority, row) in enumerate(zip(priorities, values))])
+                self.conn.execute('INSERT INTO files (file, sha256) VALUES (?, ?)', (name, digests[name]))
+                affected.update(df['CardID'].tolist())
+            self._resolve_duplicates(affected)
+        return {'changed': changed, 'removed': removed, 'unchanged': len(current) - len(changed),
+                'affected_ids': len(affected)}
+
+    def _resolve_duplicates(self, card_ids):
+        if not card_ids: return
+        self.conn.execute('CREATE TEMP TABLE IF NOT EXISTS affected (card_id TEXT PRIMARY KEY)')
+        self.conn.execute('DELETE FROM affected')
+        self.conn.executemany('INSERT OR IGNORE INTO affected VALUES (?)', [(c,) for c in card_ids])
+        # CardID ごとに (SortPriority, ファイル名, 行番号) が最小の行以外を重複にする
+        self.conn.execute(f'''
+            UPDATE rows SET is_duplicate = CASE WHEN rowid = (
+                SELECT r2.rowid FROM rows r2 WHERE r2."CardID" = rows."CardID"
+                ORDER BY r2.sort_priority, r2.file, r2.seq LIMIT 1
+            ) THEN '' ELSE '{DUPLICATE_FLAG}' END
+            WHERE "CardID" IN (SELECT card_id FROM affected)
+        ''')
+
+    def to_dataframe(self):
+        """フルマージと同じ並び・列 (CSVの列 + IsDuplicate) の DataFrame を返す"""
+        col_names = ', '.join(f'"{c}"' for c in CARD_COLUMNS)
+        cursor = self.conn.execute(
+            f'SELECT {col_names}, is_duplicate FROM rows ORDER BY "CardID", sort_priority, file, seq')
+        return categorize(pd.DataFrame(cursor.fetchall(), columns=CARD_COLUMNS + ['IsDuplicate'], dtype=object))
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,144 @@
+import sys
+import json
+import time
+import threading
+import platform
+from contextlib import contextmanager
+
+try:
+    import resource  # Windows には無い (ピークメモリは記録しない)
+except ImportError:
+    resource = None
+
+from card_export import atomic_open
+
+# --- ステージ別の計測 ---
+# with metrics.stage('fetch'): ... で所要時間を、metrics.add('fetch', requests=1, bytes=n) で件数を積み上げ、
+# 最後に write_report() で JSON のレポートにする。スレッドから同じステージを同時に計測してもよい。
+#   seconds      : 各呼び出しの所要時間の合計 (並列実行時は wall_seconds より大きくなる)
+#   wall_seconds : 最初の開始から最後の終了まで
+#   calls        : 呼び出し回数
+#   counters     : requests / bytes / retries / items など (items は items_per_sec の計算に使う)
+#   peak_rss_mb  : ステージ終了時点までのプロセスのピークメモリ
+
+REPORT_VERSION = 1
+
+def peak_rss_mb():
+    if resource is None: return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux は KB、macOS はバイト単位
+    return round(peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024, 1)
+
+class RunMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.stages = {}
+            self.started_at = time.time()
+            self.started = time.perf_counter()
+
+    def _stage(self, name):
+        # self.lock を持った状態で呼ぶ
+        if name not in self.stages:
+            self.stages[name] = {'seconds': 0.0, 'calls': 0, 'first_start': None, 'last_end': None,
+                                 'counters': {}, 'peak_rss_mb': None}
+        return self.stages[name]
+
+    @contextmanager
+    def stage(self, name, **counters):
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            end = time.perf_counter()
+            rss = peak_rss_mb()
+            with self.lock:
+                s = self._stage(name)
+                s['seconds'] += end - start
+                s['calls'] += 1
+                s['first_start'] = start if s['first_start'] is None else min(s['first_start'], start)
+                s['last_end'] = end if s['last_end'] is None else max(s['last_end'], end)
+                if rss is not None: s['peak_rss_mb'] = max(s['peak_rss_mb'] or 0, rss)
+                for key, value in counters.items():
+                    s['counters'][key] = s['counters'].get(key, 0) + value
+
+    def add(self, name, **counters):
+        with self.lock:
+            s = self._stage(name)
+            for key, value in counters.items():
+                s['counters'][key] = s['counters'].get(key, 0) + value
+
+    def report(self):
+        with self.lock:
+            stages = {}
+            for name, s in self.stages.items():
+                wall = (s['last_end'] - s['first_start']) if s['calls'] else 0.0
+                entry = {'seconds': round(s['seconds'], 4), 'wall_seconds': round(wall, 4), 'calls': s['calls'],
+                         **s['counters'], 'peak_rss_mb': s['peak_rss_mb']}
+                if 'items' in s['counters'] and wall > 0:
+                    entry['items_per_sec'] = round(s['counters']['items'] / wall, 1)
+                stages[name] = entry
+            return {
+                'version': REPORT_VERSION,
+                'started_at': time.strftime('%Y-%m-%dT%H:%M:%S%z', time.localtime(self.started_at)),
+                'total_seconds': round(time.perf_counter() - self.started, 4),
+                'peak_rss_mb': peak_rss_mb(),
+                'python': platform.python_version(),
+                'argv': sys.argv[1:],
+                'stages': stages,
+            }
+
+    def summary(self):
+        """1ステージ1行の要約"""
+        lines = []
+        for name, s in self.report()['stages'].items():
+            extra = ''.join(f", {k} {v:,}" for k, v in s.items()
+                            if k in ('items', 'requests', 'bytes', 'retries', 'errors') and v)
+            rate = f", {s['items_per_sec']:,}/s" if 'items_per_sec' in s else ''
+            lines.append(f"  {name:<16} {s['wall_seconds']:8.2f}s wall, {s['seconds']:8.2f}s total, "
+                         f"{s['calls']} calls{extra}{rate}")
+        return "\n".join(lines)
+
+    def write_report(self, path):
+        with atomic_open(path) as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2)
+        return path
+
+# 実行全体で共有するインスタンス
+metrics = RunMetrics()
+
+# --- プロファイル ---
+PROFILERS = ('cprofile', 'pyinstrument')
+
+def run_profiled(func, profiler, output_base):
+    """
+    func() をプロファイラ付きで実行し、結果を output_base + 拡張子 に保存する。
+    cprofile: .prof (pstats / snakeviz で開ける) と上位20件の表示, pyinstrument: .html (要インストール)
+    どちらも呼び出したスレッドだけが対象 (ワーカースレッド内の時間は、ステージの計測値で見る)。
+    """
+    if profiler == 'pyinstrument':
+        from pyinstrument import Profiler
+        prof = Profiler()
+        prof.start()
+        try:
+            return func()
+        finally:
+            prof.stop()
+            path = output_base + '.html'
+            with atomic_open(path) as f:
+                f.write(prof.output_html())
+            print(f"Saved profile: {path}")
+
+    import cProfile
+    import pstats
+    prof = cProfile.Profile()
+    try:
+        return prof.runcall(func)
+    finally:
+        path = output_base + '.prof'
+        prof.dump_stats(path)
+        pstats.Stats(prof).sort_stats('cumulative').print_stats(20)
+        print(f"Saved profile: {path}")
@@ -1,56 +1,95 @@
 import os
+import csv
 import json
-import requests
-import time
+import argparse
+import threading
+from urllib.parse import urljoin
+from concurrent.futures import ThreadPoolExecutor
 from bs4 import BeautifulSoup
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
+
+from http_client import HttpClient
+from card_export import atomic_open
 
 # --- 設定 ---
 # Google Sheetsの設定 (GCPでサービスアカウントを作成し、JSONキーを取得・Secretsに登録してください)
 scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
 # GitHub ActionsのSecretsからクレデンシャルを取得する前提
-CREDENTIALS_JSON = os.environ.get('GSPREAD_CREDENTIALS') 
+CREDENTIALS_JSON = os.environ.get('GSPREAD_CREDENTIALS')
 SHEET_NAME = 'TargetSets' # スプレッドシート名
 
 # 画像保存先
 IMAGE_DIR = 'OP_TCG_DB/temp_images'
 JSON_OUTPUT = 'OP_TCG_DB/new_cards.json'
+# 既知のカード (ここにあるカード番号は新カードとして扱わず、画像も取得しない)
+KNOWN_CARDS_JSON = 'cards.json'
+
+# サイトを並列に取得する数・画像を並列に取得する数 (コマンドライン引数で上書き可能)
+SITE_WORKERS = 4
+IMAGE_WORKERS = 4
+# 同じホストへのリクエスト数の上限 (件/秒)。サイト間の固定の time.sleep(2) の代わりに、
+# ページと画像のすべてのリクエストを HttpClient のホストごとのレート制限で抑える
+REQUESTS_PER_SECOND = 2.0
+
+# --- 対象サイトのリスト (TargetSets シート) ---
+# ヘッダー: SetName, URL を想定。テストやオフラインでは同じ列の CSV で代用できる。
+class GSpreadSheetSource:
+    def __init__(self, sheet_name=SHEET_NAME, credentials_json=CREDENTIALS_JSON):
+        self.sheet_name = sheet_name
+        self.credentials_json = credentials_json
+
+    def rows(self):
+        if not self.credentials_json:
+            print("GSPREAD_CREDENTIALS not found.")
+            return None
+        # gspread はシートから読むときだけ必要
+        import gspread
+        from oauth2client.service_account import ServiceAccountCredentials
+        creds_dict = json.loads(self.credentials_json)
+        creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
+        client = gspread.authorize(creds)
+        return client.open(self.sheet_name).sheet1.get_all_records()
+
+class CsvSheetSource:
+    def __init__(self, path):
+        self.path = path
+
+    def rows(self):
+        with open(self.path, 'r', encoding='utf-8-sig', newline='') as f:
+            return list(csv.DictReader(f))
 
-def setup_gspread():
-    if not CREDENTIALS_JSON:
-        print("GSPREAD_CREDENTIALS not found.")
-        return None
-    creds_dict = json.loads(CREDENTIALS_JSON)
-    creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
-    client = gspread.authorize(creds)
-    return client
-
-def download_image(img_url, file_name):
-    if not os.path.exists(IMAGE_DIR):
-        os.makedirs(IMAGE_DIR)
-    
-    path = os.path.join(IMAGE_DIR, file_name)
+def load_known_card_numbers(path=KNOWN_CARDS_JSON):
+    """既存の cards.json のカード番号の集合 (無い・壊れている場合は空)"""
+    if not path or not os.path.exists(path): return set()
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return {c['cardNumber'] for c in json.load(f) if isinstance(c, dict) and c.get('cardNumber')}
+    except Exception as e:
+        print(f"Warning: could not read {path} ({e}); treating every card as new.")
+        return set()
+
+def download_image(client, img_url, file_name, image_dir=IMAGE_DIR):
+    os.makedirs(image_dir, exist_ok=True)
+
+    path = os.path.join(image_dir, file_name)
     if os.path.exists(path):
         return path # 既に存在すればスキップ
 
     try:
-        response = requests.get(img_url)
-        if response.status_code == 200:
-            with open(path, 'wb') as f:
-                f.write(response.content)
-            return path
+        # チャンク単位で一時ファイルに書き、完了してから置き換える
+        client.download(img_url, path)
+        return path
     except Exception as e:
         print(f"Error downloading {img_url}: {e}")
     return None
 
-def scrape_site(url, set_name):
+def scrape_site(client, url, set_name):
+    """サイトのカード一覧を解析し、[(カードデータ, 画像URL)] を返す (画像はここでは取得しない)"""
     print(f"Scraping {set_name} from {url}...")
     cards = []
     try:
-        res = requests.get(url)
+        res = client.get(url)
         soup = BeautifulSoup(res.text, 'html.parser')
-        
+
         # NOTE: 以下のセレクタは対象サイトの構造に合わせて修正してください
         # 例: カードリストの各アイテムを取得
         card_elements = soup.select('.card_list_item') # 仮のクラス名
@@ -61,13 +100,10 @@ def scrape_site(url, set_name):
                 # ID取得 (例: OP01-001)
                 card_id = el.select_one('.card_number').text.strip()
                 name = el.select_one('.card_name').text.strip()
-                img_src = el.select_one('img')['src']
-                
+                img_src = urljoin(url, el.select_one('img')['src'])
+
                 # 画像ファイル名生成
                 img_filename = f"{card_id.replace('/', '_')}.jpg"
-                
-                # 画像ダウンロード
-                download_image(img_src, img_filename)
 
                 # カードデータ構築 (既存のcards.jsonの形式に合わせる)
                 card_data = {
@@ -75,7 +111,7 @@ def scrape_site(url, set_name):
                     "cardNumber": card_id,
                     "cardName": name,
                     "rarity": "UNK", # 必要に応じて取得
-                    "color": ["Unknown"], 
+                    "color": ["Unknown"],
                     "costLifeValue": "",
                     "power": "",
                     "counter": "",
@@ -85,37 +121,77 @@ def scrape_site(url, set_name):
                     "imageUrl": f"temp_images/{img_filename}", # 相対パス
                     "isNew": True # アプリ側で区別するためのフラグ
                 }
-                cards.append(card_data)
-            except AttributeError:
+                cards.append((card_data, img_src))
+            except (AttributeError, TypeError, KeyError):
                 continue
-                
+
     except Exception as e:
         print(f"Error scraping {url}: {e}")
-    
+
     return cards
 
-def main():
-    client = setup_gspread()
-    if not client:
-        return
+def scrape_new_cards(rows, client, known_numbers=frozenset(), site_workers=SITE_WORKERS,
+                     image_workers=IMAGE_WORKERS, image_dir=IMAGE_DIR):
+    """
+    rows (SetName, URL) のサイトを並列に取得し、既知でないカードの画像を並列にダウンロードして、
+    新カードのリスト (シートの行順・サイト内の順) を返す。
+    既知のカード番号と、複数のサイトに載っている同じカード番号は1件だけ扱う。
+    """
+    targets = [(row.get('URL'), row.get('SetName')) for row in rows if row.get('URL')]
+    with ThreadPoolExecutor(max_workers=max(1, site_workers)) as executor:
+        scraped = list(executor.map(lambda t: scrape_site(client, *t), targets))
 
-    sheet = client.open(SHEET_NAME).sheet1
-    rows = sheet.get_all_records() # ヘッダー: SetName, URL を想定
+    new_cards, images = [], []
+    seen = set(known_numbers)
+    skipped = 0
+    for cards in scraped:
+        for card_data, img_src in cards:
+            if card_data['cardNumber'] in seen:
+                skipped += 1; continue
+            seen.add(card_data['cardNumber'])
+            new_cards.append(card_data)
+            images.append((img_src, os.path.basename(card_data['imageUrl'])))
+    if skipped: print(f"Skipped {skipped} cards that are already known or listed twice.")
 
-    all_new_cards = []
+    failed = []
+    lock = threading.Lock()
+    def fetch(image):
+        if download_image(client, image[0], image[1], image_dir) is None:
+            with lock: failed.append(image[0])
+    with ThreadPoolExecutor(max_workers=max(1, image_workers)) as executor:
+        list(executor.map(fetch, images))
+    if failed: print(f"Failed to download {len(failed)} images.")
+    return new_cards
 
-    for row in rows:
-        set_name = row.get('SetName')
-        url = row.get('URL')
-        if url:
-            cards = scrape_site(url, set_name)
-            all_new_cards.extend(cards)
-            time.sleep(2) # マナーとしてウェイト
+def main():
+    parser = argparse.ArgumentParser(description='Scrape new cards from the sites listed in the TargetSets sheet')
+    parser.add_argument('--sheet-csv', help='Read SetName/URL rows from this CSV instead of Google Sheets')
+    parser.add_argument('--known-cards', default=KNOWN_CARDS_JSON, help='cards.json whose card numbers are skipped')
+    parser.add_argument('--output', default=JSON_OUTPUT)
+    parser.add_argument('--image-dir', default=IMAGE_DIR)
+    parser.add_argument('--workers', type=int, default=SITE_WORKERS, help='Sites fetched concurrently')
+    parser.add_argument('--image-workers', type=int, default=IMAGE_WORKERS, help='Images downloaded concurrently')
+    parser.add_argument('--rate', type=float, default=REQUESTS_PER_SECOND, help='Max requests per second per host')
+    args = parser.parse_args()
+
+    source = CsvSheetSource(args.sheet_csv) if args.sheet_csv else GSpreadSheetSource()
+    rows = source.rows()
+    if rows is None:
+        return
+
+    # 1つのセッション (keep-alive) を全スレッドで共有し、ホストごとにリクエスト間隔を守る
+    client = HttpClient(max_workers=max(args.workers, args.image_workers), rate=args.rate)
+    try:
+        all_new_cards = scrape_new_cards(rows, client, load_known_card_numbers(args.known_cards),
+                                         args.workers, args.image_workers, args.image_dir)
+    finally:
+        client.close()
 
     # JSON保存
-    with open(JSON_OUTPUT, 'w', encoding='utf-8') as f:
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with atomic_open(args.output) as f:
         json.dump(all_new_cards, f, ensure_ascii=False, indent=2)
-    print(f"Saved {len(all_new_cards)} cards to {JSON_OUTPUT}")
+    print(f"Saved {len(all_new_cards)} cards to {args.output}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,211 @@
+import os
+import sys
+import json
+import argparse
+import unicodedata
+
+from card_export import atomic_open
+
+# --- 検索インデックス ---
+# 日本語は単語区切りが無いので、文字 n-gram (1-gram と 2-gram) の転置インデックスを作る。
+#   name    : cardName
+#   reading : furigana (normalize_furigana 済み)
+#   effect  : effectText
+# 文字列はすべて fold_text で正規化 (NFKC・小文字化・カタカナ→ひらがな・空白除去) してから分割する。
+# ポスティングは cards.json の並び順 (0始まりの序数) を昇順にし、差分 (delta) で保存する。
+#
+# 出力形式 (cards.search.json):
+#   {"version": 1, "gramSizes": [1, 2], "cardCount": N,
+#    "docs": [[name, reading], ...],                 # 序数ごとの fold 済みの名前/読み (順位付け用)
+#    "postings": {"name": {"るふ": [3, 1, 40]}, ...}} # 差分エンコードした序数
+
+INDEX_VERSION = 1
+GRAM_SIZES = (1, 2)
+FIELDS = ('name', 'reading', 'effect')
+
+# 順位付けの重み (完全一致 > 前方一致 > 部分一致、名前 > 読み > 効果テキスト)
+SCORES = {
+    'name': {'exact': 100, 'prefix': 60, 'substring': 30},
+    'reading': {'exact': 90, 'prefix': 50, 'substring': 25},
+    'effect': {'substring': 5},
+}
+
+KANA_FOLD = {c: c - 0x60 for c in range(0x30A1, 0x30F7)}  # ァ-ヶ -> ぁ-ゖ
+
+def fold_text(text):
+    if not text: return ''
+    text = unicodedata.normalize('NFKC', str(text)).lower().translate(KANA_FOLD)
+    return ''.join(text.split())
+
+def ngrams(text, sizes=GRAM_SIZES):
+    grams = set()
+    for n in sizes:
+        for i in range(len(text) - n + 1):
+            grams.add(text[i:i + n])
+    return grams
+
+def query_grams(term):
+    # 1文字なら 1-gram、2文字以上なら 2-gram の積集合で候補を絞る
+    if len(term) == 1: return {term}
+    return ngrams(term, (2,))
+
+def delta_encode(ordinals):
+    out, prev = [], 0
+    for o in ordinals:
+        out.append(o - prev)
+        prev = o
+    return out
+
+def delta_decode(deltas):
+    out, total = [], 0
+    for d in deltas:
+        total += d
+        out.append(total)
+    return out
+
+class SearchIndexBuilder:
+    """
+    write_cards に渡すレコードを tap() で横取りし、同じ1パスでインデックスを作る。
+    normalize_reading には main.normalize_furigana を渡す。
+    """
+    def __init__(self, normalize_reading=None):
+        self.normalize_reading = normalize_reading
+        self.docs = []
+        self.postings = {field: {} for field in FIELDS}
+
+    def add(self, record):
+        ordinal = len(self.docs)
+        reading = record.get('furigana', '')
+        if self.normalize_reading: reading = self.normalize_reading(reading)
+        texts = {
+            'name': fold_text(record.get('cardName', '')),
+            'reading': fold_text(reading),
+            'effect': fold_text(record.get('effectText', '')),
+        }
+        self.docs.append([texts['name'], texts['reading']])
+        for field, text in texts.items():
+            postings = self.postings[field]
+            for gram in ngrams(text):
+                postings.setdefault(gram, []).append(ordinal)
+
+    def tap(self, records):
+        for record in records:
+            self.add(record)
+            yield record
+
+    def to_dict(self):
+        return {
+            'version': INDEX_VERSION,
+            'gramSizes': list(GRAM_SIZES),
+            'cardCount': len(self.docs),
+            'docs': self.docs,
+            'postings': {field: {g: delta_encode(p) for g, p in sorted(grams.items())}
+                         for field, grams in self.postings.items()},
+        }
+
+    def write(self, path):
+        # 序数は追加順なのでポスティングは既に昇順
+        with atomic_open(path) as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, separators=(',', ':'))
+        return len(self.docs)
+
+class SearchIndex:
+    def __init__(self, data):
+        if data.get('version') != INDEX_VERSION:
+            raise ValueError(f"Unsupported search index version: {data.get('version')}")
+        self.docs = data['docs']
+        self.card_count = data['cardCount']
+        self._encoded = data['postings']
+        self._decoded = {field: {} for field in FIELDS}
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    @classmethod
+    def from_records(cls, records, normalize_reading=None):
+        builder = SearchIndexBuilder(normalize_reading)
+        for record in records:
+            builder.add(record)
+        return cls(builder.to_dict())
+
+    def postings(self, field, gram):
+        # 使われたポスティングだけ遅延デコードする
+        cache = self._decoded[field]
+        if gram not in cache:
+            cache[gram] = delta_decode(self._encoded[field].get(gram, []))
+        return cache[gram]
+
+    def candidates(self, field, term):
+        result = None
+        for gram in sorted(query_grams(term), key=lambda g: len(self._encoded[field].get(g, []))):
+            ordinals = self.postings(field, gram)
+            result = set(ordinals) if result is None else result.intersection(ordinals)
+            if not result: break
+        return result or set()
+
+    def score_term(self, term, prefix=False):
+        """1語について {序数: スコア}。prefix=True なら名前/読みの前方一致のみ"""
+        scores = {}
+        for field in ('name', 'reading'):
+            weights = SCORES[field]
+            pos = 0 if field == 'name' else 1
+            for o in self.candidates(field, term):
+                text = self.docs[o][pos]
+                if text == term: s = weights['exact']
+                elif text.startswith(term): s = weights['prefix']
+                elif not prefix and term in text: s = weights['substring']
+                else: continue
+                scores[o] = max(scores.get(o, 0), s)
+        if not prefix:
+            # 効果テキストは本文を持たないので n-gram の積集合で判定する (3文字以上は近似)
+            for o in self.candidates('effect', term):
+                scores[o] = scores.get(o, 0) + SCORES['effect']['substring']
+        return scores
+
+    def search(self, query, prefix=False, limit=None):
+        """
+        空白区切りの各語をすべて含むカードを [(序数, スコア)] でスコアの高い順に返す。
+        prefix=True はインクリメンタル検索向けに、名前/読みの前方一致だけを対象にする。
+        """
+        terms = [fold_text(t) for t in query.split()]
+        terms = [t for t in terms if t]
+        if not terms: return []
+        total = None
+        for term in terms:
+            scores = self.score_term(term, prefix)
+            if total is None:
+                total = scores
+            else:
+                total = {o: total[o] + s for o, s in scores.items() if o in total}
+            if not total: return []
+        ranked = sorted(total.items(), key=lambda x: (-x[1], x[0]))
+        return ranked[:limit] if limit else ranked
+
+def main():
+    parser = argparse.ArgumentParser(description='Search cards with the prebuilt n-gram index')
+    parser.add_argument('query')
+    parser.add_argument('--index', default='cards.search.json')
+    parser.add_argument('--json', default='cards.json', help='Used to print the matching cards')
+    parser.add_argument('--prefix', action='store_true', help='Only prefix matches on name/reading')
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    index = SearchIndex.load(args.index)
+    results = index.search(args.query, prefix=args.prefix, limit=args.limit)
+    records = None
+    if os.path.exists(args.json):
+        with open(args.json, 'r', encoding='utf-8') as f:
+            records = json.load(f)
+    for ordinal, score in results:
+        if records:
+            r = records[ordinal]
+            print(f"{score:>4} {r['cardNumber']:<10} {r['cardName']} ({r['furigana']})")
+        else:
+            print(f"{score:>4} #{ordinal} {index.docs[ordinal][0]}")
+    print(f"{len(results)} cards")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
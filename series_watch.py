@@ -0,0 +1,66 @@
+import os
+import json
+import time
+import hashlib
+
+from card_export import atomic_open
+
+# --- 監視モード (--watch) の状態 ---
+# シリーズ一覧 (select の選択肢) と、各シリーズ1ページ目のカード内容のハッシュを JSON に保存する。
+#   series  : {コード: {'name', 'digest' (1ページ目のハッシュ), 'checked' (確認日時)}}
+#   pending : 変更を検知したが、まだ取得に成功していないシリーズ {コード: 検知したハッシュ}
+# ハッシュは HTML ではなく解析後の行から作るので、広告やトークンなどカード以外の変化では取得しない。
+# pending は次の周回でも必ず取得し直す (HTTPキャッシュ上は 304 になっても変更を取りこぼさないように)。
+
+WATCH_STATE_VERSION = 1
+
+def content_digest(value):
+    return hashlib.sha256(json.dumps(value, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+class WatchState:
+    def __init__(self, path, series=None, pending=None):
+        self.path = path
+        self.series = series or {}
+        self.pending = pending or {}
+
+    @classmethod
+    def load(cls, path):
+        if not os.path.exists(path):
+            return cls(path)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Warning: could not read watch state ({path}: {e}); starting a new baseline.")
+            return cls(path)
+        if data.get('version') != WATCH_STATE_VERSION:
+            return cls(path)
+        return cls(path, data.get('series', {}), data.get('pending', {}))
+
+    def __contains__(self, code):
+        return code in self.series
+
+    def digest(self, code):
+        entry = self.series.get(code)
+        return entry['digest'] if entry else None
+
+    def is_changed(self, code, digest):
+        """記録済みのシリーズで、1ページ目の内容が変わったか、前回の取得が終わっていなければ True"""
+        return code in self.pending or (code in self.series and self.series[code]['digest'] != digest)
+
+    def mark_pending(self, code, digest):
+        self.pending[code] = digest
+
+    def record(self, code, name, digest):
+        """取得に成功した (または基準として取り込んだ) シリーズの1ページ目のハッシュを記録する"""
+        self.series[code] = {'name': name, 'digest': digest, 'checked': time.time()}
+        self.pending.pop(code, None)
+
+    def forget(self, code):
+        self.series.pop(code, None)
+        self.pending.pop(code, None)
+
+    def save(self):
+        with atomic_open(self.path) as f:
+            json.dump({'version': WATCH_STATE_VERSION, 'series': dict(sorted(self.series.items())),
+                       'pending': dict(sorted(self.pending.items()))}, f, ensure_ascii=False, indent=1)